@@ -0,0 +1,42 @@
+import pika
+import os
+import logging
+from django.conf import settings
+from api_router.response_cache import purge_for_event
+
+logger = logging.getLogger(__name__)
+
+def cache_invalidation_callback(ch, method, properties, body):
+    routing_key = method.routing_key
+    try:
+        purged = purge_for_event(routing_key)
+        logger.info(f" [x] cache invalidation event received: {routing_key}, purged: {purged}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    except Exception as e:
+        logger.exception(f" [x] Unexpected error while processing cache invalidation event: {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+def start_consumer():
+    rabbitmq_host = os.getenv('RABBITMQ_HOST', 'localhost')
+    rabbitmq_user = os.getenv('RABBITMQ_USER', 'guest')
+    rabbitmq_pass = os.getenv('RABBITMQ_PASS', 'guest')
+
+    credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_pass)
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=rabbitmq_host, credentials=credentials)
+    )
+    channel = connection.channel()
+
+    # One queue for the gateway, bound to every exchange/routing key the cache policies listen to.
+    queue_name = 'api_gateway_cache_invalidation'
+    channel.queue_declare(queue=queue_name, durable=True)
+    for exchange_name, routing_key in settings.RESPONSE_CACHE_EVENT_BINDINGS:
+        channel.exchange_declare(exchange=exchange_name, exchange_type='topic', durable=True)
+        channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key=routing_key)
+
+    channel.basic_qos(prefetch_count=10)
+    channel.basic_consume(queue=queue_name, on_message_callback=cache_invalidation_callback)
+
+    logger.info(' [*] Waiting for cache invalidation events...')
+    channel.start_consuming()
@@ -0,0 +1,168 @@
+import logging
+import math
+import threading
+import time
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Request priorities, lowest is shed first.
+ANONYMOUS_READ = 0
+AUTHENTICATED_READ = 1
+AUTHENTICATED_WRITE = 2
+CRITICAL = 3  # Stripe webhooks, never rate limited and shed last
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Atomic token bucket. KEYS[1] bucket hash, ARGV: rate (tokens/s), burst, now (s), cost.
+# Returns {allowed, seconds until enough tokens}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_redis_client = None
+_token_bucket = None
+
+def get_token_bucket():
+    global _redis_client, _token_bucket
+    if _token_bucket is None:
+        _redis_client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=int(settings.REDIS_PORT or 6379),
+            db=3,
+            socket_timeout=0.2,  # admission control must never be the slow part of a request
+            socket_connect_timeout=0.2,
+        )
+        _token_bucket = _redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+    return _token_bucket
+
+def client_ip(request):
+    if settings.GATEWAY_TRUST_X_FORWARDED_FOR:
+        forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded_for:
+            return forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+def request_priority(request):
+    if request.path in settings.ADMISSION_CRITICAL_PATHS:
+        return CRITICAL
+    if getattr(request, 'user_payload', None) is None:
+        return ANONYMOUS_READ
+    if request.method in READ_METHODS:
+        return AUTHENTICATED_READ
+    return AUTHENTICATED_WRITE
+
+def rejected_response(retry_after, message, status):
+    response = JsonResponse({"error": message}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+class AdmissionControlMiddleware:
+    """
+    Admission control for requests that reach the proxy. Two layers:
+
+    - Load shedding: in-flight requests of this worker are counted and, once they pass the share of
+      ADMISSION_MAX_IN_FLIGHT allowed for a priority, new requests of that priority get a 503.
+      Anonymous reads go first, then authenticated reads, then authenticated writes; Stripe
+      webhooks are only refused when the worker is completely full.
+    - Rate limiting: a token bucket per user_id (per IP for anonymous calls) kept in Redis, so every
+      gateway worker shares it. An empty bucket answers 429 with the time until the next token.
+
+    Redis errors let the request through. Must run after TokenValidationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.ADMISSION_CONTROL_ENABLED
+        self.max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        self.shed_thresholds = settings.ADMISSION_SHED_THRESHOLDS
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        priority = request_priority(request)
+        rejection = self.shed(priority) or self.rate_limit(request, priority)
+        if rejection is not None:
+            return rejection
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        priority = request_priority(request)
+        rejection = self.shed(priority) or await sync_to_async(self.rate_limit)(request, priority)
+        if rejection is not None:
+            return rejection
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return await self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def shed(self, priority):
+        limit = self.max_in_flight * self.shed_thresholds[priority]
+        if self.in_flight < limit:
+            return None
+        logger.warning(f"Shedding priority {priority} request, {self.in_flight} in flight")
+        return rejected_response(1, "Server is busy, please retry shortly", 503)
+
+    def rate_limit(self, request, priority):
+        if priority == CRITICAL:
+            return None
+        user_payload = getattr(request, 'user_payload', None)
+        if user_payload is not None:
+            key = f"gw:rl:user:{user_payload.get('user_id')}"
+            rate, burst = settings.RATE_LIMIT_USER
+        else:
+            key = f"gw:rl:ip:{client_ip(request)}"
+            rate, burst = settings.RATE_LIMIT_ANONYMOUS
+
+        try:
+            allowed, wait = get_token_bucket()(keys=[key], args=[rate, burst, time.time(), 1])
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter unavailable, letting request through: {str(e)}")
+            return None
+        if allowed:
+            return None
+        logger.info(f"Rate limited {key} on {request.path}")
+        return rejected_response(max(1, math.ceil(float(wait))), "Too many requests", 429)
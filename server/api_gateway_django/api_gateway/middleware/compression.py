@@ -0,0 +1,152 @@
+import gzip
+import logging
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml', 'text/',
+)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # good ratio for JSON while staying cheap enough for dynamic responses
+
+def accepted_encodings(accept_encoding):
+    """Codings the client accepts (q > 0), from an Accept-Encoding header value."""
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+def negotiate_encoding(accept_encoding):
+    """The coding the gateway uses for this client: 'br', 'gzip' or None."""
+    accepted = accepted_encodings(accept_encoding or '')
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+class _StreamCompressor:
+    """Incremental compressor, every chunk is flushed so the client keeps receiving data."""
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def compress(self, chunk):
+        return self._compress(chunk) + self._flush()
+
+    def finish(self):
+        return self._finish()
+
+def compress_body(encoding, content):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL)
+
+def compress_stream(encoding, streaming_content):
+    compressor = _StreamCompressor(encoding)
+    for chunk in streaming_content:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+async def compress_async_stream(encoding, streaming_content):
+    compressor = _StreamCompressor(encoding)
+    async for chunk in streaming_content:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+class CompressionMiddleware:
+    """
+    Negotiated gzip/brotli compression of gateway responses. Bodies smaller than
+    GATEWAY_COMPRESSION_MIN_BYTES, non-text types and responses that already carry a
+    Content-Encoding (upstream-compressed bodies passed through by the proxy) are left alone.
+    Streaming responses are compressed chunk by chunk.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.GATEWAY_COMPRESSION_ENABLED
+        self.min_bytes = settings.GATEWAY_COMPRESSION_MIN_BYTES
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if not self.enabled or not self.is_compressible(response):
+            return response
+        # The response depends on Accept-Encoding from here on, whatever we decide.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(encoding, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_bytes:
+                return response
+            compressed = compress_body(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # the bytes changed, so a strong validator would lie
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,91 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from api_router import response_cache
+
+logger = logging.getLogger(__name__)
+
+class ResponseCacheMiddleware:
+    """
+    Gateway side cache for idempotent GET routes declared in settings.RESPONSE_CACHE_POLICIES.
+    Fresh entries are served straight from Redis, stale ones (within STALE_TTL) are served while
+    a single worker refreshes them in the background. Successful writes through a route's
+    WRITE_PREFIXES or WRITE_PATTERNS purge it, RabbitMQ events are handled by the run_consumer command.
+    Must run after TokenValidationMiddleware, the key uses request.user_payload.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.RESPONSE_CACHE_ENABLED
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        cached_response, policy, key = self.lookup(request)
+        if cached_response is not None:
+            return cached_response
+        response = self.get_response(request)
+        self.update(request, response, policy, key)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        cached_response, policy, key = await sync_to_async(self.lookup)(request)
+        if cached_response is not None:
+            return cached_response
+        response = await self.get_response(request)
+        await sync_to_async(self.update)(request, response, policy, key)
+        return response
+
+    def lookup(self, request):
+        """Return (cached response or None, policy, cache key) for the request."""
+        if request.method != 'GET':
+            return None, None, None
+        policy = response_cache.find_policy(request.path)
+        if policy is None:
+            return None, None, None
+
+        try:
+            key = response_cache.build_cache_key(policy, request)
+            if request.headers.get('Cache-Control', '') == 'no-cache':
+                return None, policy, key
+            entry = response_cache.get_entry(key)
+        except Exception as e:
+            # Redis trouble should never take the gateway down, just skip the cache.
+            logger.warning(f"Response cache lookup failed for {request.path}: {str(e)}")
+            return None, None, None
+
+        if entry is None:
+            return None, policy, key
+        age = response_cache.entry_age(entry)
+        if age <= policy.ttl:
+            return response_cache.build_response(entry, 'HIT'), policy, key
+        if age <= policy.ttl + policy.stale_ttl:
+            response_cache.refresh_in_background(policy, key, request)
+            return response_cache.build_response(entry, 'STALE'), policy, key
+        return None, policy, key
+
+    def update(self, request, response, policy, key):
+        try:
+            if policy is not None and response.status_code == 200 and not response.streaming:
+                response_cache.store_entry(
+                    policy, key, response.status_code, response.content,
+                    response.get('Content-Type', 'application/json'),
+                    response.get('Content-Encoding'),
+                )
+                response['X-Gateway-Cache'] = 'MISS'
+            elif request.method not in ('GET', 'HEAD', 'OPTIONS') and 200 <= response.status_code < 300:
+                response_cache.purge_for_write(request.path)
+        except Exception as e:
+            logger.warning(f"Response cache update failed for {request.path}: {str(e)}")
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'gw:tok'
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens that already passed signature and claim verification, keyed
+    by the token's sha256 digest (the raw token is never stored). Each entry holds the derived
+    user payload until the token's `exp`. With `use_redis` the entries are also written to the
+    shared Django cache, so a token verified by one gateway worker is trusted by the others.
+    """
+    def __init__(self, max_size=10000, use_redis=False):
+        self.max_size = max_size
+        self.use_redis = use_redis
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        """Return the cached payload for a verified, unexpired token, or None."""
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+
+        if self.use_redis:
+            try:
+                entry = cache.get(f"{REDIS_KEY_PREFIX}:{key}")
+            except Exception as e:
+                logger.warning(f"Token cache Redis lookup failed: {str(e)}")
+                entry = None
+            if entry is not None and entry['exp'] > now:
+                self._remember(key, entry['payload'], entry['exp'])
+                with self._lock:
+                    self.redis_hits += 1
+                return entry['payload']
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, token, payload, expires_at):
+        key = self.digest(token)
+        self._remember(key, payload, expires_at)
+        if self.use_redis:
+            timeout = int(expires_at - time.time())
+            if timeout <= 0:
+                return
+            try:
+                cache.set(f"{REDIS_KEY_PREFIX}:{key}", {'payload': payload, 'exp': expires_at}, timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Token cache Redis write failed: {str(e)}")
+
+    def _remember(self, key, payload, expires_at):
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.redis_hits) / lookups, 4) if lookups else None,
+        }
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+def get_token_cache():
+    """Process wide verified-token cache, or None when TOKEN_CACHE_ENABLED is off."""
+    global _token_cache
+    if not settings.TOKEN_CACHE_ENABLED:
+        return None
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = VerifiedTokenCache(
+                    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+                    use_redis=settings.TOKEN_CACHE_USE_REDIS,
+                )
+    return _token_cache
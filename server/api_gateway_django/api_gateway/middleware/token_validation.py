@@ -1,29 +1,67 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.http import JsonResponse
 
+from .token_cache import get_token_cache
+from api_gateway.user_context import encode_user_context
+
 class TokenValidationMiddleware:
+    # Works in both stacks, so the async gateway mode (ASGI) doesn't fall back to a thread per request.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        error_response = self.validate_token(request)
+        if error_response is not None:
+            return error_response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # off the event loop, the token cache may be a Redis round trip (TOKEN_CACHE_USE_REDIS)
+        error_response = await sync_to_async(self.validate_token)(request)
+        if error_response is not None:
+            return error_response
+        return await self.get_response(request)
+
+    def validate_token(self, request):
+        """
+        Decode the bearer token and attach the user payload for the downstream services.
+        Returns a 401 response when the token is invalid, otherwise None.
+        """
         auth_header = request.headers.get('Authorization', '')
         if not auth_header.startswith('Bearer '):
-            request.META['HTTP_X_USER_PAYLOAD'] = str(None)
-            return self.get_response(request)
-        
+            request.user_payload = None
+            request.META['HTTP_X_USER_PAYLOAD'] = encode_user_context(None)
+            return None
+
         token = auth_header.split(' ')[1]
+        token_cache = get_token_cache()
         try:
-            # Validate and decode token
-            access_token = AccessToken(token)
-            payload = {
-                'user_id': access_token.get('user_id'),
-                'is_profile_completed': access_token.get('is_profile_completed'),
-                'is_tutor': access_token.get('is_tutor'),
-                'is_admin': access_token.get('is_admin'),
-            }
-            # Attach payload to the headers. So the downstream services can use it.
-            request.META['HTTP_X_USER_PAYLOAD'] = str(payload)
+            payload = token_cache.get(token) if token_cache else None
+            if payload is None:
+                # Validate and decode token
+                access_token = AccessToken(token)
+                payload = {
+                    'user_id': access_token.get('user_id'),
+                    'is_profile_completed': access_token.get('is_profile_completed'),
+                    'is_tutor': access_token.get('is_tutor'),
+                    'is_admin': access_token.get('is_admin'),
+                    'exp': access_token['exp'],
+                }
+                # Only verified tokens get here, they are trusted until they expire.
+                if token_cache:
+                    token_cache.set(token, payload, payload['exp'])
+            # Attach payload to the headers (signed, see api_gateway/user_context.py). So the downstream services can use it.
+            request.user_payload = payload
+            request.META['HTTP_X_USER_PAYLOAD'] = encode_user_context(payload)
         except InvalidToken as e:
             error_response = {
                 "detail": str(e),
@@ -37,7 +75,7 @@ class TokenValidationMiddleware:
                 ]
             }
             return JsonResponse(error_response, status=401)
-        
+
         except TokenError as e:
             error_response = {
                 "detail": str(e),
@@ -51,5 +89,5 @@ class TokenValidationMiddleware:
                 ]
             }
             return JsonResponse(error_response, status=401)
-        
-        return self.get_response(request)
\ No newline at end of file
+
+        return None
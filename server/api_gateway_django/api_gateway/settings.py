@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 import os
 import sys
 
@@ -53,13 +54,29 @@ SIMPLE_JWT = {
     'ALGORITHM': os.getenv('JWT_ALGORITHM_USER'),
 }
 
+# Key for signing the X-User-Payload user context (api_gateway/user_context.py).
+# Must be the same in the gateway, course_service and channel_service.
+USER_CONTEXT_SECRET = os.getenv('USER_CONTEXT_SECRET')
+if not USER_CONTEXT_SECRET:
+    # every request carrying the header would otherwise fail with an unexplained 500
+    raise ImproperlyConfigured('USER_CONTEXT_SECRET must be set, it is the key of the signed X-User-Payload user context')
+
+# Verified access tokens are remembered (by digest) until they expire, so the signature isn't
+# checked again on every request. With TOKEN_CACHE_USE_REDIS the gateway workers share them.
+TOKEN_CACHE_ENABLED = os.getenv('TOKEN_CACHE_ENABLED', 'True') == 'True'
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_USE_REDIS = os.getenv('TOKEN_CACHE_USE_REDIS') == 'True'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api_gateway.middleware.compression.CompressionMiddleware', # gzip/brotli, outermost so it sees the final body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # for CORS
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'api_gateway.middleware.token_validation.TokenValidationMiddleware', # Custom middleware for token validation
+    'api_gateway.middleware.response_cache.ResponseCacheMiddleware', # Cache for idempotent GET routes, needs the token payload
+    'api_gateway.middleware.admission.AdmissionControlMiddleware', # Rate limiting and load shedding, cache hits skip it
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -84,6 +101,26 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'api_gateway.wsgi.application'
+ASGI_APPLICATION = 'api_gateway.asgi.application'
+
+# Serve the generic proxy routes with async views. Needs an ASGI server, e.g.
+# uvicorn api_gateway.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+GATEWAY_ASYNC_MODE = os.getenv('GATEWAY_ASYNC_MODE') == 'True'
+
+# Forward multipart uploads (video chunks, thumbnails, profile images) to the upstream as raw
+# bytes instead of parsing and re-encoding them at the gateway.
+GATEWAY_STREAM_UPLOADS = os.getenv('GATEWAY_STREAM_UPLOADS', 'True') == 'True'
+
+# Negotiated gzip/brotli compression of responses (brotli only when the package is installed).
+# Upstream bodies that are already compressed are passed through untouched.
+GATEWAY_COMPRESSION_ENABLED = os.getenv('GATEWAY_COMPRESSION_ENABLED', 'True') == 'True'
+GATEWAY_COMPRESSION_MIN_BYTES = int(os.getenv('GATEWAY_COMPRESSION_MIN_BYTES', 1024))
+
+# Optional on-disk LRU cache for proxied media (profile images, badge icons). Disabled unless
+# MEDIA_CACHE_DIR is set. Entries are dropped after MEDIA_CACHE_TTL seconds.
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR')
+MEDIA_CACHE_MAX_BYTES = int(os.getenv('MEDIA_CACHE_MAX_MB', 512)) * 1024 * 1024
+MEDIA_CACHE_TTL = int(os.getenv('MEDIA_CACHE_TTL', 24 * 60 * 60))
 
 
 # Database
@@ -91,6 +128,16 @@ WSGI_APPLICATION = 'api_gateway.wsgi.application'
 
 DATABASES = {}
 
+REDIS_HOST = os.getenv('REDIS_HOST')
+REDIS_PORT = os.getenv('REDIS_PORT')
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/3", # 0 - user celery, 1 - user_service, 2 - channel_service and course celery
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -172,3 +219,160 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+
+# Upstream services. Each entry gets its own pooled keep-alive client (api_router/upstream.py).
+# Timeouts are in seconds, RETRIES only applies to idempotent methods and connection failures.
+# MAX_CONCURRENT caps in-flight calls per upstream (a caller waits at most BULKHEAD_WAIT seconds
+# for a slot) and CIRCUIT_BREAKER overrides api_router.resilience.DEFAULT_BREAKER. Both answer
+# with 503 + Retry-After instead of calling the upstream, see /api/v1/gateway/status/.
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 20))
+UPSTREAM_MAX_CONCURRENT = int(os.getenv('UPSTREAM_MAX_CONCURRENT', 50))
+
+# Share one upstream call between identical concurrent GETs (same URL and same caller identity).
+# Can be turned off per upstream with 'COALESCE_GETS': False. The key function gets
+# (upstream_name, method, url, request_kwargs) and returns a key, or None to not coalesce.
+GATEWAY_COALESCE_GETS = os.getenv('GATEWAY_COALESCE_GETS', 'True') == 'True'
+GATEWAY_COALESCE_KEY_FUNC = os.getenv('GATEWAY_COALESCE_KEY_FUNC', 'api_router.coalescing.default_coalesce_key')
+UPSTREAM_SERVICES = {
+    'USER': {
+        'URL': os.getenv('USER_SERVICE_URL'),
+        'POOL_SIZE': UPSTREAM_POOL_SIZE,
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 30,
+        'RETRIES': 2,
+        'MAX_CONCURRENT': UPSTREAM_MAX_CONCURRENT,
+    },
+    'ADMIN': {
+        'URL': os.getenv('ADMIN_SERVICE_URL'),
+        'POOL_SIZE': UPSTREAM_POOL_SIZE,
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 30,
+        'RETRIES': 2,
+        'MAX_CONCURRENT': UPSTREAM_MAX_CONCURRENT,
+    },
+    'COURSE': {
+        'URL': os.getenv('COURSE_SERVICE_URL'),
+        'POOL_SIZE': UPSTREAM_POOL_SIZE,
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 120,  # video chunks, certificates and curriculum payloads
+        'RETRIES': 2,
+        'MAX_CONCURRENT': UPSTREAM_MAX_CONCURRENT,
+        'CIRCUIT_BREAKER': {'SLOW_CALL_SECONDS': 30},  # uploads are slow by nature
+    },
+    'CHANNEL': {
+        'URL': os.getenv('CHANNEL_SERVICE_URL'),
+        'POOL_SIZE': UPSTREAM_POOL_SIZE,
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 30,
+        'RETRIES': 2,
+        'MAX_CONCURRENT': UPSTREAM_MAX_CONCURRENT,
+    },
+}
+
+# Gateway response cache (api_gateway/middleware/response_cache.py). Each policy is one cached route:
+# TTL is the fresh period, STALE_TTL how long a stale entry may still be served while it refreshes,
+# VARY the X-User-Payload fields that are part of the key, WRITE_PREFIXES the paths (and WRITE_PATTERNS
+# the path regexes) whose successful writes purge it and EVENTS the RabbitMQ routing keys that purge it
+# (see run_consumer).
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True') == 'True'
+# Only the course service writes that change what the catalog and landing page show. Lecture and
+# assessment submits, notes, reports and ad views don't, and are frequent enough to keep both empty.
+COURSE_CATALOG_WRITE_PATTERNS = (
+    r'^/api/v1/courses/$',  # create and step-by-step update of a course
+    r'^/api/v1/courses/toggle-activation/$',
+    r'^/api/v1/courses/\d+/purchase/$',
+    r'^/api/v1/courses/\d+/reviews/$',
+)
+RESPONSE_CACHE_POLICIES = [
+    {
+        'NAME': 'course_catalog',
+        'PATTERN': r'^/api/v1/courses/$',
+        'UPSTREAM': 'COURSE',
+        'TTL': 60,
+        'STALE_TTL': 300,
+        'VARY': (),
+        'WRITE_PATTERNS': COURSE_CATALOG_WRITE_PATTERNS,
+        'EVENTS': ('notification.course.purchase', 'notification.course.upgraded', 'notification.course.review'),
+    },
+    {
+        'NAME': 'categories',
+        'PATTERN': r'^/api/v1/courses/categories/user/$',
+        'UPSTREAM': 'COURSE',
+        'TTL': 300,
+        'STALE_TTL': 3600,
+        'VARY': (),
+        'WRITE_PREFIXES': ('/api/v1/courses/categories/',),
+    },
+    {
+        'NAME': 'landing',
+        'PATTERN': r'^/api/v1/courses/landing/$',
+        'UPSTREAM': 'COURSE',
+        'TTL': 60,
+        'STALE_TTL': 600,
+        'VARY': (),
+        'WRITE_PATTERNS': COURSE_CATALOG_WRITE_PATTERNS,
+        'EVENTS': (
+            'notification.course.purchase', 'notification.course.upgraded', 'notification.course.review',
+            'chat.profile_updated',
+        ),
+    },
+    {
+        'NAME': 'banners',
+        'PATTERN': r'^/api/v1/banners/(active|home-banner|ad-banner|ad-videos)/$',
+        'UPSTREAM': 'COURSE',
+        'TTL': 120,
+        'STALE_TTL': 600,
+        'VARY': ('is_admin',),
+        'WRITE_PREFIXES': ('/api/v1/banners/',),
+    },
+    {
+        'NAME': 'badges',
+        'PATTERN': r'^/api/v1/badges/$',
+        'UPSTREAM': 'ADMIN',
+        'TTL': 120,
+        'STALE_TTL': 600,
+        'VARY': ('is_admin',),
+        'WRITE_PREFIXES': ('/api/v1/badges/',),
+        'EVENTS': ('chat.create_group_chat_room', 'chat.update_group_name'),
+    },
+]
+# Exchanges and routing keys the cache invalidation consumer binds to.
+RESPONSE_CACHE_EVENT_BINDINGS = [
+    ('notification_events', 'notification.course.#'),
+    ('chat_events', 'chat.#'),
+]
+
+# Backend-for-frontend composite routes served at /api/v1/bff/<name>/ (api_router/aggregation.py).
+# The PARTS are fetched concurrently and returned under their names, failed or timed out parts
+# are None and listed in "_errors". TIMEOUT is the read timeout of a part in seconds.
+AGGREGATE_MAX_WORKERS = int(os.getenv('AGGREGATE_MAX_WORKERS', 32))
+AGGREGATE_DEFAULT_TIMEOUT = 5
+AGGREGATE_ROUTES = {
+    'home': {
+        'PARTS': {
+            'home': {'UPSTREAM': 'COURSE', 'PATH': '/api/v1/courses/home/', 'AUTH_REQUIRED': True},
+            'banners': {'UPSTREAM': 'COURSE', 'PATH': '/api/v1/banners/active/', 'TIMEOUT': 3},
+            'unread_messages': {'UPSTREAM': 'CHANNEL', 'PATH': '/api/v1/chats/rooms/unread-messages/', 'TIMEOUT': 2, 'AUTH_REQUIRED': True},
+        },
+    },
+    'landing': {
+        'PARTS': {
+            'landing': {'UPSTREAM': 'COURSE', 'PATH': '/api/v1/courses/landing/'},
+            'banners': {'UPSTREAM': 'COURSE', 'PATH': '/api/v1/banners/active/', 'TIMEOUT': 3},
+        },
+    },
+}
+
+# Admission control (api_gateway/middleware/admission.py). Token buckets are (tokens per second, burst),
+# per user_id for authenticated calls and per client IP for anonymous ones, shared through Redis.
+# A request is shed with a 503 once a worker has more in-flight requests than
+# ADMISSION_MAX_IN_FLIGHT times the threshold of its priority:
+# anonymous reads, authenticated reads, authenticated writes, critical (Stripe webhooks).
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'True') == 'True'
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 100))
+ADMISSION_SHED_THRESHOLDS = (0.6, 0.8, 0.95, 1.0)
+ADMISSION_CRITICAL_PATHS = ('/api/v1/courses/stripe/webhook/',)
+RATE_LIMIT_USER = (float(os.getenv('RATE_LIMIT_USER_RATE', 10)), int(os.getenv('RATE_LIMIT_USER_BURST', 40)))
+RATE_LIMIT_ANONYMOUS = (float(os.getenv('RATE_LIMIT_ANON_RATE', 3)), int(os.getenv('RATE_LIMIT_ANON_BURST', 20)))
+# Only turn on behind a proxy that sets X-Forwarded-For, otherwise clients could pick their own bucket.
+GATEWAY_TRUST_X_FORWARDED_FOR = os.getenv('GATEWAY_TRUST_X_FORWARDED_FOR') == 'True'
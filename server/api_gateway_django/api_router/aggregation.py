@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from django.conf import settings
+
+from .upstream import get_upstream
+
+logger = logging.getLogger(__name__)
+
+class AggregatePart:
+    """One upstream sub-request of a composite route (an entry of PARTS in settings.AGGREGATE_ROUTES)."""
+    def __init__(self, name, config):
+        self.name = name
+        self.upstream = config['UPSTREAM']
+        self.path = config['PATH']
+        self.timeout = config.get('TIMEOUT', settings.AGGREGATE_DEFAULT_TIMEOUT)
+        self.auth_required = config.get('AUTH_REQUIRED', False)
+
+class AggregateRoute:
+    def __init__(self, name, config):
+        self.name = name
+        self.parts = [AggregatePart(part_name, part) for part_name, part in config['PARTS'].items()]
+
+_routes = None
+
+def get_aggregate_route(name):
+    global _routes
+    if _routes is None:
+        _routes = {route_name: AggregateRoute(route_name, config) for route_name, config in settings.AGGREGATE_ROUTES.items()}
+    return _routes.get(name)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.AGGREGATE_MAX_WORKERS, thread_name_prefix='aggregate')
+    return _executor
+
+def fetch_part(part, headers):
+    upstream = get_upstream(part.upstream)
+    url = upstream.base_url.rstrip('/') + part.path
+    started = time.monotonic()
+    try:
+        # a single attempt, the retries and backoff of the upstream client would overrun the part's deadline
+        response = upstream.get(
+            url, headers=headers, timeout=(min(upstream.timeout[0], part.timeout), part.timeout), retry=False
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Aggregate part {part.name} failed at {url}: {str(e)}")
+        return None, {"error": f"Failed to reach {part.upstream.lower()} service"}
+
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if response.status_code >= 400:
+        logger.warning(f"Aggregate part {part.name} got {response.status_code} from {url}")
+        return None, {"status": response.status_code, "error": body}
+    logger.debug(f"Aggregate part {part.name}: {response.status_code} in {elapsed_ms}ms")
+    return body, None
+
+def aggregate(route, request):
+    """
+    Run every part of the route concurrently and merge the results into one dict keyed by
+    part name. A part that fails, times out or needs a login the caller doesn't have is
+    returned as None and described under "_errors", so the page can still render the rest.
+    """
+    headers = {
+        'Authorization': request.headers.get('Authorization'),
+        'X-User-Payload': request.META.get('HTTP_X_USER_PAYLOAD'),
+        'Accept': 'application/json',
+    }
+    is_authenticated = getattr(request, 'user_payload', None) is not None
+
+    result = {part.name: None for part in route.parts}
+    errors = {}
+    futures = {}
+    executor = get_executor()
+    started = time.monotonic()
+    for part in route.parts:
+        if part.auth_required and not is_authenticated:
+            errors[part.name] = {"status": 401, "error": "Authentication required"}
+            continue
+        futures[executor.submit(fetch_part, part, headers)] = part
+
+    # every part is given up on at its own deadline, its read timeout plus a second of slack for
+    # the connect and the bulkhead; a read timeout is per socket read so it alone doesn't bound it
+    for future, part in futures.items():
+        try:
+            body, error = future.result(timeout=max(0, started + part.timeout + 1 - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()  # only drops it if no worker picked it up yet, a running one ends at its timeout
+            errors[part.name] = {"error": f"Timed out after {part.timeout}s"}
+            continue
+        result[part.name] = body
+        if error is not None:
+            errors[part.name] = error
+
+    result['_partial'] = bool(errors)
+    result['_errors'] = errors
+    return result
@@ -0,0 +1,78 @@
+import logging
+
+import httpx
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .proxy import (
+    resolve, upstream_url, build_response, copy_headers,
+    PASSTHROUGH_HEADERS, STREAM_PASSTHROUGH_HEADERS, STREAM_CHUNK_SIZE,
+)
+from .utils import get_forwarded_headers, is_multipart
+from .upstream import get_async_upstream
+
+logger = logging.getLogger(__name__)
+
+# Async version of the route-table proxy in proxy.py. It is wired in api_router/urls.py when
+# GATEWAY_ASYNC_MODE is on and the gateway runs under an ASGI server (uvicorn), so an in-flight
+# upstream call no longer holds a worker thread. Request bodies are forwarded with their original
+# Content-Type, multipart uploads as a stream like the sync proxy, and stream_response routes are
+# streamed back.
+
+async def iter_request_body(request):
+    # the ASGI handler has spooled the body to a temporary file, read it in blocks instead of
+    # request.body, which holds it in memory and is capped by DATA_UPLOAD_MAX_MEMORY_SIZE
+    while chunk := request.read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+def request_body(route, request):
+    """The body to forward: a stream for multipart uploads, otherwise the raw bytes."""
+    if request.method in ('GET', 'HEAD', 'DELETE', 'OPTIONS'):
+        return None
+    if route.stream_uploads and settings.GATEWAY_STREAM_UPLOADS and is_multipart(request):
+        return iter_request_body(request)
+    return request.body
+
+async def stream_body(response):
+    try:
+        async for chunk in response.aiter_raw(STREAM_CHUNK_SIZE):
+            yield chunk
+    finally:
+        await response.aclose()
+
+@csrf_exempt
+async def gateway_proxy(request):
+    route, error_response = resolve(request)
+    if error_response is not None:
+        return error_response
+
+    upstream = get_async_upstream(route.upstream)
+    url = upstream_url(upstream, request)
+    logger.info(f"Async proxy {route.name}: {request.method} {url}")
+    headers = get_forwarded_headers(request)
+    body = request_body(route, request)
+    if body is not None and not isinstance(body, bytes):
+        # a Content-Length instead of a chunked body, which the upstream dev servers can't read
+        headers['Content-Length'] = request.META.get('CONTENT_LENGTH') or '0'
+    kwargs = {'headers': headers, 'content': body}
+    if route.timeout is not None:
+        kwargs['timeout'] = route.timeout
+
+    try:
+        response = await upstream.request(request.method, url, stream=route.stream_response, **kwargs)
+    except httpx.RequestError as e:
+        logger.error(f"Failed to reach {route.upstream.lower()} service at {url}: {str(e)}")
+        return JsonResponse({"error": f"Failed to reach {route.upstream.lower()} service"}, status=500)
+
+    logger.debug(f"Async proxy {route.name} response: {response.status_code}")
+    if not route.stream_response or response.is_stream_consumed:  # synthetic 503s are already read
+        return build_response(route, request, response)
+
+    django_response = StreamingHttpResponse(
+        stream_body(response),
+        status=response.status_code,
+        content_type=response.headers.get('Content-Type'),
+    )
+    copy_headers(django_response, response.headers, PASSTHROUGH_HEADERS)
+    return copy_headers(django_response, response.headers, STREAM_PASSTHROUGH_HEADERS)
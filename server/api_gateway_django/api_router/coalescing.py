@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import threading
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Only these headers decide what a response is and who it belongs to. Everything else the gateway
+# forwards (Accept-Language, User-Agent, ...) doesn't change what the upstream sends back.
+# Accept-Encoding matters because compressed upstream bodies are passed through as they are.
+KEY_HEADERS = ('authorization', 'x-user-payload', 'accept-encoding')
+
+def default_coalesce_key(client_name, method, url, kwargs):
+    """
+    Key for an upstream call: service, method, full URL with params and the caller identity.
+    Returning None means the call must not be shared.
+    """
+    if any(kwargs.get(arg) for arg in ('stream', 'data', 'files', 'json', 'content')):
+        return None
+
+    headers = {key.lower(): value for key, value in (kwargs.get('headers') or {}).items()}
+    identity = '|'.join(str(headers.get(name)) for name in KEY_HEADERS)
+    params = kwargs.get('params')
+    query = urlencode(sorted(params.items()) if isinstance(params, dict) else params or [])
+    return f"{client_name}|{method}|{url}?{query}|{identity}"
+
+_key_func = None
+
+def get_coalesce_key_func():
+    """The key function configured in settings.GATEWAY_COALESCE_KEY_FUNC (a dotted path)."""
+    global _key_func
+    if _key_func is None:
+        _key_func = import_string(settings.GATEWAY_COALESCE_KEY_FUNC)
+    return _key_func
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key. The first caller
+    (the leader) runs the call, the others wait for it and get the same result or exception.
+    Nothing is kept after the call finishes, this is not a cache.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0    # callers that waited on someone else's call
+        self.misses = 0  # calls that actually went to the upstream
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            logger.debug(f"Coalesced upstream call on {self.name}: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'in_flight': len(self._calls)}
+
+class AsyncSingleFlight:
+    """
+    asyncio version of SingleFlight for the ASGI gateway mode. Only used from one event loop,
+    so no locking is needed around the in-flight table.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is not None:
+            self.hits += 1
+            logger.debug(f"Coalesced upstream call on {self.name}: {key}")
+            # shield: a waiter that is cancelled (client went away) must not cancel the shared call
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # mark the exception as retrieved, so a failed call with no waiters doesn't log a warning
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'in_flight': len(self._calls)}
@@ -0,0 +1,55 @@
+import ast
+import time
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api_gateway import user_context
+
+class Command(BaseCommand):
+    help = 'Compare decoding the signed X-User-Payload user context with the old str(dict) + ast.literal_eval format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=500, help='Distinct users cycled through, like a live service sees')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        users = options['users']
+        payloads = [
+            {
+                'user_id': user_id,
+                'is_profile_completed': True,
+                'is_tutor': user_id % 3 == 0,
+                'is_admin': False,
+                'exp': int(time.time()) + 900,
+            }
+            for user_id in range(1, users + 1)
+        ]
+        legacy_headers = [str({k: v for k, v in payload.items() if k != 'exp'}) for payload in payloads]
+        signed_headers = [user_context.encode_user_context(payload) for payload in payloads]
+
+        def run(decode, headers):
+            count = len(headers)
+            return lambda: [decode(headers[i % count]) for i in range(iterations)]
+
+        def decode_cold(header):
+            user_context._verify.cache_clear()
+            return user_context.decode_user_context(header)
+
+        results = [
+            ('str(dict) + ast.literal_eval', run(ast.literal_eval, legacy_headers)),
+            ('signed context, no memo', run(decode_cold, signed_headers)),
+            ('signed context, memoized', run(user_context.decode_user_context, signed_headers)),
+        ]
+
+        self.stdout.write(f'{iterations} decodes over {users} users')
+        self.stdout.write(f'header size: legacy {len(legacy_headers[0])} bytes, signed {len(signed_headers[0])} bytes')
+        baseline = None
+        for name, fn in results:
+            seconds = min(timeit.repeat(fn, number=1, repeat=3))
+            per_call = seconds / iterations * 1e6
+            baseline = baseline or per_call
+            self.stdout.write(self.style.SUCCESS(
+                f'{name:32} {per_call:8.2f} us/decode  ({baseline / per_call:5.1f}x)'
+            ))
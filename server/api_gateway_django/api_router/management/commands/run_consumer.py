@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api_gateway.message_broker.rabbitmq_consumer import start_consumer
+
+class Command(BaseCommand):
+    help = 'Starts the RabbitMQ consumer that invalidates the gateway response cache'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Starting RabbitMQ consumer...'))
+        try:
+            start_consumer()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Consumer stopped.'))
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MediaDiskCache:
+    """
+    Size-capped LRU cache of upstream media files on local disk. Each entry is the file body
+    plus a small JSON sidecar with the headers needed to serve it again (Content-Type, ETag,
+    Last-Modified, Cache-Control). Recency is tracked with the file mtime, which is bumped on
+    every hit, and the least recently used entries are evicted once max_bytes is exceeded.
+    """
+    def __init__(self, root, max_bytes, ttl):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        # .part files are writes in progress (or left by a crash), they aren't entries
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(self.root)
+            if entry.is_file() and not entry.name.endswith('.part')
+        )
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        body_path = os.path.join(self.root, digest)
+        return body_path, body_path + '.json'
+
+    def get(self, key):
+        """Return (body_path, meta) for a fresh entry, or None."""
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            stat = os.stat(body_path)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - meta.get('stored_at', 0) > self.ttl:
+            self.delete(key)
+            return None
+
+        os.utime(body_path)  # mark as recently used
+        meta['size'] = stat.st_size
+        return body_path, meta
+
+    def delete(self, key):
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            for path in (body_path, meta_path):
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    self._size -= size
+                except OSError:
+                    pass
+
+    def writer(self, key, meta):
+        return _CacheWriter(self, key, meta)
+
+    def _commit(self, key, temp_path, meta):
+        body_path, meta_path = self._paths(key)
+        meta = dict(meta, stored_at=time.time())
+        meta_bytes = json.dumps(meta).encode()
+        with self._lock:
+            for path in (body_path, meta_path):  # a refresh or a concurrent miss replaces the entry
+                try:
+                    self._size -= os.path.getsize(path)
+                except OSError:
+                    pass
+            os.replace(temp_path, body_path)
+            with open(meta_path, 'wb') as f:
+                f.write(meta_bytes)
+            self._size += os.path.getsize(body_path) + len(meta_bytes)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            bodies = [
+                entry for entry in os.scandir(self.root)
+                if entry.is_file() and not entry.name.endswith(('.json', '.part'))
+            ]
+            bodies.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in bodies:
+                if self._size <= self.max_bytes:
+                    break
+                for path in (entry.path, entry.path + '.json'):
+                    try:
+                        size = os.path.getsize(path)
+                        os.remove(path)
+                        self._size -= size
+                    except OSError:
+                        pass
+                logger.debug(f"Evicted media cache entry {entry.name}")
+
+class _CacheWriter:
+    """Collects a response body while it is streamed to the client, then commits it to the cache."""
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        fd, self.temp_path = tempfile.mkstemp(dir=cache.root, suffix='.part')
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def commit(self):
+        self.file.close()
+        self.cache._commit(self.key, self.temp_path, self.meta)
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+_media_cache = None
+_media_cache_lock = threading.Lock()
+
+def get_media_cache(settings):
+    """Return the process wide media cache, or None when MEDIA_CACHE_DIR is not configured."""
+    global _media_cache
+    if not settings.MEDIA_CACHE_DIR:
+        return None
+    if _media_cache is None:
+        with _media_cache_lock:
+            if _media_cache is None:
+                _media_cache = MediaDiskCache(
+                    settings.MEDIA_CACHE_DIR,
+                    settings.MEDIA_CACHE_MAX_BYTES,
+                    settings.MEDIA_CACHE_TTL,
+                )
+    return _media_cache
@@ -0,0 +1,193 @@
+import logging
+
+import requests
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .upstream import get_upstream
+from .utils import get_forwarded_headers, is_multipart, RequestBodyStream
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHODS = ('GET', 'POST', 'PATCH', 'PUT', 'DELETE')
+# Upstream response headers that are copied back to the client as they are.
+PASSTHROUGH_HEADERS = (
+    'Content-Disposition', 'Cache-Control', 'ETag', 'Last-Modified', 'Location', 'Retry-After', 'Allow',
+)
+# Extra headers for bodies forwarded without decoding (streamed or kept encoded).
+STREAM_PASSTHROUGH_HEADERS = ('Content-Length', 'Content-Encoding')
+ENCODED_PASSTHROUGH_HEADERS = ('Content-Encoding', 'Vary')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class Route:
+    """
+    One entry of the gateway route table (api_router/routes.py).
+
+    prefix          path prefix, e.g. '/api/v1/courses/'. With exact=True only that path matches.
+    upstream        key of settings.UPSTREAM_SERVICES.
+    methods         allowed methods, others get a 405.
+    timeout         read timeout in seconds, None keeps the upstream's default.
+    stream_uploads  forward multipart bodies as a stream instead of buffering them.
+    stream_response stream the upstream body back without buffering or decoding it (downloads).
+    cache           names of settings.RESPONSE_CACHE_POLICIES that may apply under this route.
+    transforms      {method: fn(request, upstream_response) -> HttpResponse}, applied to 2xx
+                    responses only. Without one the upstream body is returned as raw bytes.
+    """
+    def __init__(self, name, prefix, upstream, methods=DEFAULT_METHODS, exact=False, timeout=None,
+                 stream_uploads=True, stream_response=False, cache=(), transforms=None):
+        self.name = name
+        self.prefix = prefix
+        self.upstream = upstream
+        self.methods = frozenset(methods)
+        self.exact = exact
+        self.timeout = timeout
+        self.stream_uploads = stream_uploads
+        self.stream_response = stream_response
+        self.cache = tuple(cache)
+        self.transforms = transforms or {}
+
+    def __repr__(self):
+        return f"<Route {self.name} {self.prefix}>"
+
+class RouteTable:
+    """
+    Precompiled prefix dispatch. Exact routes are one dict lookup, prefix routes are looked up
+    once per '/' boundary of the path from the longest candidate down, so matching costs a few
+    dict lookups no matter how many routes there are.
+    """
+    def __init__(self, routes):
+        self.routes = list(routes)
+        self._exact = {}
+        self._prefixes = {}
+        for route in self.routes:
+            table = self._exact if route.exact else self._prefixes
+            if route.prefix in table:
+                raise ValueError(f"Duplicate gateway route for {route.prefix}")
+            table[route.prefix] = route
+
+    def match(self, path):
+        route = self._exact.get(path)
+        if route is not None:
+            return route
+        end = path.rfind('/')
+        while end >= 0:
+            route = self._prefixes.get(path[:end + 1])
+            if route is not None:
+                return route
+            end = path.rfind('/', 0, end)
+        return None
+
+_route_table = None
+
+def get_route_table():
+    global _route_table
+    if _route_table is None:
+        from .routes import ROUTES
+        _route_table = RouteTable(ROUTES)
+    return _route_table
+
+def resolve(request):
+    """Return (route, None) for a proxied request, or (None, error_response)."""
+    route = get_route_table().match(request.path)
+    if route is None:
+        return None, JsonResponse({"error": "Not found"}, status=404)
+    if request.method not in route.methods:
+        response = JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+        response['Allow'] = ', '.join(sorted(route.methods))
+        return None, response
+    return route, None
+
+def upstream_url(upstream, request):
+    return upstream.base_url.rstrip('/') + request.get_full_path()
+
+def request_body(route, request):
+    """The body to forward: a stream for multipart uploads, otherwise the raw bytes."""
+    if request.method in ('GET', 'HEAD', 'DELETE', 'OPTIONS'):
+        return None
+    if route.stream_uploads and settings.GATEWAY_STREAM_UPLOADS and is_multipart(request):
+        return RequestBodyStream(request)
+    return request.body
+
+def copy_headers(django_response, upstream_headers, names):
+    for header in names:
+        if header in upstream_headers:
+            django_response[header] = upstream_headers[header]
+    return django_response
+
+def build_response(route, request, response):
+    """Turn an upstream response (requests or httpx) into the client response."""
+    transform = route.transforms.get(request.method)
+    if transform is not None and 200 <= response.status_code < 300:
+        return transform(request, response)
+    if response.status_code == 204:
+        return HttpResponse(status=204)
+    django_response = HttpResponse(
+        response.content,
+        status=response.status_code,
+        content_type=response.headers.get('Content-Type', 'application/json'),
+    )
+    return copy_headers(django_response, response.headers, PASSTHROUGH_HEADERS)
+
+def keep_encoded_body(response, *args, **kwargs):
+    """
+    requests response hook: read a compressed upstream body without decoding it, so it can be
+    passed to the client as is instead of being decompressed here and compressed again.
+    Hooks run before requests reads the body of a non-streamed response.
+    """
+    if response.headers.get('Content-Encoding') and response.raw is not None:
+        response._content = response.raw.read(decode_content=False)
+        response._content_consumed = True
+    return response
+
+def stream_body(response):
+    try:
+        for chunk in response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False):
+            yield chunk
+    finally:
+        response.close()
+
+def forward(route, request):
+    upstream = get_upstream(route.upstream)
+    url = upstream_url(upstream, request)
+    kwargs = {
+        'headers': get_forwarded_headers(request),
+        'data': request_body(route, request),
+        'stream': route.stream_response,
+    }
+    if route.timeout is not None:
+        kwargs['timeout'] = (upstream.timeout[0], route.timeout)
+    # transforms need the decoded body, everything else can stay compressed
+    keep_encoded = not route.stream_response and request.method not in route.transforms
+    if keep_encoded:
+        kwargs['hooks'] = {'response': keep_encoded_body}
+    logger.info(f"Proxy {route.name}: {request.method} {url}")
+
+    try:
+        response = upstream.request(request.method, url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to reach {route.upstream.lower()} service at {url}: {str(e)}")
+        return JsonResponse({"error": f"Failed to reach {route.upstream.lower()} service"}, status=500)
+
+    logger.debug(f"Proxy {route.name} response: {response.status_code}")
+    if not route.stream_response or response.raw is None:
+        django_response = build_response(route, request, response)
+        if keep_encoded and response._content_consumed and response.headers.get('Content-Encoding'):
+            copy_headers(django_response, response.headers, ENCODED_PASSTHROUGH_HEADERS)
+        return django_response
+
+    django_response = StreamingHttpResponse(
+        stream_body(response),
+        status=response.status_code,
+        content_type=response.headers.get('Content-Type'),
+    )
+    copy_headers(django_response, response.headers, PASSTHROUGH_HEADERS)
+    return copy_headers(django_response, response.headers, STREAM_PASSTHROUGH_HEADERS)
+
+@csrf_exempt
+def gateway_proxy(request):
+    """Single entry point for every proxied route, see api_router/routes.py."""
+    route, error_response = resolve(request)
+    if error_response is not None:
+        return error_response
+    return forward(route, request)
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_BREAKER = {
+    'WINDOW': 20,               # last N calls the rates are computed over
+    'MIN_CALLS': 10,            # no decision before this many calls in the window
+    'FAILURE_RATE': 0.5,        # errors and 5xx responses
+    'SLOW_CALL_SECONDS': 5,
+    'SLOW_CALL_RATE': 0.8,
+    'OPEN_SECONDS': 30,         # fast-fail period before probing again
+    'HALF_OPEN_CALLS': 3,       # probes allowed through, all must succeed to close
+}
+
+class CircuitBreaker:
+    """
+    Failure-rate and latency breaker for one upstream. Closed: every call goes through and its
+    outcome is recorded in a rolling window. Open: calls fail fast until OPEN_SECONDS have passed.
+    Half-open: a few probe calls go through, the breaker closes when they all succeed and opens
+    again on the first failure. Shared by the sync and async clients of the same upstream.
+    """
+    def __init__(self, name, config):
+        self.name = name
+        self.window = config['WINDOW']
+        self.min_calls = config['MIN_CALLS']
+        self.failure_rate = config['FAILURE_RATE']
+        self.slow_call_seconds = config['SLOW_CALL_SECONDS']
+        self.slow_call_rate = config['SLOW_CALL_RATE']
+        self.open_seconds = config['OPEN_SECONDS']
+        self.half_open_calls = config['HALF_OPEN_CALLS']
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.rejected = 0
+        self._outcomes = deque(maxlen=self.window)  # (failed, slow)
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True when a call may go to the upstream now."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_started >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._probes_started += 1
+            return True
+
+    def release_probe(self):
+        """
+        Give back the half-open slot taken by allow() for a call that never recorded an outcome
+        (bulkhead full, caller cancelled), otherwise the breaker would stay half-open for good.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_started > self._probes_passed:
+                self._probes_started -= 1
+
+    def record(self, failed, elapsed):
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.half_open_calls:
+                        self._transition(CLOSED)
+                return
+
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate or slow_rate >= self.slow_call_rate:
+                logger.warning(
+                    f"Opening circuit for {self.name}: failure rate {failure_rate:.2f}, slow call rate {slow_rate:.2f}"
+                )
+                self._transition(OPEN)
+
+    def _rates(self):
+        calls = len(self._outcomes) or 1
+        failures = sum(1 for failed, slow in self._outcomes if failed)
+        slow_calls = sum(1 for failed, slow in self._outcomes if slow)
+        return failures / calls, slow_calls / calls
+
+    def _transition(self, state):
+        logger.info(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._probes_started = 0
+        self._probes_passed = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def retry_after(self):
+        if self.state != OPEN:
+            return 1
+        return max(1, int(self.open_seconds - (time.monotonic() - self.opened_at)))
+
+    def stats(self):
+        with self._lock:
+            failure_rate, slow_rate = self._rates()
+            return {
+                'state': self.state,
+                'calls_in_window': len(self._outcomes),
+                'failure_rate': round(failure_rate, 3),
+                'slow_call_rate': round(slow_rate, 3),
+                'rejected': self.rejected,
+                'retry_after': self.retry_after() if self.state == OPEN else None,
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            config = dict(DEFAULT_BREAKER, **settings.UPSTREAM_SERVICES[name].get('CIRCUIT_BREAKER', {}))
+            breaker = CircuitBreaker(name, config)
+            _breakers[name] = breaker
+    return breaker
+
+def all_breakers():
+    return dict(_breakers)
+
+def is_failure(status_code):
+    return status_code >= 500
+
+def unavailable_body(name, reason):
+    return {"error": f"{name.lower()} service is unavailable", "reason": reason}
+
+def unavailable_response(name, url, reason, retry_after):
+    """
+    Synthetic 503 handed back instead of calling the upstream. Views treat it like any upstream
+    error response, so the fast-fail needs no special handling in them.
+    """
+    response = requests.Response()
+    response.status_code = 503
+    response.url = url
+    response.reason = 'Service Unavailable'
+    response._content = json.dumps(unavailable_body(name, reason)).encode()
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def async_unavailable_response(name, url, reason, retry_after):
+    return httpx.Response(
+        503,
+        json=unavailable_body(name, reason),
+        headers={'Retry-After': str(retry_after)},
+        request=httpx.Request('GET', url),
+    )
+
+class Bulkhead:
+    """Caps in-flight calls to one upstream, so a stalled service can't hold every gateway worker."""
+    def __init__(self, name, max_concurrent, wait_seconds):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.wait_seconds = wait_seconds
+        self.in_flight = 0
+        self.rejected = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self):
+        if not self._semaphore.acquire(timeout=self.wait_seconds):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {'max_concurrent': self.max_concurrent, 'in_flight': self.in_flight, 'rejected': self.rejected}
+
+class AsyncBulkhead(Bulkhead):
+    def __init__(self, name, max_concurrent, wait_seconds):
+        super().__init__(name, max_concurrent, wait_seconds)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
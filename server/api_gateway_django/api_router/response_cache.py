@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .upstream import get_upstream
+from .proxy import get_route_table
+from api_gateway.middleware.compression import accepted_encodings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'gw:resp'
+REFRESH_LOCK_TIMEOUT = 30
+
+class CachePolicy:
+    """One entry of settings.RESPONSE_CACHE_POLICIES, with its path pattern compiled."""
+    def __init__(self, config):
+        self.name = config['NAME']
+        self.pattern = re.compile(config['PATTERN'])
+        self.upstream = config['UPSTREAM']
+        self.ttl = config.get('TTL', 60)
+        self.stale_ttl = config.get('STALE_TTL', 0)
+        self.vary = tuple(config.get('VARY', ()))
+        self.write_prefixes = tuple(config.get('WRITE_PREFIXES', ()))
+        self.write_patterns = [re.compile(pattern) for pattern in config.get('WRITE_PATTERNS', ())]
+        self.events = tuple(config.get('EVENTS', ()))
+
+    def matches(self, path):
+        return self.pattern.match(path) is not None
+
+    def purged_by_write(self, path):
+        return path.startswith(self.write_prefixes) or any(pattern.match(path) for pattern in self.write_patterns)
+
+_policies = None
+
+def get_policies():
+    global _policies
+    if _policies is None:
+        _policies = [CachePolicy(config) for config in settings.RESPONSE_CACHE_POLICIES]
+    return _policies
+
+def get_policy(name):
+    for policy in get_policies():
+        if policy.name == name:
+            return policy
+    return None
+
+def find_policy(path):
+    """Only the policies the matching gateway route declares in `cache` are tried."""
+    route = get_route_table().match(path)
+    if route is None:
+        return None
+    for name in route.cache:
+        policy = get_policy(name)
+        if policy is not None and policy.matches(path):
+            return policy
+    return None
+
+def _version_key(policy_name):
+    return f"{KEY_PREFIX}:ver:{policy_name}"
+
+def _policy_version(policy_name):
+    version = cache.get(_version_key(policy_name))
+    if version is None:
+        cache.add(_version_key(policy_name), 1, timeout=None)
+        version = cache.get(_version_key(policy_name), 1)
+    return version
+
+def build_cache_key(policy, request):
+    """
+    Key from the path, the normalized query string, only the X-User-Payload fields the route
+    declares in VARY (so anonymous and logged-in users share entries where they can) and the
+    accepted content codings, because upstream-compressed bodies are stored as they came.
+    """
+    query = urlencode(sorted(parse_qsl(request.META.get('QUERY_STRING', ''), keep_blank_values=True)))
+    payload = getattr(request, 'user_payload', None) or {}
+    identity = ','.join(f"{field}={payload.get(field)}" for field in policy.vary)
+    encodings = ','.join(sorted(accepted_encodings(request.headers.get('Accept-Encoding', ''))))
+    digest = hashlib.sha1(f"{request.path}?{query}|{identity}|{encodings}".encode()).hexdigest()
+    return f"{KEY_PREFIX}:{policy.name}:v{_policy_version(policy.name)}:{digest}"
+
+def get_entry(key):
+    return cache.get(key)
+
+def store_entry(policy, key, status_code, content, content_type, content_encoding=None):
+    entry = {
+        'status': status_code,
+        'content': content,
+        'content_type': content_type,
+        'content_encoding': content_encoding,
+        'stored_at': time.time(),
+    }
+    cache.set(key, entry, timeout=policy.ttl + policy.stale_ttl)
+
+def entry_age(entry):
+    return time.time() - entry['stored_at']
+
+def build_response(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+    if entry.get('content_encoding'):
+        response['Content-Encoding'] = entry['content_encoding']
+        response['Vary'] = 'Accept-Encoding'
+    response['X-Gateway-Cache'] = state
+    response['Age'] = str(int(entry_age(entry)))
+    return response
+
+def refresh_in_background(policy, key, request):
+    """
+    Stale-while-revalidate: re-fetch the entry from the upstream in a daemon thread. A short
+    Redis lock makes sure only one gateway worker refreshes a given key at a time.
+    """
+    lock_key = f"{key}:refresh"
+    if not cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+        return
+
+    upstream = get_upstream(policy.upstream)
+    url = upstream.base_url.rstrip('/') + request.get_full_path()
+    headers = {
+        'Authorization': request.headers.get('Authorization'),
+        'X-User-Payload': request.META.get('HTTP_X_USER_PAYLOAD'),
+    }
+
+    def refresh():
+        try:
+            response = upstream.get(url, headers=headers)
+            if response.status_code == 200:
+                store_entry(policy, key, response.status_code, response.content,
+                            response.headers.get('Content-Type', 'application/json'))
+                logger.debug(f"Refreshed cached response {key}")
+        except Exception as e:
+            logger.warning(f"Background refresh of {url} failed: {str(e)}")
+        finally:
+            cache.delete(lock_key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def purge(policy_names=None):
+    """
+    Invalidate every entry of the given routes (all routes when None) by bumping their version,
+    old entries are never read again and expire on their own.
+    """
+    names = policy_names or [policy.name for policy in get_policies()]
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            cache.set(_version_key(name), 2, timeout=None)
+    logger.info(f"Purged gateway response cache for: {names}")
+    return names
+
+def purge_for_event(routing_key):
+    names = [policy.name for policy in get_policies() if routing_key in policy.events]
+    if names:
+        purge(names)
+    return names
+
+def purge_for_write(path):
+    names = [policy.name for policy in get_policies() if policy.purged_by_write(path)]
+    if names:
+        purge(names)
+    return names
@@ -0,0 +1,35 @@
+from django.http import JsonResponse
+
+from .proxy import Route
+
+# Response transforms. Only routes that really change the upstream body declare one,
+# everything else is forwarded as raw bytes.
+
+def absolute_profile_image(request, response):
+    """The user service returns a relative media path, clients need a URL on the gateway."""
+    json_data = response.json()
+    if json_data.get('image'):
+        json_data['image'] = request.build_absolute_uri('/')[:-1] + json_data['image']
+    return JsonResponse(json_data, status=response.status_code)
+
+# The gateway route table. Exact routes win over prefixes, the longest prefix wins otherwise.
+ROUTES = [
+    Route('user-profile', '/api/v1/users/user/', 'USER', methods=('GET', 'PATCH'), exact=True,
+          transforms={'GET': absolute_profile_image}),
+    Route('users', '/api/v1/users/', 'USER', methods=('GET', 'POST', 'PATCH')),
+    Route('admin', '/api/v1/admin/', 'ADMIN', methods=('GET', 'POST', 'PATCH')),
+    Route('badges', '/api/v1/badges/', 'ADMIN', methods=('GET', 'POST', 'PATCH', 'PUT'),
+          cache=('badges',)),
+    # Stripe verifies the signature over the exact body, which the raw passthrough preserves.
+    Route('stripe-webhook', '/api/v1/courses/stripe/webhook/', 'COURSE', methods=('POST',), exact=True,
+          timeout=10),
+    Route('courses', '/api/v1/courses/', 'COURSE',
+          cache=('course_catalog', 'categories', 'landing')),
+    Route('transactions-pdf', '/api/v1/transactions/admin/pdf/', 'COURSE', methods=('GET',), exact=True,
+          stream_response=True),
+    Route('transactions', '/api/v1/transactions/', 'COURSE'),
+    Route('banners', '/api/v1/banners/', 'COURSE', methods=('GET', 'POST', 'PATCH'),
+          cache=('banners',)),
+    Route('meetings', '/api/v1/meetings/', 'COURSE'),
+    Route('chats', '/api/v1/chats/', 'CHANNEL', methods=('GET', 'POST')),
+]
@@ -1,3 +1,181 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.http import StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase
+
+from . import async_views, response_cache
+from .aggregation import AggregateRoute, aggregate
+from .media_cache import MediaDiskCache
+from .resilience import CircuitBreaker, DEFAULT_BREAKER, CLOSED, HALF_OPEN, OPEN
+from .upstream import UpstreamClient, AsyncUpstreamClient
+
+def half_open_breaker():
+    breaker = CircuitBreaker('TEST', dict(DEFAULT_BREAKER, MIN_CALLS=1, OPEN_SECONDS=0, HALF_OPEN_CALLS=1))
+    breaker.record(True, 0)
+    assert breaker.state == OPEN
+    return breaker
+
+def ok_response():
+    response = requests.Response()
+    response.status_code = 200
+    return response
+
+class HalfOpenProbeTests(SimpleTestCase):
+    def test_probe_rejected_by_full_bulkhead_is_given_back(self):
+        breaker = half_open_breaker()
+        client = UpstreamClient('TEST', 'http://upstream/', breaker=breaker, max_concurrent=1, bulkhead_wait=0)
+        client.bulkhead.acquire()  # another call holds the only slot
+
+        response = client.get('http://upstream/a/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+        client.bulkhead.release()
+        with mock.patch.object(client.session, 'request', return_value=ok_response()):
+            self.assertEqual(client.get('http://upstream/a/').status_code, 200)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_cancelled_probe_is_given_back(self):
+        breaker = half_open_breaker()
+
+        async def scenario():
+            client = AsyncUpstreamClient('TEST', 'http://upstream/', breaker=breaker, max_concurrent=1)
+            started = asyncio.Event()
+
+            async def hang(*args, **kwargs):
+                started.set()
+                await asyncio.sleep(60)
+
+            with mock.patch.object(client.client, 'send', side_effect=hang):
+                task = asyncio.ensure_future(client.request('GET', 'http://upstream/a/'))
+                await started.wait()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            self.assertEqual(breaker.state, HALF_OPEN)
+
+            ok = httpx.Response(200, request=httpx.Request('GET', 'http://upstream/a/'))
+            with mock.patch.object(client.client, 'send', return_value=ok):
+                response = await client.request('GET', 'http://upstream/a/')
+            await client.aclose()
+            return response
+
+        self.assertEqual(asyncio.run(scenario()).status_code, 200)
+        self.assertEqual(breaker.state, CLOSED)
+
+class AggregateDeadlineTests(SimpleTestCase):
+    def test_each_part_is_given_up_on_at_its_own_deadline(self):
+        route = AggregateRoute('test', {'PARTS': {
+            'slow': {'UPSTREAM': 'COURSE', 'PATH': '/slow/', 'TIMEOUT': 0.2},
+            'fast': {'UPSTREAM': 'COURSE', 'PATH': '/fast/', 'TIMEOUT': 5},
+        }})
+
+        def fetch(part, headers):
+            time.sleep(3 if part.name == 'slow' else 0.1)
+            return {'part': part.name}, None
+
+        started = time.monotonic()
+        with mock.patch('api_router.aggregation.fetch_part', side_effect=fetch):
+            result = aggregate(route, RequestFactory().get('/api/v1/bff/test/'))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(result['fast'], {'part': 'fast'})
+        self.assertIsNone(result['slow'])
+        self.assertIn('slow', result['_errors'])
+
+    def test_single_try_request_skips_the_retrying_session(self):
+        client = UpstreamClient('TEST', 'http://upstream/', retries=2)
+        with mock.patch.object(client.session, 'request') as retrying, \
+                mock.patch.object(client.single_try_session, 'request', return_value=ok_response()) as single:
+            self.assertEqual(client.get('http://upstream/a/', retry=False).status_code, 200)
+        retrying.assert_not_called()
+        single.assert_called_once()
+        self.assertEqual(client.single_try_session.get_adapter('http://upstream/').max_retries.total, 0)
+
+def mock_async_upstream(handler):
+    client = AsyncUpstreamClient('TEST', 'http://upstream/')
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+class AsyncProxyBodyTests(SimpleTestCase):
+    def test_video_chunk_over_the_memory_limit_is_streamed(self):
+        body = b'x' * (5 * 1024 * 1024)  # a client video chunk, over DATA_UPLOAD_MAX_MEMORY_SIZE
+        received = {}
+
+        def handler(request):
+            received['headers'] = request.headers
+            received['body'] = request.content
+            return httpx.Response(201, json={'status': 'ok'})
+
+        request = AsyncRequestFactory().post(
+            '/api/v1/courses/upload-chunk/', data=body, content_type='multipart/form-data; boundary=x',
+            headers={'X-User-Payload': ''},
+        )
+        client = mock_async_upstream(handler)
+        with mock.patch.object(async_views, 'get_async_upstream', return_value=client):
+            response = asyncio.run(async_views.gateway_proxy(request))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(received['body']), len(body))
+        self.assertEqual(received['headers']['Content-Length'], str(len(body)))
+        self.assertNotIn('Transfer-Encoding', received['headers'])
+
+    def test_stream_response_route_is_streamed_back(self):
+        async def pdf():
+            yield b'%PDF-1.4 '
+            yield b'report'
+
+        client = mock_async_upstream(lambda request: httpx.Response(
+            200, content=pdf(), headers={'Content-Type': 'application/pdf'}
+        ))
+        request = AsyncRequestFactory().get('/api/v1/transactions/admin/pdf/', headers={'X-User-Payload': ''})
+
+        async def scenario():
+            response = await async_views.gateway_proxy(request)
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        with mock.patch.object(async_views, 'get_async_upstream', return_value=client):
+            response, content = asyncio.run(scenario())
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(content, b'%PDF-1.4 report')
+
+class MediaDiskCacheSizeTests(SimpleTestCase):
+    def on_disk(self, root):
+        return sum(entry.stat().st_size for entry in os.scandir(root) if not entry.name.endswith('.part'))
+
+    def store(self, cache, key, body):
+        writer = cache.writer(key, {'content_type': 'image/png'})
+        writer.write(body)
+        writer.commit()
+
+    def test_overwriting_a_key_keeps_the_size_right(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = MediaDiskCache(root, 10 * 1024 * 1024, 60)
+            for _ in range(5):
+                self.store(cache, 'user/profile/images/a.png', b'x' * 1024)
+            self.assertEqual(cache._size, self.on_disk(root))
+
+    def test_part_files_are_not_counted_at_startup(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.store(MediaDiskCache(root, 10 * 1024 * 1024, 60), 'a.png', b'x' * 1024)
+            with open(os.path.join(root, 'left-by-a-crash.part'), 'wb') as f:
+                f.write(b'x' * 4096)
+            self.assertEqual(MediaDiskCache(root, 10 * 1024 * 1024, 60)._size, self.on_disk(root))
+
+class ResponseCacheWritePurgeTests(SimpleTestCase):
+    def purged_by(self, path):
+        with mock.patch.object(response_cache, 'purge'):
+            return sorted(response_cache.purge_for_write(path))
+
+    def test_only_catalog_writes_purge_the_catalog_and_landing(self):
+        self.assertEqual(self.purged_by('/api/v1/courses/'), ['course_catalog', 'landing'])
+        self.assertEqual(self.purged_by('/api/v1/courses/12/reviews/'), ['course_catalog', 'landing'])
+        self.assertEqual(self.purged_by('/api/v1/courses/categories/3/'), ['categories'])
+        for path in ('/api/v1/courses/lecture/4/submit/', '/api/v1/courses/assessments/4/submit/',
+                     '/api/v1/courses/ad-viewed/4/', '/api/v1/courses/12/reports/', '/api/v1/courses/upload-chunk/'):
+            self.assertEqual(self.purged_by(path), [], path)
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import threading
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from .coalescing import SingleFlight, AsyncSingleFlight, get_coalesce_key_func
+from .resilience import (
+    Bulkhead, AsyncBulkhead, get_breaker, all_breakers, is_failure,
+    unavailable_response, async_unavailable_response,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+class UpstreamClient:
+    """
+    Keep-alive HTTP client for one upstream service. Wraps a requests.Session with a
+    sized connection pool, default (connect, read) timeouts and bounded retries that
+    only apply to idempotent methods (connection failures are retried for every method
+    because nothing has reached the upstream yet). Identical concurrent GETs are coalesced
+    into one upstream call when `coalesce` is on. request(..., retry=False) makes a single attempt,
+    for callers that need the call bounded by its timeout.
+    Calls go through the upstream's circuit breaker and a bulkhead of `max_concurrent` slots;
+    both fail fast with a synthetic 503 response instead of waiting on a struggling service.
+    """
+    def __init__(self, name, base_url, pool_size=20, connect_timeout=3, read_timeout=30,
+                 retries=2, backoff_factor=0.2, retry_methods=DEFAULT_IDEMPOTENT_METHODS, coalesce=False,
+                 breaker=None, max_concurrent=None, bulkhead_wait=0.5):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.single_flight = SingleFlight(name) if coalesce else None
+        self.breaker = breaker
+        self.bulkhead = Bulkhead(name, max_concurrent, bulkhead_wait) if max_concurrent else None
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(retry_methods),
+            raise_on_status=False,  # hand the last upstream response back to the view
+        )
+        self.session = self._make_session(pool_size, retry)
+        # for callers with a hard deadline (aggregate parts), one attempt bounded by the read timeout
+        self.single_try_session = self._make_session(pool_size, Retry(total=0, raise_on_status=False))
+
+    @staticmethod
+    def _make_session(pool_size, retry):
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # The session is shared by every user of the gateway, so never let it remember cookies.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def request(self, method, url, retry=True, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        key = self._coalesce_key(method, url, kwargs) if retry else None
+        if key is None:
+            return self._guarded_request(method, url, retry, **kwargs)
+        # every waiter gets the same Response, its body is already read because stream is off
+        return self.single_flight.do(key, lambda: self._guarded_request(method, url, retry, **kwargs))
+
+    def _guarded_request(self, method, url, retry=True, **kwargs):
+        if self.breaker is not None and not self.breaker.allow():
+            return unavailable_response(self.name, url, 'circuit_open', self.breaker.retry_after())
+        if self.bulkhead is not None and not self.bulkhead.acquire():
+            logger.warning(f"Bulkhead full for {self.name}, rejected {method} {url}")
+            if self.breaker is not None:
+                self.breaker.release_probe()
+            return unavailable_response(self.name, url, 'too_many_requests', 1)
+
+        started = time.monotonic()
+        failed = True
+        try:
+            session = self.session if retry else self.single_try_session
+            response = session.request(method, url, **kwargs)
+            failed = is_failure(response.status_code)
+            return response
+        finally:
+            if self.bulkhead is not None:
+                self.bulkhead.release()
+            if self.breaker is not None:
+                self.breaker.record(failed, time.monotonic() - started)
+
+    def _coalesce_key(self, method, url, kwargs):
+        if self.single_flight is None or method != 'GET':
+            return None
+        return get_coalesce_key_func()(self.name, method, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def __repr__(self):
+        return f"<UpstreamClient {self.name} {self.base_url}>"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_upstream(name):
+    """
+    Return the shared client for an upstream declared in settings.UPSTREAM_SERVICES.
+    Clients are created once per process and reused by every view.
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            config = settings.UPSTREAM_SERVICES[name]
+            client = UpstreamClient(
+                name,
+                config['URL'],
+                pool_size=config.get('POOL_SIZE', 20),
+                connect_timeout=config.get('CONNECT_TIMEOUT', 3),
+                read_timeout=config.get('READ_TIMEOUT', 30),
+                retries=config.get('RETRIES', 2),
+                backoff_factor=config.get('BACKOFF_FACTOR', 0.2),
+                retry_methods=config.get('RETRY_METHODS', DEFAULT_IDEMPOTENT_METHODS),
+                coalesce=config.get('COALESCE_GETS', settings.GATEWAY_COALESCE_GETS),
+                breaker=get_breaker(name),
+                max_concurrent=config.get('MAX_CONCURRENT'),
+                bulkhead_wait=config.get('BULKHEAD_WAIT', 0.5),
+            )
+            logger.info(f"Created upstream client {client!r}, pool size {config.get('POOL_SIZE', 20)}")
+            _clients[name] = client
+    return client
+
+class AsyncUpstreamClient:
+    """
+    Async counterpart of UpstreamClient used by the ASGI gateway mode (api_router/async_views.py).
+    Wraps an httpx.AsyncClient with the same pool size and timeouts. httpx transports only retry
+    connection failures, which is the safe subset of UpstreamClient's retry policy.
+    """
+    def __init__(self, name, base_url, pool_size=20, connect_timeout=3, read_timeout=30, retries=2, coalesce=False,
+                 breaker=None, max_concurrent=None, bulkhead_wait=0.5):
+        self.name = name
+        self.base_url = base_url
+        self.single_flight = AsyncSingleFlight(name) if coalesce else None
+        self.breaker = breaker
+        self.bulkhead = AsyncBulkhead(name, max_concurrent, bulkhead_wait) if max_concurrent else None
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=retries),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # same reasoning as UpstreamClient: the client is shared between users, never store cookies
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            follow_redirects=False,
+        )
+
+    async def request(self, method, url, stream=False, **kwargs):
+        """
+        With stream=True the body isn't read, the caller iterates it (aiter_raw) and closes
+        the response; such calls are never coalesced.
+        """
+        key = None
+        if self.single_flight is not None and method == 'GET' and not stream:
+            key = get_coalesce_key_func()(self.name, method, url, kwargs)
+        if key is None:
+            return await self._guarded_request(method, url, stream, **kwargs)
+        return await self.single_flight.do(key, lambda: self._guarded_request(method, url, **kwargs))
+
+    async def _guarded_request(self, method, url, stream=False, **kwargs):
+        if self.breaker is not None and not self.breaker.allow():
+            return async_unavailable_response(self.name, url, 'circuit_open', self.breaker.retry_after())
+        try:
+            acquired = self.bulkhead is None or await self.bulkhead.acquire()
+        except asyncio.CancelledError:
+            if self.breaker is not None:
+                self.breaker.release_probe()
+            raise
+        if not acquired:
+            logger.warning(f"Bulkhead full for {self.name}, rejected {method} {url}")
+            if self.breaker is not None:
+                self.breaker.release_probe()
+            return async_unavailable_response(self.name, url, 'too_many_requests', 1)
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            failed = is_failure(response.status_code)
+            return response
+        except asyncio.CancelledError:
+            failed = None  # the client went away, says nothing about the upstream
+            raise
+        finally:
+            if self.bulkhead is not None:
+                self.bulkhead.release()
+            if self.breaker is not None:
+                if failed is None:
+                    self.breaker.release_probe()
+                else:
+                    self.breaker.record(failed, time.monotonic() - started)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def __repr__(self):
+        return f"<AsyncUpstreamClient {self.name} {self.base_url}>"
+
+_async_clients = {}
+
+def get_async_upstream(name):
+    """
+    Return the async client for an upstream, bound to the running event loop. Under an ASGI
+    server there is one loop per process, so each client is created once and reused. Clients
+    made for another loop (e.g. async_to_sync under runserver) are replaced instead of reused.
+    """
+    loop = asyncio.get_running_loop()
+    cached = _async_clients.get(name)
+    if cached is not None and cached[0] is loop:
+        return cached[1]
+
+    config = settings.UPSTREAM_SERVICES[name]
+    client = AsyncUpstreamClient(
+        name,
+        config['URL'],
+        pool_size=config.get('POOL_SIZE', 20),
+        connect_timeout=config.get('CONNECT_TIMEOUT', 3),
+        read_timeout=config.get('READ_TIMEOUT', 30),
+        retries=config.get('RETRIES', 2),
+        coalesce=config.get('COALESCE_GETS', settings.GATEWAY_COALESCE_GETS),
+        breaker=get_breaker(name),
+        max_concurrent=config.get('MAX_CONCURRENT'),
+        bulkhead_wait=config.get('BULKHEAD_WAIT', 0.5),
+    )
+    logger.info(f"Created async upstream client {client!r}")
+    _async_clients[name] = (loop, client)
+    return client
+
+def coalescing_stats():
+    """Hit/miss counters of the request coalescing layer, per upstream and stack (sync/async)."""
+    stats = {}
+    for name, client in list(_clients.items()):
+        if client.single_flight is not None:
+            stats.setdefault(name, {})['sync'] = client.single_flight.stats()
+    for name, (loop, client) in list(_async_clients.items()):
+        if client.single_flight is not None:
+            stats.setdefault(name, {})['async'] = client.single_flight.stats()
+    return stats
+
+def upstream_health():
+    """Circuit breaker and bulkhead state of every upstream used so far in this process."""
+    health = {name: {'breaker': breaker.stats()} for name, breaker in all_breakers().items()}
+    for name, client in list(_clients.items()):
+        if client.bulkhead is not None:
+            health.setdefault(name, {})['bulkhead'] = client.bulkhead.stats()
+    for name, (loop, client) in list(_async_clients.items()):
+        if client.bulkhead is not None:
+            health.setdefault(name, {})['async_bulkhead'] = client.bulkhead.stats()
+    return health
@@ -1,22 +1,16 @@
+from django.conf import settings
 from django.urls import path, re_path
-from . import views
+from . import views, proxy, async_views
+
+# In async mode (ASGI server) the proxied routes are served by the async engine.
+gateway_proxy = async_views.gateway_proxy if settings.GATEWAY_ASYNC_MODE else proxy.gateway_proxy
 
 urlpatterns = [
     path('v1/hello/', views.SimpleAPIView.as_view(), name='simple-api'),
-    path('v1/users/user/', views.UserProfileGateway.as_view(), name='user-profile'),
-    path('v1/badges/', views.BadgeGateway.as_view(), name="admin-badge"),
-    path('v1/badges/<int:id>/', views.SingleBadgeGateway.as_view(), name="admin-badge-single"),
-    path('v1/courses/', views.BasicCouseCreationGateway.as_view(), name="course-creation"),
-    path('v1/courses/upload-chunk/', views.CourseVideoChunkingGateway.as_view(), name="chunk-upload"),
-    path('v1/courses/section-items/', views.BasicCouseCreationGateway.as_view(), name="sectionItem-creation"),
-    path('v1/courses/stripe/webhook/', views.proxy_to_course_web_hook, name="stripe-webhook"), # webhook request's bodyshould be passed to course service as it is without manipulation or parsing, otherwise the verification will fail.
-    
-    re_path(r'^v1/users/.*$', views.proxy_to_user_service, name='proxy-user'),
-    re_path(r'^v1/admin/.*$', views.proxy_to_admin_service, name='proxy-admin'),
-    re_path(r'^v1/badges/.*$', views.proxy_to_badges_service, name='proxy-badges'),
-    re_path(r'^v1/courses/.*$', views.proxy_to_course_service, name='proxy-course'),
-    re_path(r'^v1/transactions/.*$', views.proxy_to_course_service, name='proxy-transactions'),
-    re_path(r'^v1/banners/.*$', views.BannersGateway.as_view(), name="banner-creation"),
-    re_path(r'^v1/meetings/.*$', views.proxy_to_course_service, name='proxy-meetings'),
-    re_path(r'^v1/chats/.*$', views.proxy_to_chat_service, name="proxy-channel"),    
+    path('v1/bff/<str:name>/', views.AggregateView.as_view(), name='aggregate'),
+    path('v1/gateway/status/', views.GatewayStatusView.as_view(), name='gateway-status'),
+    path('v1/gateway/cache/purge/', views.ResponseCachePurgeView.as_view(), name='gateway-cache-purge'),
+
+    # Everything else under v1/ is dispatched by the route table (api_router/routes.py).
+    re_path(r'^v1/', gateway_proxy, name='gateway-proxy'),
 ]
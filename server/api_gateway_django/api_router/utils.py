@@ -1,13 +1,41 @@
+# Hop-by-hop headers and the ones the upstream client sets itself.
+EXCLUDED_HEADERS = {
+    'host', 'content-length', 'content-type', 'connection', 'keep-alive', 'transfer-encoding',
+    'te', 'upgrade',
+}
+
 def get_forwarded_headers(request):
     headers = {
         key: value
         for key, value in request.headers.items()
-        if key.lower() not in ['host', 'content-length', 'content-type']
+        if key.lower() not in EXCLUDED_HEADERS
     }
 
     headers['Content-Type'] = request.headers.get('Content-Type', 'application/json')
+    # Only ask the upstream for codings the client can take, its body may be passed through as is.
+    headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
 
     user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
     headers['X-User-Payload'] = user_payload
 
     return headers
+
+
+def is_multipart(request):
+    return request.META.get('CONTENT_TYPE', '').startswith('multipart/form-data')
+
+class RequestBodyStream:
+    """
+    File-like view over the incoming request body. The upstream client reads it in small
+    blocks while sending, so an upload is never parsed or buffered at the gateway.
+    __len__ lets requests send a Content-Length instead of a chunked body.
+    """
+    def __init__(self, request):
+        self.request = request
+        self.length = int(request.META.get('CONTENT_LENGTH') or 0)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.request.read(size)
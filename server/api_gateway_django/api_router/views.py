@@ -2,257 +2,42 @@ import requests
 import os
 import logging
 
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.conf import settings
-from django.shortcuts import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.utils.http import parse_http_date_safe
 
-from rest_framework.decorators import api_view
-from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
-from .utils import get_forwarded_headers
+from .upstream import get_upstream, coalescing_stats, upstream_health
+from .media_cache import get_media_cache
+from . import response_cache
+from .aggregation import get_aggregate_route, aggregate
+from api_gateway.middleware.token_cache import get_token_cache
 
 logger = logging.getLogger(__name__)
 
-# URLs of the other services
-USER_SERVICE_URL = os.getenv('USER_SERVICE_URL')
-#'http://host.docker.internal:8001/' # 'http://localhost:8001/'  
-ADMIN_SERVICE_URL = os.getenv('ADMIN_SERVICE_URL')
-# 'http://host.docker.internal:8002/' # 'http://localhost:8002/'
-COURSE_SERVICE_URL = os.getenv('COURSE_SERVICE_URL') 
-# 'http://host.docker.internal:8003/' # 'http://localhost:8003/'
-CHANNEL_SERVICE_URL = os.getenv('CHANNEL_SERVICE_URL') 
-# 'http://host.docker.internal:8004/' # 'http://localhost:8004/'
+# Every proxied API route is served by the route-table engine in proxy.py (routes in routes.py).
+# The views below are the gateway's own endpoints.
 
-# proxy to User Service User Profile - contains media files
-class UserProfileGateway(APIView):
-    parser_classes = [MultiPartParser, FormParser, JSONParser]  # Forward multipart data
-
-    def get(self, request):
-        url = USER_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")  # Forward JWT
-        }
-        logger.info(f"GET request to UserProfileGateway: {url}")
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()  # Raise exception for 4xx/5xx
-            json_data = response.json() 
-            logger.debug(f"Response from user service: {json_data}")
-            if json_data.get('image'):
-                json_data['image'] = request.build_absolute_uri('/')[:-1] + json_data['image']
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch profile from {url}: {str(e)}")
-            return Response({"error": "Failed to fetch profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def patch(self, request):
-        url = USER_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        # Forward files and data
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"PATCH request to UserProfileGateway: {url}, Files: {files.keys()}, Data: {data}")
-        try:
-            response = requests.patch(url, headers=headers, data=data, files=files)
-            response.raise_for_status()  # Raise exception for 4xx/5xx
-            logger.info(f"Successful PATCH response: {response.status_code}")
-            return Response(response.json(), status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to update profile at {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
-# Proxy view to User Service
-@api_view(['GET', 'POST', 'PATCH'])
-def proxy_to_user_service(request):
-    url = USER_SERVICE_URL + request.path
-    query_params = request.GET.urlencode()  # Get query parameters as a URL-encoded string
-    if query_params:
-        url = f"{url}?{query_params}"  # Append the query parameters to the URL
-    logger.info(f"Proxy to user service: {request.method} {url}, Data: {request.data}, Files: {request.FILES.keys()}")
-    response = requests.request(
-        method=request.method,
-        url=url,
-        headers=request.headers,
-        json=request.data,
-    )
-    logger.debug(f"User service response: {response.status_code}, Content: {response.content}")    
-    return HttpResponse(
-        response.content,
-        status=response.status_code,
-        content_type=response.headers['Content-Type']
-    )
-
-# Proxy view to Product Service
-@api_view(['GET', 'POST', 'PATCH'])
-def proxy_to_admin_service(request):
-    url = ADMIN_SERVICE_URL[:-1] + request.path
-    query_params = request.GET.urlencode()
-    if query_params:
-        url = f"{url}?{query_params}"
-    logger.info(f"Proxy to admin service: {request.method} {url}")
-    response = requests.request(
-        method=request.method,
-        url=url,
-        headers=request.headers,
-        json=request.data,
-    )
-    logger.debug(f"Admin service response: {response.status_code}, Content: {response.content}")
-    return HttpResponse(
-        response.content,
-        status=response.status_code,
-        content_type=response.headers['Content-Type']
-    )
-
-@api_view(['GET', 'POST', 'PATCH', 'PUT'])
-def proxy_to_badges_service(request):
-    url = ADMIN_SERVICE_URL[:-1] + request.path
-    query_params = request.GET.urlencode()
-    if query_params:
-        url = f"{url}?{query_params}"
-    logger.info(f"Proxy to badges service: {request.method} {url}, Files: {request.FILES.keys()}, Data: {request.POST}")
-    headers = {key: value for key, value in request.headers.items() if key.lower() not in ['host', 'content-length', 'content-type']}
-    headers['Content-Type'] = request.headers.get('Content-Type')  # Preserve original Content-Type
-
-    if request.method in ['POST', 'PATCH']:
-        if request.FILES or 'multipart/form-data' in request.headers.get('Content-Type', ''):
-            files = {key: (file.name, file, file.content_type) for key, file in request.FILES.items()}
-            data = request.POST  # Pass QueryDict directly instead of dict()
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                data=data,  # Use QueryDict to preserve structure
-                files=files,
-            )
-        else:
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                json=request.data,
-            )
-    else:
-        response = requests.request(
-            method=request.method,
-            url=url,
-            headers=headers,
-        )
-
-    logger.debug(f"Badges service response: {response.status_code}, Content: {response.text}")
-    return HttpResponse(
-        response.content,
-        status=response.status_code,
-        content_type=response.headers.get('Content-Type', 'application/json'),
-    )
-
-class BadgeGateway(APIView):
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
-
-    def get(self, request):
-        url = ADMIN_SERVICE_URL + request.path
-        query_params = request.GET.urlencode()
-        if query_params:
-            url = f"{url}?{query_params}"
-        logger.info(f"GET request to BadgeGateway: {url}")
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.debug(f"Badge service response: {response.status_code}, Content: {json_data}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch badge from {url}: {str(e)}")
-            return Response({"error": "Failed to fetch profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def post(self, request):
-        url = ADMIN_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"POST request to BadgeGateway: {url}, Files: {files.keys()}, Data: {data}")
-        try:
-            response = requests.post(url, headers=headers, data=data, files=files)
-            logger.info(f"Successful POST response: {response.status_code}")
-            response.raise_for_status()
-            return Response({'message': 'user updated successfully'}, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to update badge at {url}: {str(e)}")
-            try:
-                error_data = response.json()  # Try to parse error details
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-class SingleBadgeGateway(APIView):
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
-
-    def get(self, request, id):
-        url = ADMIN_SERVICE_URL + request.path
-        query_params = request.GET.urlencode()
-        if query_params:
-            url = f"{url}?{query_params}"
-        logger.info(f"GET request to SingleBadgeGateway: {url}")
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.debug(f"Single badge response: {response.status_code}, Content: {json_data}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch single badge from {url}: {str(e)}")
-            return Response({"error": "Failed to fetch profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def patch(self, request, id):
-        url = ADMIN_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"PATCH request to SingleBadgeGateway: {url}, Files: {files.keys()}, Data: {data}")
-        try:
-            response = requests.patch(url, headers=headers, data=data, files=files)
-            logger.info(f"Successful PATCH response: {response.status_code}")
-            response.raise_for_status()
-            return Response({'message': 'user updated successfully'}, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to update single badge at {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+# Pooled keep-alive clients, one per upstream. Never call requests.* directly from a view.
+user_service = get_upstream('USER')
+admin_service = get_upstream('ADMIN')
 
 class MediaProxyView(APIView):
     SERVICE_MAP = {
-        'user': USER_SERVICE_URL,
-        'admin': ADMIN_SERVICE_URL,
+        'user': user_service,
+        'admin': admin_service,
     }
+    # Request headers forwarded so the origin can answer with 206 / 304 itself.
+    CONDITIONAL_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+    # Upstream response headers passed back to the client.
+    PASSTHROUGH_HEADERS = (
+        'Content-Length', 'Content-Range', 'Content-Encoding', 'Accept-Ranges',
+        'ETag', 'Last-Modified', 'Cache-Control', 'Expires',
+    )
+    CHUNK_SIZE = 64 * 1024
 
     def get(self, request, path):
         # Split path to extract service prefix (e.g., 'user/profile/images/...')
@@ -261,389 +46,145 @@ class MediaProxyView(APIView):
             return Response({"error": "Invalid media path"}, status=status.HTTP_400_BAD_REQUEST)
 
         service_prefix = parts[0]
-        base_url = self.SERVICE_MAP.get(service_prefix)
+        upstream = self.SERVICE_MAP.get(service_prefix)
 
-        if not base_url:
+        if not upstream:
             logger.warning(f"Service not found for prefix: {service_prefix}")
             return Response({"error": "Service not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        media_url = f"{base_url}media/{path}"
+        # Partial requests always go to the origin, only full bodies are cached on disk.
+        media_cache = get_media_cache(settings)
+        cacheable = media_cache is not None and 'Range' not in request.headers
+        if cacheable:
+            cached = media_cache.get(path)
+            if cached:
+                logger.debug(f"Media cache hit: {path}")
+                return self.cached_response(request, path, *cached)
+
+        media_url = f"{upstream.base_url}media/{path}"
         logger.info(f"GET request to MediaProxyView: {media_url}")
-        headers = {"Authorization": request.headers.get("Authorization")}
+        # the disk cache serves every client, so never store a body in a coding some can't read
+        headers = {"Authorization": request.headers.get("Authorization"), "Accept-Encoding": "identity"}
+        for header in self.CONDITIONAL_HEADERS:
+            if header in request.headers:
+                headers[header] = request.headers[header]
         try:
-            response = requests.get(media_url, headers=headers, stream=True)
-            response.raise_for_status()
-            logger.debug(f"Media service response: {response.status_code}, Content-Type: {response.headers['Content-Type']}")
-            return HttpResponse(response.content, content_type=response.headers['Content-Type'])
+            response = upstream.get(media_url, headers=headers, stream=True)
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch media from {media_url}: {str(e)}")
             return Response({"error": "Media not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-@api_view(['GET', 'POST', 'PATCH', 'PUT', 'DELETE'])
-def proxy_to_course_service(request):
-    url = COURSE_SERVICE_URL[:-1] + request.path
-    query_params = request.GET.urlencode()
-    if query_params:
-        url = f"{url}?{query_params}"
-    logger.info(f"Proxy to course service: {request.method} {url}, Files: {request.FILES.keys()}, Data: {request.data}")
-    headers = get_forwarded_headers(request)
-
-    if request.method in ['POST', 'PATCH']:
-        if request.FILES or 'multipart/form-data' in request.headers.get('Content-Type', ''):
-            files = {key: (file.name, file, file.content_type) for key, file in request.FILES.items()}
-            data = request.POST
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                data=data,
-                files=files,
-            )
-        else:
-            logger.debug("Not multipart data, sending JSON")
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                json=request.data,
-            )
-    else:
-        response = requests.request(
-            method=request.method,
-            url=url,
-            headers=headers,
-        )
-
-    if response.status_code == 204:
-        logger.info("Received 204 No Content response")
-        return Response(status=response.status_code)
 
-    # Get Content-Type from response - because in course service, we have a view that returns a file response.
-    content_type = response.headers.get('Content-Type', 'application/json')
-    logger.debug(f"Response Content-Type: {content_type}")
+        if response.status_code >= 400:
+            response.close()
+            logger.error(f"Failed to fetch media from {media_url}: status {response.status_code}")
+            return Response({"error": "Media not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Handle binary content (e.g., PDF)
-    if 'application/pdf' in content_type:
-        logger.info("Handling PDF response")
-        django_response = HttpResponse(
-            content=response.content,
+        logger.debug(f"Media service response: {response.status_code}, Content-Type: {response.headers.get('Content-Type')}")
+        if response.status_code == 304:
+            response.close()
+            return self.copy_headers(HttpResponse(status=304), response.headers)
+
+        writer = None
+        if cacheable and response.status_code == 200:
+            writer = media_cache.writer(path, {
+                'content_type': response.headers.get('Content-Type'),
+                'content_encoding': response.headers.get('Content-Encoding'),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'cache_control': response.headers.get('Cache-Control'),
+            })
+        streaming_response = StreamingHttpResponse(
+            self.stream_upstream(response, writer),
             status=response.status_code,
-            content_type=content_type,
+            content_type=response.headers.get('Content-Type'),
         )
-        # Preserve Content-Disposition header if present
-        if 'Content-Disposition' in response.headers:
-            django_response['Content-Disposition'] = response.headers['Content-Disposition']
-        return django_response
-
-    # IMP: it would be better to manage it like below in all the proxy views. in this view keep the above if /pdf as well.
-    # # Handle JSON content
-    # if 'application/json' in content_type:
-    #     return Response(
-    #         data=response.json(),
-    #         status=response.status_code,
-    #         content_type=content_type,
-    #     )
-
-    # # Fallback for other content types
-    # return HttpResponse(
-    #     content=response.content,
-    #     content_type=content_type,
-    #     status=response.status_code
-    # )
-
-    logger.debug(f"Course service response: {response.status_code}, Content: {response.json() if 'application/json' in content_type else response.content}")
-    return Response(
-        data=response.json() if 'application/json' in response.headers.get('Content-Type', '') else response.content,
-        status=response.status_code,
-        content_type=response.headers.get('Content-Type', 'application/json'),
-    )
-
-class BasicCouseCreationGateway(APIView):
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
-
-    def get(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        query_params = request.GET.urlencode()
-        if query_params:
-            url = f"{url}?{query_params}"
-        logger.info(f"GET request to BasicCouseCreationGateway: {url}")
-        headers = get_forwarded_headers(request)
-
+        return self.copy_headers(streaming_response, response.headers)
+
+    def stream_upstream(self, response, writer=None):
+        """
+        Yield the upstream body as it arrives, without decoding it. When a cache writer is given
+        the chunks are also written to disk and committed only if the whole body was streamed.
+        """
+        completed = False
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.debug(f"Course service response: {response.status_code}, Content: {json_data}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch course details from {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to fetch course details"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def post(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
-        headers['X-User-Payload'] = user_payload
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"POST request to BasicCouseCreationGateway: {url}, Files: {files.keys()}, Data: {data}")
-        try:
-            response = requests.post(url, headers=headers, data=data, files=files)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.debug(f"Successful POST response: {response.status_code}, content: {json_data}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to update profile at {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-    def patch(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
-        headers['X-User-Payload'] = user_payload
-        
-        # Determine if it's multipart or JSON data
-        files = request.FILES
-        if files:  # Multipart data (thumbnail upload)
-            data = request.POST
-            logger.info(f"PATCH request to BasicCouseCreationGateway (multipart): {url}, Files: {files.keys()}, Data: {data}")
-            try:
-                response = requests.patch(url, headers=headers, data=data, files=files)
-                response.raise_for_status()
-                json_data = response.json()
-                logger.info(f"Successful PATCH response: {response.status_code}, content: {json_data}")
-                return Response(json_data, status=response.status_code)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to update course at {url}: {str(e)}")
-                try:
-                    error_data = response.json()
-                    return Response(error_data, status=response.status_code)
-                except (ValueError, AttributeError):
-                    return Response({"error": "Failed to update course"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:  # JSON data (course details)
-            data = request.data
-            logger.info(f"PATCH request to BasicCouseCreationGateway (JSON): {url}, Data: {data}")
-            try:
-                response = requests.patch(url, headers=headers, json=data)
-                response.raise_for_status()
-                json_data = response.json()
-                logger.info(f"Successful PATCH response: {response.status_code}")
-                return Response(json_data, status=response.status_code)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to update course at {url}: {str(e)}")
-                try:
-                    error_data = response.json()
-                    return Response(error_data, status=response.status_code)
-                except (ValueError, AttributeError):
-                    return Response({"error": "Failed to update course"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-class CourseVideoChunkingGateway(APIView):
-    parser_classes = (MultiPartParser, FormParser)
-    def post(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
-        headers['X-User-Payload'] = user_payload
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"POST request to CourseVideoChunkingGateway: {url}, Files: {list(files.keys())}, Data: {data}")
-        try:
-            response = requests.post(url, headers=headers, data=data, files=files)
-            logger.info(f"Successful POST response: {response.status_code}")
-            response.raise_for_status()
-            json_data = response.json()
-            return Response(json_data, status=response.status_code)
-        except requests.exceptions.RequestException as e:
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for chunk in response.raw.stream(self.CHUNK_SIZE, decode_content=False):
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            response.close()
+            if writer:
+                writer.commit() if completed else writer.discard()
+
+    def copy_headers(self, django_response, upstream_headers):
+        for header in self.PASSTHROUGH_HEADERS:
+            if header in upstream_headers:
+                django_response[header] = upstream_headers[header]
+        return django_response
 
-@csrf_exempt
-@api_view(['POST'])
-def proxy_to_course_web_hook(request):
-    url = COURSE_SERVICE_URL[:-1] + request.path
-    query_params = request.GET.urlencode()
-    if query_params:
-        url = f"{url}?{query_params}"
-    logger.info(f"Proxy to course webhook: {url}, Method: {request.method}")
-    headers = get_forwarded_headers(request)
-    try:
-        # Forward raw body without parsing
-        response = requests.post(
-            url=url,
-            headers=headers,
-            data=request.body,  # Use raw body other wise signature verification will fail
-            timeout=10
+    def cached_response(self, request, path, body_path, meta):
+        etag = meta.get('etag')
+        last_modified = meta.get('last_modified')
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+        not_modified = (
+            (etag and if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')])
+            or (not if_none_match and last_modified and if_modified_since
+                and if_modified_since >= (parse_http_date_safe(last_modified) or 0))
         )
-        logger.info(f"Webhook response: {response.status_code}, Content: {response.content}")
-        return Response(
-            data=response.content,
-            status=response.status_code,
-            content_type=response.headers.get('Content-Type', 'application/json'),
-        )
-    except requests.RequestException as e:
-        logger.error(f"Webhook proxy error at {url}: {str(e)}")
-        return Response({'detail': 'Webhook proxy failed'}, status=500)
-
-class BannersGateway(APIView):
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
-
-    def get(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        query_params = request.GET.urlencode()
-        if query_params:
-            url = f"{url}?{query_params}"
-        logger.info(f"GET request to BannersGateway: {url}")
-        headers = get_forwarded_headers(request)
-
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.debug(f"Banners response: {response.status_code}, Content: {json_data}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch course details from {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to fetch course details"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def post(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
-        headers['X-User-Payload'] = user_payload
-        files = request.FILES
-        data = request.POST if files else request.data
-        logger.info(f"POST request to BannersGateway: {url}, Files: {files.keys()}, Data: {data}")
-
-        try:
-            response = requests.post(url, headers=headers, data=data, files=files)
-            response.raise_for_status()
-            json_data = response.json()
-            logger.info(f"Successful POST response: {json_data}, Status: {response.status_code}")
-            return Response(json_data, status=response.status_code)
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to update at {url}: {str(e)}")
-            try:
-                error_data = response.json()
-                return Response(error_data, status=response.status_code)
-            except (ValueError, AttributeError):
-                return Response({"error": "Failed to update profile"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-    def patch(self, request):
-        url = COURSE_SERVICE_URL + request.path
-        headers = {
-            "Authorization": request.headers.get("Authorization")
-        }
-        user_payload = request.META.get('HTTP_X_USER_PAYLOAD')
-        headers['X-User-Payload'] = user_payload
-        
-        # Determine if it's multipart or JSON data
-        files = request.FILES
-        if files:  # Multipart data (thumbnail upload)
-            data = request.POST
-            logger.info(f"PATCH request to BannersGateway (multipart): {url}, Files: {files.keys()}, Data: {data}")
-            try:
-                response = requests.patch(url, headers=headers, data=data, files=files)
-                response.raise_for_status()
-                json_data = response.json()
-                logger.info(f"Successful PATCH response: {json_data}, Status: {response.status_code}")
-                return Response(json_data, status=response.status_code)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to update at {url}: {str(e)}")
-                try:
-                    error_data = response.json()
-                    return Response(error_data, status=response.status_code)
-                except (ValueError, AttributeError):
-                    return Response({"error": "Failed to update course"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:  # JSON data (course details)
-            data = request.data
-            logger.info(f"PATCH request to BannersGateway (JSON): {url}, Data: {data}")
-            try:
-                response = requests.patch(url, headers=headers, json=data)
-                response.raise_for_status()
-                json_data = response.json()
-                logger.info(f"Successful PATCH response: {json_data}, Status: {response.status_code}")
-                return Response(json_data, status=response.status_code)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to update at {url}: {str(e)}")
-                try:
-                    error_data = response.json()
-                    return Response(error_data, status=response.status_code)
-                except (ValueError, AttributeError):
-                    return Response({"error": "Failed to update course"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-@api_view(['GET', 'POST'])
-def proxy_to_chat_service(request):
-    url = CHANNEL_SERVICE_URL[:-1] + request.path
-    query_params = request.GET.urlencode()
-    if query_params:
-        url = f"{url}?{query_params}"
-    logger.info(f"Proxy to chat service: {request.method} {url}, Files: {request.FILES.keys()}, Data: {request.data}")
-    headers = get_forwarded_headers(request)
-
-    if request.method in ['POST', 'PATCH']:
-        if request.FILES or 'multipart/form-data' in request.headers.get('Content-Type', ''):
-            files = {key: (file.name, file, file.content_type) for key, file in request.FILES.items()}
-            data = request.POST  # Pass QueryDict directly instead of dict()
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                data=data,  # Use QueryDict to preserve structure
-                files=files,
-            )
+        if not_modified:
+            django_response = HttpResponse(status=304)
         else:
-            logger.debug("Not multipart data, sending JSON")
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                json=request.data,
+            django_response = FileResponse(
+                open(body_path, 'rb'),
+                content_type=meta.get('content_type'),
+                filename=os.path.basename(path),
             )
-    else:
-        response = requests.request(
-            method=request.method,
-            url=url,
-            headers=headers,
-        )
-
-    if response.status_code == 204:
-        logger.info("Received 204 No Content response")
-        return Response(status=response.status_code)
+            if meta.get('content_encoding'):
+                django_response['Content-Encoding'] = meta['content_encoding']
+        for header, key in (('ETag', 'etag'), ('Last-Modified', 'last_modified'), ('Cache-Control', 'cache_control')):
+            if meta.get(key):
+                django_response[header] = meta[key]
+        return django_response
 
-    logger.debug(f"Chat service response: {response.status_code}, Content: {response.json() if 'application/json' in response.headers.get('Content-Type', '') else response.content}")
-    return Response(
-        data=response.json() if 'application/json' in response.headers.get('Content-Type', '') else response.content,
-        status=response.status_code,
-        content_type=response.headers.get('Content-Type', 'application/json'),
-    )
+# Backend-for-frontend composite routes, one round-trip for a whole page (settings.AGGREGATE_ROUTES)
+class AggregateView(APIView):
+    def get(self, request, name):
+        route = get_aggregate_route(name)
+        if route is None:
+            return Response({"error": "Unknown aggregate route"}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f"Aggregate request: {name}")
+        return Response(aggregate(route, request._request), status=status.HTTP_200_OK)
+
+# Explicit purge of the gateway response cache - admin only
+class ResponseCachePurgeView(APIView):
+    def post(self, request):
+        user_payload = getattr(request._request, 'user_payload', None)
+        if not user_payload or not user_payload.get('is_admin'):
+            return Response({"error": "Only admin can purge the cache"}, status=status.HTTP_403_FORBIDDEN)
+
+        routes = request.data.get('routes') or None
+        known_routes = {policy.name for policy in response_cache.get_policies()}
+        if routes and not set(routes) <= known_routes:
+            return Response({"error": f"Unknown routes. Use: {sorted(known_routes)}"}, status=status.HTTP_400_BAD_REQUEST)
+        purged = response_cache.purge(routes)
+        logger.info(f"Gateway response cache purged: {purged}")
+        return Response({'purged': purged}, status=status.HTTP_200_OK)
+
+# Internal counters of the gateway - admin only
+class GatewayStatusView(APIView):
+    def get(self, request):
+        user_payload = getattr(request._request, 'user_payload', None)
+        if not user_payload or not user_payload.get('is_admin'):
+            return Response({"error": "Only admin can view the gateway status"}, status=status.HTTP_403_FORBIDDEN)
+
+        token_cache = get_token_cache()
+        return Response({
+            'upstreams': upstream_health(),
+            'coalescing': coalescing_stats(),
+            'token_cache': token_cache.stats() if token_cache else None,
+        }, status=status.HTTP_200_OK)
 
 class SimpleAPIView(APIView):
     def get(self, request):
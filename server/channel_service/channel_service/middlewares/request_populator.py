@@ -1,6 +1,10 @@
 import ast
 import logging
 
+from django.conf import settings
+
+from .user_context import decode_user_context, UserContextError
+
 # Configure logging to show messages in the console
 logging.basicConfig(
     level=logging.DEBUG,  # Set to DEBUG to see all messages
@@ -12,10 +16,11 @@ logger = logging.getLogger(__name__)
 class RequestPopulatorMiddleware:
     """
     Middleware to populate the request object with user payload from the 
-    'X-User-Payload' header sent by the API gateway. The payload is expected 
-    to be a valid Python literal (e.g., dict, list, str, int) parseable by 
-    ast.literal_eval. If the header is missing or invalid, request.user_payload 
-    is set to None.
+    'X-User-Payload' header sent by the API gateway. The header is the compact 
+    signed user context built by the gateway (see user_context.py). While 
+    USER_CONTEXT_ACCEPT_LEGACY is on, the old str(dict) format is still parsed 
+    with ast.literal_eval. If the header is missing or invalid, 
+    request.user_payload is set to None.
     """
     def __init__(self, get_response):
         self.get_response = get_response
@@ -34,13 +39,22 @@ class RequestPopulatorMiddleware:
             request.user_payload = None
         else:
             try:
-                # Safely parse the payload string into a Python object
-                user_payload = ast.literal_eval(user_payload_str)
-                request.user_payload = user_payload
-                # logger.debug(f"User Payload successfully parsed: {request.user_payload}")
-            except (ValueError, SyntaxError) as e:
-                logger.warning(f"Failed to parse user payload: {user_payload_str}. Error: {e}")
-                request.user_payload = None
+                request.user_payload = decode_user_context(user_payload_str)
+            except UserContextError as e:
+                if settings.USER_CONTEXT_ACCEPT_LEGACY and user_payload_str.startswith('{'):
+                    request.user_payload = self.parse_legacy_payload(user_payload_str)
+                else:
+                    logger.warning(f"Rejected user payload: {e}")
+                    request.user_payload = None
         
         # Proceed to the next middleware or view
         return self.get_response(request)
+
+    def parse_legacy_payload(self, user_payload_str):
+        try:
+            # Safely parse the payload string into a Python object
+            return ast.literal_eval(user_payload_str)
+        except (ValueError, SyntaxError) as e:
+            # Handle invalid payload gracefully
+            logger.warning(f"Failed to parse user payload: {user_payload_str}. Error: {e}")
+            return None
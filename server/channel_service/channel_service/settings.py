@@ -14,6 +14,7 @@ import os
 import sys
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 from mongoengine import connect
 
@@ -59,6 +60,14 @@ SIMPLE_JWT = {
     'ALGORITHM': os.getenv('JWT_ALGORITHM_USER'),
 }
 
+# Key for verifying the X-User-Payload user context signed by the API gateway (same value as the gateway).
+# USER_CONTEXT_ACCEPT_LEGACY also accepts the old unsigned str(dict) header, only for rolling upgrades.
+USER_CONTEXT_SECRET = os.getenv('USER_CONTEXT_SECRET')
+if not USER_CONTEXT_SECRET:
+    # every request carrying the header would otherwise fail with an unexplained 500
+    raise ImproperlyConfigured('USER_CONTEXT_SECRET must be set, it is the key of the signed X-User-Payload user context')
+USER_CONTEXT_ACCEPT_LEGACY = os.getenv('USER_CONTEXT_ACCEPT_LEGACY') == 'True'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
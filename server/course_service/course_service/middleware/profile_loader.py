@@ -0,0 +1,16 @@
+from courses.profiles import ProfileLoader, current_loader
+
+class ProfileLoaderMiddleware:
+    """
+    Gives every request its own ProfileLoader (courses/profiles.py), so the user ids looked up while
+    handling it are fetched from the user service in one batch and never twice.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_loader.set(ProfileLoader())
+        try:
+            return self.get_response(request)
+        finally:
+            current_loader.reset(token)
@@ -0,0 +1,77 @@
+"""
+Compact signed user context, sent by the API gateway in the X-User-Payload header.
+
+    v1.<user_id>.<flags>.<exp>.<signature>
+
+flags is a bit field of the boolean token claims, exp is the access token's expiry (unix time)
+and signature is a truncated HMAC-SHA256 of everything before it, keyed with the
+USER_CONTEXT_SECRET shared by the gateway and the services. Anonymous requests carry an empty
+header. This module is kept identical in the gateway and in every service that reads the header.
+"""
+import base64
+import hashlib
+import hmac
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+VERSION = 'v1'
+SIGNATURE_BYTES = 16
+FLAGS = (
+    ('is_profile_completed', 1),
+    ('is_tutor', 2),
+    ('is_admin', 4),
+)
+
+class UserContextError(ValueError):
+    pass
+
+def _sign(message):
+    digest = hmac.new(settings.USER_CONTEXT_SECRET.encode(), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).rstrip(b'=').decode()
+
+@lru_cache(maxsize=4096)
+def _encode(user_id, flags, exp):
+    message = f"{VERSION}.{user_id}.{flags}.{exp}"
+    return f"{message}.{_sign(message)}"
+
+def encode_user_context(payload):
+    """Header value for a token payload dict, '' for anonymous requests."""
+    if not payload:
+        return ''
+    flags = 0
+    for field, bit in FLAGS:
+        if payload.get(field):
+            flags |= bit
+    return _encode(int(payload['user_id']), flags, int(payload.get('exp') or 0))
+
+@lru_cache(maxsize=4096)
+def _verify(header):
+    """Check the signature once per distinct header value; returns (user_id, flags, exp)."""
+    message, _, signature = header.rpartition('.')
+    parts = message.split('.')
+    if len(parts) != 4 or parts[0] != VERSION:
+        raise UserContextError(f"Unsupported user context: {header[:16]}")
+    if not hmac.compare_digest(signature, _sign(message)):
+        raise UserContextError("Invalid user context signature")
+    return int(parts[1]), int(parts[2]), int(parts[3])
+
+def decode_user_context(header):
+    """
+    Payload dict for a header value, or None for anonymous requests. Raises UserContextError
+    when the header is malformed, not signed with our secret or past the token's expiry.
+    Verified headers are memoized, so a returning user costs a dict lookup and a time check.
+    """
+    if not header or header == 'None':
+        return None
+    try:
+        user_id, flags, exp = _verify(header)
+    except ValueError as e:
+        raise UserContextError(str(e))
+    if exp and exp < time.time():
+        raise UserContextError("Expired user context")
+    payload = {'user_id': user_id}
+    for field, bit in FLAGS:
+        payload[field] = bool(flags & bit)
+    return payload
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 import sys
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 from celery.schedules import crontab
 
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # full-text and trigram search
 
     'rest_framework',
     'cloudinary', # for storing media files
@@ -63,6 +65,14 @@ REST_FRAMEWORK = {
 
 }
 
+# Key for verifying the X-User-Payload user context signed by the API gateway (same value as the gateway).
+# USER_CONTEXT_ACCEPT_LEGACY also accepts the old unsigned str(dict) header, only for rolling upgrades.
+USER_CONTEXT_SECRET = os.getenv('USER_CONTEXT_SECRET')
+if not USER_CONTEXT_SECRET:
+    # every request carrying the header would otherwise fail with an unexplained 500
+    raise ImproperlyConfigured('USER_CONTEXT_SECRET must be set, it is the key of the signed X-User-Payload user context')
+USER_CONTEXT_ACCEPT_LEGACY = os.getenv('USER_CONTEXT_ACCEPT_LEGACY') == 'True'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,6 +82,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'course_service.middleware.request_populator.RequestPopulatorMiddleware', # Custom middleware for populating request with user payload
+    'course_service.middleware.profile_loader.ProfileLoaderMiddleware', # batches the user service profile lookups of a request
 ]
 
 ROOT_URLCONF = 'course_service.urls'
@@ -186,6 +197,19 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Chunked video uploads (courses/uploads.py), the client default is 5MB chunks
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+UPLOAD_MAX_CHUNKS = int(os.getenv('UPLOAD_MAX_CHUNKS', '2000'))
+
+# Background media jobs (courses/media.py). The backend receives the local files, the local
+# filesystem one stands in for Cloudinary in development.
+MEDIA_STORAGE_BACKEND = os.getenv('MEDIA_STORAGE_BACKEND', 'courses.media.CloudinaryBackend')
+MEDIA_UPLOAD_CHUNK_SIZE = int(os.getenv('MEDIA_UPLOAD_CHUNK_SIZE', str(20 * 1024 * 1024)))  # Cloudinary upload_large parts
+MEDIA_JOB_MAX_RETRIES = int(os.getenv('MEDIA_JOB_MAX_RETRIES', '5'))
+MEDIA_JOB_RETRY_BACKOFF = int(os.getenv('MEDIA_JOB_RETRY_BACKOFF', '30'))  # seconds, doubled on every retry
+MEDIA_JOB_STALE_SECONDS = 600  # queued jobs older than this are queued again by the beat sweep
+MEDIA_JOB_HEARTBEAT_SECONDS = 60  # how often an uploading job touches updated_at, well under the stale age
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -210,6 +234,38 @@ STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 REDIS_HOST = os.getenv('REDIS_HOST')
 REDIS_PORT = os.getenv('REDIS_PORT')
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/4", # 2 - celery, 3 - api gateway
+    }
+}
+
+# Snapshot cache of the aggregate pages (courses/snapshots.py). Readers always get the last snapshot,
+# one that is older than its refresh interval is recomputed in the background by a single worker.
+SNAPSHOT_REFRESH_SECONDS = {
+    'landing': int(os.getenv('LANDING_SNAPSHOT_REFRESH_SECONDS', '300')),
+    'home': int(os.getenv('HOME_SNAPSHOT_REFRESH_SECONDS', '120')),
+}
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', '86400'))  # a snapshot older than this is recomputed inline
+SNAPSHOT_LOCK_TIMEOUT = 120  # longest a recompute may hold the lock
+SNAPSHOT_WAIT_SECONDS = int(os.getenv('SNAPSHOT_WAIT_SECONDS', '5'))  # how long a request waits for a missing snapshot another one builds
+SNAPSHOT_POLL_INTERVAL = 0.1
+HOME_USER_CACHE_TTL = int(os.getenv('HOME_USER_CACHE_TTL', '30'))  # per-user part of HomeView
+
+# Serialized curriculum trees, keyed by course version (courses/curriculum.py)
+CURRICULUM_CACHE_TTL = int(os.getenv('CURRICULUM_CACHE_TTL', '86400'))
+CURRICULUM_CACHE_ERROR_TTL = 60  # a tree built while the user service failed is retried soon
+
+# Profile cards from the user service (courses/profiles.py): in-process LRU in front of Redis,
+# the Redis entry is dropped on chat.profile_updated events
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '600'))
+PROFILE_LOCAL_TTL = int(os.getenv('PROFILE_LOCAL_TTL', '30'))  # bounds how long a process serves an updated profile
+PROFILE_LOCAL_MAX_ENTRIES = 2048
+
+# Cursor pagination (courses/pagination.py), how long the optional total of a list is reused
+PAGINATION_COUNT_CACHE_TTL = int(os.getenv('PAGINATION_COUNT_CACHE_TTL', '300'))
+
 # Celery Worker using Redis. We can also use Rabbitmq as broker
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/2"
 CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/2"
@@ -225,6 +281,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'transactions.tasks.run_safe_period_check',
         'schedule': crontab(hour=1, minute=0), # Run daily at 1 AM #  crontab(), #for every one minute # crontab(minute='*/5'),  # Run every 5 minutes
     },
+    'refresh-page-snapshots': {
+        'task': 'courses.tasks.refresh_page_snapshots',
+        'schedule': crontab(minute='*/5'), # snapshots older than their refresh interval are recomputed
+    },
+    'requeue-stale-media-jobs': {
+        'task': 'courses.tasks.requeue_stale_media_jobs',
+        'schedule': crontab(minute='*/10'), # jobs whose enqueue was lost, e.g. broker down
+    },
+    'rebuild-tutor-leaderboard-hourly': {
+        'task': 'courses.tasks.run_tutor_leaderboard_rebuild',
+        'schedule': crontab(minute=15), # incremental updates keep it current, this only fixes drift
+    },
 }
 
 
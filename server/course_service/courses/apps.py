@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
 
 
 class CoursesConfig(AppConfig):
@@ -7,3 +8,5 @@ class CoursesConfig(AppConfig):
 
     def ready(self):
         import courses.signals
+        from courses.search import create_search_extensions
+        pre_migrate.connect(create_search_extensions, sender=self)
@@ -0,0 +1,61 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Course, Purchase, Review, SectionItem, SectionItemCompletion
+
+# Course.review_count, rating_sum, enrollment_count and total_items are moved by the signal handlers
+# in courses/signals.py with F() updates, so concurrent writes never lose an increment.
+# Purchase.completed_items is moved by complete_section_item() in courses/utils.py.
+# reconcile_course_counters and reconcile_purchase_progress recompute them from the source tables,
+# for rows written before the counters existed or changed behind their back (bulk operations, raw SQL).
+
+def _aggregate_per_row(queryset, aggregate, field='course'):
+    subquery = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=aggregate)
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+def add_review(course_id, rating):
+    Course.objects.filter(pk=course_id).update(
+        review_count=F('review_count') + 1,
+        rating_sum=F('rating_sum') + rating,
+    )
+
+def remove_review(course_id, rating):
+    Course.objects.filter(pk=course_id, review_count__gt=0, rating_sum__gte=rating).update(
+        review_count=F('review_count') - 1,
+        rating_sum=F('rating_sum') - rating,
+    )
+
+def add_enrollment(course_id):
+    Course.objects.filter(pk=course_id).update(enrollment_count=F('enrollment_count') + 1)
+
+def remove_enrollment(course_id):
+    Course.objects.filter(pk=course_id, enrollment_count__gt=0).update(enrollment_count=F('enrollment_count') - 1)
+
+def change_total_items(section_id, delta):
+    courses = Course.objects.filter(sections=section_id)
+    if delta < 0:
+        courses = courses.filter(total_items__gte=-delta)
+    courses.update(total_items=F('total_items') + delta)
+
+def remove_completed_item(purchase_id):
+    Purchase.objects.filter(pk=purchase_id, completed_items__gt=0).update(completed_items=F('completed_items') - 1)
+
+def reconcile_course_counters(queryset):
+    """Recompute the counters of every course in queryset with a single UPDATE."""
+    return queryset.order_by().update(
+        review_count=_aggregate_per_row(Review.objects, Count('id')),
+        rating_sum=_aggregate_per_row(Review.objects, Sum('rating')),
+        enrollment_count=_aggregate_per_row(Purchase.objects, Count('id')),
+        total_items=_aggregate_per_row(SectionItem.objects, Count('id'), field='section__course'),
+    )
+
+def reconcile_purchase_progress(queryset):
+    """Recompute completed_items of every purchase in queryset with a single UPDATE."""
+    return queryset.order_by().update(
+        completed_items=_aggregate_per_row(SectionItemCompletion.objects.filter(completed=True), Count('id'), field='purchase'),
+    )
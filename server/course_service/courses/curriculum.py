@@ -0,0 +1,76 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Prefetch
+from rest_framework import serializers
+from .models import Course, Section, SectionItem, SectionItemCompletion
+
+logger = logging.getLogger(__name__)
+
+# The curriculum of a course (course details, sections, items with their videos, assessments and
+# documents) only changes when the tutor edits it. It is serialized once per Course.curriculum_version
+# and cached; the signal handlers in courses/signals.py bump the version on every edit, so a new
+# version simply misses the cache and the old entry expires. What belongs to a purchase (completion,
+# ads viewed) is loaded with one query and laid over a copy of the cached tree.
+
+completed_at_field = serializers.DateTimeField()
+
+def bump_curriculum_version(**lookup):
+    """Invalidate the cached tree of the courses matching lookup."""
+    Course.objects.filter(**lookup).update(curriculum_version=F('curriculum_version') + 1)
+
+def _key(course):
+    return f"curriculum:{course.id}:v{course.curriculum_version}"
+
+def build_curriculum(course):
+    from .serializers import CourseUnAuthDetailSerializer, SectionDetailWithItemsSerializer
+    sections = Section.objects.filter(course=course).prefetch_related(
+        Prefetch('items', queryset=SectionItem.objects.select_related('video', 'assessment', 'documents')),
+        'items__assessment__questions__choices',
+    )
+    tree_sections = SectionDetailWithItemsSerializer(sections, many=True).data
+    return {
+        'course': CourseUnAuthDetailSerializer(course).data,
+        'sections': tree_sections,
+        'total_items': sum(len(section['items']) for section in tree_sections),
+    }
+
+def get_curriculum(course):
+    key = _key(course)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_curriculum(course)
+        instructor_details = tree['course'].get('instructor_details') or {}
+        timeout = settings.CURRICULUM_CACHE_ERROR_TTL if 'error' in instructor_details else settings.CURRICULUM_CACHE_TTL
+        cache.set(key, tree, timeout)
+        logger.debug(f"Curriculum of course {course.id} v{course.curriculum_version} cached")
+
+    # counters that move with every purchase or review come from the course row, not the cache
+    tree['course']['average_rating'] = course.get_average_rating()
+    tree['course']['total_reviews'] = course.get_total_reviews()
+    tree['course']['analytics']['total_admission'] = course.enrollment_count
+    return tree
+
+def load_progress(purchase):
+    """Completion state of every item of a purchase, in one query."""
+    return {
+        row['section_item_id']: row
+        for row in SectionItemCompletion.objects.filter(purchase=purchase).values(
+            'section_item_id', 'completed', 'completed_at', 'ad_viewed'
+        )
+    }
+
+def overlay_progress(sections, progress):
+    """Fill the `completion` of every item of the (copied) tree from load_progress()."""
+    for section in sections:
+        for item in section['items']:
+            row = progress.get(item['id'])
+            if row is None:
+                item['completion'] = {'section_item': item['id'], 'completed': False, 'completed_at': None}
+            else:
+                item['completion'] = {
+                    'section_item': item['id'],
+                    'completed': row['completed'],
+                    'completed_at': completed_at_field.to_representation(row['completed_at']),
+                }
+    return sections
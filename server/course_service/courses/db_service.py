@@ -1,4 +1,7 @@
-from django.db import connection
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Course, TutorStats
 
 def tutor_course_stats(id):
     with connection.cursor() as cursor:
@@ -27,4 +30,52 @@ def top_tutors():
             ORDER BY total_enrollments DESC;
         """)
         rows = cursor.fetchall()
-        return rows
\ No newline at end of file
+        return rows
+
+# TutorStats is the materialized form of top_tutors(). Purchases move total_enrollments with F()
+# updates, a change to one of a tutor's courses recounts that tutor from the Course counters and
+# rebuild_tutor_leaderboard() replaces the whole table from the query above to fix any drift.
+
+def change_tutor_enrollments(instructor, delta):
+    stats = TutorStats.objects.filter(instructor=instructor)
+    if delta < 0:
+        stats = stats.filter(total_enrollments__gte=-delta)
+    stats.update(total_enrollments=F('total_enrollments') + delta)
+
+def refresh_tutor_stats(instructor):
+    totals = Course.objects.filter(instructor=instructor, is_available=True).aggregate(
+        total_courses=Count('id'),
+        total_enrollments=Coalesce(Sum('enrollment_count'), 0),
+    )
+    if not totals['total_courses']:
+        TutorStats.objects.filter(instructor=instructor).delete()
+        return
+    TutorStats.objects.update_or_create(instructor=instructor, defaults=totals)
+
+def rebuild_tutor_leaderboard():
+    rows = top_tutors()
+    with transaction.atomic():
+        TutorStats.objects.all().delete()
+        TutorStats.objects.bulk_create([
+            TutorStats(instructor=instructor, total_courses=total_courses, total_enrollments=total_enrollments)
+            for instructor, total_courses, total_enrollments in rows
+        ])
+    return len(rows)
+
+def course_analytics(course_ids):
+    """
+    Curriculum analytics of many courses with one conditional-aggregation query, {course_id: row}.
+    Every join below is one row per section item at most (video and documents are one-to-one),
+    so the duration sum isn't multiplied; admissions come from the enrollment_count counter.
+    """
+    rows = Course.objects.filter(id__in=course_ids).annotate(
+        section_count=Count('sections', distinct=True),
+        video_count=Count('sections__items', filter=Q(sections__items__item_type='video'), distinct=True),
+        assessment_count=Count('sections__items', filter=Q(sections__items__item_type='assessment'), distinct=True),
+        total_video_duration=Coalesce(Sum('sections__items__video__duration'), 0),
+        document_count=Count('sections__items__documents', distinct=True),
+    ).values(
+        'id', 'title', 'section_count', 'video_count', 'assessment_count', 'total_video_duration',
+        'document_count', 'enrollment_count',
+    )
+    return {row['id']: row for row in rows}
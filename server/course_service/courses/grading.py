@@ -0,0 +1,53 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from .models import Choice, Question
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SUBMISSIONS = 500
+
+# An assessment's answer key is compiled once and cached under the course's curriculum_version,
+# which courses/signals.py bumps on every assessment, question or choice edit. Grading a submission
+# is then a single pass over the key, without touching the database.
+
+def _key(assessment, course):
+    return f"answer_key:{assessment.id}:v{course.curriculum_version}"
+
+def compile_answer_key(assessment):
+    """
+    {'answers': {question_id: correct_choice_id or None}, 'pass_mark': correct answers needed}.
+    A question with several correct choices keeps the lowest id, as grading always did.
+    """
+    answers = {question_id: None for question_id in Question.objects.filter(assessment=assessment).values_list('id', flat=True)}
+    correct_choices = (
+        Choice.objects.filter(question__assessment=assessment, is_correct=True)
+        .order_by('-id')
+        .values_list('question_id', 'id')
+    )
+    for question_id, choice_id in correct_choices:
+        answers[question_id] = choice_id  # descending ids, the lowest one is written last
+    return {'answers': answers, 'pass_mark': len(answers) * assessment.passing_score / 100}
+
+def get_answer_key(assessment, course):
+    key = _key(assessment, course)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(assessment)
+        cache.set(key, answer_key, settings.CURRICULUM_CACHE_TTL)
+        logger.debug(f"Answer key of assessment {assessment.id} compiled")
+    return answer_key
+
+def grade(answer_key, user_answers):
+    """Return (correct answers, passed) for a {question_id: choice_id} submission, ids as str or int."""
+    correct_answers = 0
+    for question_id, correct_choice_id in answer_key['answers'].items():
+        user_answer_id = user_answers.get(str(question_id))
+        if not user_answer_id or correct_choice_id is None:
+            continue
+        try:
+            if int(user_answer_id) == correct_choice_id:
+                correct_answers += 1
+        except (TypeError, ValueError):
+            continue
+    return correct_answers, correct_answers >= answer_key['pass_mark']
@@ -0,0 +1,23 @@
+import logging
+from django.core.management.base import BaseCommand
+from courses.models import Course
+from courses.search import update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search vector of every course, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Courses updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            updated += update_search_vectors(Course.objects.filter(id__in=batch))
+            logger.info(f"Search index: {updated}/{len(ids)} courses rebuilt")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search vector of {updated} courses"))
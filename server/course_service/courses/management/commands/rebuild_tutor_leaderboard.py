@@ -0,0 +1,13 @@
+import logging
+from django.core.management.base import BaseCommand
+from courses.db_service import rebuild_tutor_leaderboard
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized top-tutors leaderboard from courses and purchases'
+
+    def handle(self, *args, **kwargs):
+        total = rebuild_tutor_leaderboard()
+        logger.info(f"Tutor leaderboard rebuilt with {total} tutors")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the tutor leaderboard with {total} tutors"))
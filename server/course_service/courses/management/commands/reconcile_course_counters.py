@@ -0,0 +1,24 @@
+import logging
+from django.core.management.base import BaseCommand
+from courses.models import Course, Purchase
+from courses.counters import reconcile_course_counters, reconcile_purchase_progress
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized course counters and purchase progress counters, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Courses updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            updated += reconcile_course_counters(Course.objects.filter(id__in=batch))
+            reconcile_purchase_progress(Purchase.objects.filter(course_id__in=batch))
+            logger.info(f"Course counters: {updated}/{len(ids)} courses reconciled")
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled the counters of {updated} courses"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from courses.rabbitmq_consumer import start_consumer
+
+class Command(BaseCommand):
+    help = 'Starts the RabbitMQ consumer for profile_updated events, which invalidate cached profiles'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Starting RabbitMQ consumer...'))
+        try:
+            start_consumer()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Consumer stopped.'))
@@ -0,0 +1,214 @@
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import timedelta
+import cloudinary.uploader
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.text import get_valid_filename
+from .models import MediaJob, VideoUpload
+
+logger = logging.getLogger(__name__)
+
+# Background media pipeline. Requests only save the file locally and create a MediaJob, whose id
+# is returned as the job handle; a Celery worker pushes the file to the storage backend, fills the
+# URL into the Video or Course and removes the local copy. Failures are retried with exponential
+# backoff (courses/tasks.py), the job, Video and VideoUpload carry the progress states.
+
+COURSE_THUMBNAIL_FOLDER = 'Course/Thumbnail/'
+
+class CloudinaryBackend:
+    def upload(self, path, resource_type, folder, public_id=None, progress=None):
+        options = {'resource_type': resource_type, 'folder': folder}
+        if public_id:
+            options.update(public_id=public_id, overwrite=True)
+        if resource_type == 'video':
+            # sent in MEDIA_UPLOAD_CHUNK_SIZE parts, a lecture never has to fit one request
+            result = cloudinary.uploader.upload_large(path, chunk_size=settings.MEDIA_UPLOAD_CHUNK_SIZE, **options)
+        else:
+            result = cloudinary.uploader.upload(path, **options)
+        return {'url': result['secure_url'], 'duration': int(result.get('duration') or 0)}
+
+    def destroy(self, url, folder):
+        cloudinary.uploader.destroy(folder + url.split('/')[-1].split('.')[0])
+
+class LocalFileSystemBackend:
+    """Stand-in for Cloudinary, files are copied under MEDIA_ROOT/storage/ and served from MEDIA_URL."""
+    def upload(self, path, resource_type, folder, public_id=None, progress=None):
+        name = f"{public_id or uuid.uuid4().hex}{os.path.splitext(path)[1]}"
+        relative = os.path.join('storage', folder.strip('/'), get_valid_filename(name))
+        target = os.path.join(settings.MEDIA_ROOT, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        total = os.path.getsize(path) or 1
+        copied = 0
+        with open(path, 'rb') as source, open(target, 'wb') as destination:
+            while data := source.read(settings.MEDIA_UPLOAD_CHUNK_SIZE):
+                destination.write(data)
+                copied += len(data)
+                if progress:
+                    progress(copied * 100 // total)
+        return {'url': settings.MEDIA_URL + relative.replace(os.sep, '/'), 'duration': 0}
+
+    def destroy(self, url, folder):
+        if not url.startswith(settings.MEDIA_URL):
+            return
+        path = os.path.join(settings.MEDIA_ROOT, url[len(settings.MEDIA_URL):])
+        if os.path.exists(path):
+            os.remove(path)
+
+_backend = None
+
+def get_media_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.MEDIA_STORAGE_BACKEND)()
+    return _backend
+
+def save_job_source(uploaded_file):
+    """Persist an uploaded file so a worker can pick it up after the request is gone."""
+    directory = os.path.join(settings.MEDIA_ROOT, 'media_jobs')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}_{get_valid_filename(os.path.basename(uploaded_file.name))}")
+    with open(path, 'wb') as destination:
+        for data in uploaded_file.chunks():
+            destination.write(data)
+    return path
+
+def enqueue(job_id):
+    from .tasks import process_media_job
+    try:
+        process_media_job.delay(str(job_id))
+    except Exception as e:
+        # the job stays queued, requeue_stale_jobs picks it up
+        logger.warning(f"Could not queue media job {job_id}: {str(e)}")
+
+def create_media_job(kind, owner, source_path, **targets):
+    job = MediaJob.objects.create(kind=kind, owner=owner, source_path=source_path, **targets)
+    transaction.on_commit(lambda: enqueue(job.id))
+    return job
+
+def retry_delay(retries):
+    return settings.MEDIA_JOB_RETRY_BACKOFF * (2 ** retries) + random.randint(0, settings.MEDIA_JOB_RETRY_BACKOFF)
+
+def max_retry_delay():
+    return retry_delay(settings.MEDIA_JOB_MAX_RETRIES)
+
+def _set_progress(job_id, percent):
+    MediaJob.objects.filter(pk=job_id).update(progress=min(percent, 99), updated_at=timezone.now())
+
+class Heartbeat(threading.Thread):
+    """
+    Touches updated_at of an uploading job every MEDIA_JOB_HEARTBEAT_SECONDS, so a long upload whose
+    backend reports no progress (Cloudinary's upload_large) isn't taken for a dead worker by the sweep.
+    """
+    def __init__(self, job_id):
+        super().__init__(name=f"media-job-heartbeat-{job_id}", daemon=True)
+        self.job_id = job_id
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(settings.MEDIA_JOB_HEARTBEAT_SECONDS):
+                try:
+                    MediaJob.objects.filter(pk=self.job_id, status='uploading').update(updated_at=timezone.now())
+                except Exception as e:
+                    logger.warning(f"Heartbeat of media job {self.job_id} failed: {str(e)}")
+        finally:
+            connection.close()  # the thread's own connection
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+def _process(job, backend):
+    progress = lambda percent: _set_progress(job.pk, percent)
+    if job.kind == 'video':
+        result = backend.upload(job.source_path, 'video', 'course/videos/', progress=progress)
+        video = job.video
+        video.video_url = result['url']
+        video.duration = result['duration']
+        video.status = 'ready'
+        video.save(update_fields=['video_url', 'duration', 'status'])
+        if job.video_upload_id:
+            VideoUpload.objects.filter(pk=job.video_upload_id).update(status='done', cloudinary_url=result['url'])
+    elif job.kind == 'video_thumbnail':
+        video = job.video
+        public_id = f"thumbnail_{video.section_item.title.lower().replace(' ', '_')}"
+        result = backend.upload(job.source_path, 'image', 'course/video_thumbnails/', public_id=public_id, progress=progress)
+        video.thumbnail = result['url']
+        video.save(update_fields=['thumbnail'])
+    elif job.kind == 'course_thumbnail':
+        course = job.course
+        previous = course.thumbnail
+        result = backend.upload(job.source_path, 'image', COURSE_THUMBNAIL_FOLDER, progress=progress)
+        course.thumbnail = result['url']
+        course.save(update_fields=['thumbnail'])
+        if previous:
+            try:
+                backend.destroy(previous, COURSE_THUMBNAIL_FOLDER)
+            except Exception as e:
+                logger.warning(f"Could not delete previous thumbnail of course {course.id}: {str(e)}")
+    return result['url']
+
+def run_job(job_id):
+    """Process one job. Exceptions propagate so the task can retry it."""
+    claimed = MediaJob.objects.filter(pk=job_id, status__in=('queued', 'retrying')).update(
+        status='uploading', attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        logger.info(f"Media job {job_id} is not waiting, skipped")
+        return
+    job = MediaJob.objects.select_related('video', 'course').get(pk=job_id)
+    heartbeat = Heartbeat(job_id)
+    heartbeat.start()
+    try:
+        url = _process(job, get_media_backend())
+    finally:
+        heartbeat.stop()
+    MediaJob.objects.filter(pk=job_id).update(status='done', progress=100, result_url=url, error='', updated_at=timezone.now())
+    if os.path.exists(job.source_path):
+        os.remove(job.source_path)
+    logger.info(f"Media job {job_id} ({job.kind}) done")
+
+def job_attempts(job_id):
+    return MediaJob.objects.filter(pk=job_id).values_list('attempts', flat=True).first() or 0
+
+# a job another run already finished is never set back to retrying or failed
+def job_retrying(job_id, error):
+    MediaJob.objects.filter(pk=job_id).exclude(status='done').update(status='retrying', error=str(error), updated_at=timezone.now())
+    logger.warning(f"Media job {job_id} failed, retrying: {str(error)}")
+
+def job_failed(job_id, error):
+    if not MediaJob.objects.filter(pk=job_id).exclude(status='done').update(status='failed', error=str(error), updated_at=timezone.now()):
+        return
+    job = MediaJob.objects.get(pk=job_id)
+    if job.kind == 'video':
+        if job.video_id:
+            job.video.status = 'failed'
+            job.video.save(update_fields=['status'])
+        if job.video_upload_id:
+            VideoUpload.objects.filter(pk=job.video_upload_id).update(status='failed')
+    logger.error(f"Media job {job_id} failed for good: {str(error)}")
+
+def requeue_stale_jobs():
+    """
+    Queue again the jobs whose message got lost: never picked up, whose worker died mid-upload (no
+    heartbeat for MEDIA_JOB_STALE_SECONDS) or whose retry never came, even after the longest backoff.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.MEDIA_JOB_STALE_SECONDS)
+    retry_cutoff = cutoff - timedelta(seconds=max_retry_delay())
+    stale = list(
+        MediaJob.objects.filter(
+            Q(status__in=('queued', 'uploading'), updated_at__lt=cutoff) | Q(status='retrying', updated_at__lt=retry_cutoff)
+        ).values_list('id', flat=True)
+    )
+    MediaJob.objects.filter(pk__in=stale, status='uploading').update(status='queued')
+    for job_id in stale:
+        enqueue(job_id)
+    return len(stale)
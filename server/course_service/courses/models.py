@@ -6,8 +6,50 @@ from django.db import models
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, FileExtensionValidator, MaxLengthValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from cloudinary.models import CloudinaryField
 
+class CounterFieldsMixin:
+    """
+    Counter columns are only written with UPDATE ... F() statements. A plain save() of a row loaded
+    from the database writes just the fields changed since it was loaded (and the auto_now ones),
+    never the counters, so a stale instance can't overwrite a concurrent increment and post_save
+    receivers still see in update_fields what really changed.
+    """
+    COUNTER_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """Names of the non-counter fields whose value differs from the one loaded from the database."""
+        loaded = getattr(self, '_loaded_values', None)
+        changed = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.name in self.COUNTER_FIELDS:
+                continue
+            if loaded is None or getattr(field, 'auto_now', False):
+                changed.append(field.name)
+            elif field.attname in loaded:
+                if getattr(self, field.attname) != loaded[field.attname]:
+                    changed.append(field.name)
+            elif field.attname in self.__dict__:  # deferred when loaded, set since
+                changed.append(field.name)
+        return changed
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self.changed_fields()
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
 class Category(models.Model):
     title = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)  # For SEO-friendly URLs
@@ -25,7 +67,9 @@ class Category(models.Model):
             self.slug = slugify(self.title)
         super().save(*args, **kwargs)
 
-class Course(models.Model):
+class Course(CounterFieldsMixin, models.Model):
+    COUNTER_FIELDS = ('search_vector', 'review_count', 'rating_sum', 'enrollment_count', 'total_items', 'curriculum_version')
+
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='courses')
     title = models.CharField(max_length=255, db_index=True, unique=True)
     description = models.TextField()
@@ -43,6 +87,13 @@ class Course(models.Model):
     safe_period = models.PositiveIntegerField(validators=[MinValueValidator(1),], null=True, blank=True, default=None)  # time period where a student's payment will be held by the admin
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)  # maintained by courses/search.py
+    # Denormalized counters, kept up to date by courses/signals.py, see courses/counters.py
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
+    total_items = models.PositiveIntegerField(default=0, editable=False)  # section items of the course
+    curriculum_version = models.PositiveIntegerField(default=1, editable=False)  # bumped on every curriculum edit, see courses/curriculum.py
 
     def __str__(self):
         return self.title
@@ -59,17 +110,38 @@ class Course(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['title', 'is_available']),  # Composite index for common queries
+            GinIndex(fields=['search_vector'], name='course_search_vector_gin'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='course_title_trgm'),  # typo tolerant title matches
+            models.Index(fields=['-enrollment_count', '-id'], name='course_enrollment_count_idx'),  # popular sort
+            models.Index(fields=['-created_at', '-id'], name='course_created_keyset_idx'),  # cursor pages, see courses/pagination.py
         ]
 
     def get_average_rating(self):
-        reviews = Review.objects.filter(course=self)
-        if reviews.exists(): 
-            avg = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            return round(avg, 1)
+        if self.review_count:
+            return round(self.rating_sum / self.review_count, 1)
         return 0
 
     def get_total_reviews(self):
-        return Review.objects.filter(course=self).count()
+        return self.review_count
+
+class TutorStats(models.Model):
+    """
+    Materialized top-tutors leaderboard: one row per instructor with at least one available course.
+    Kept up to date by courses/signals.py and rebuilt periodically, see courses/db_service.py.
+    """
+    instructor = models.BigIntegerField(unique=True)
+    total_courses = models.PositiveIntegerField(default=0)
+    total_enrollments = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-total_enrollments', 'instructor']
+        indexes = [
+            models.Index(fields=['-total_enrollments', 'instructor'], name='tutor_stats_leaderboard_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tutor {self.instructor}: {self.total_enrollments} enrollments"
 
 class LearningObjective(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='objectives')
@@ -138,7 +210,17 @@ class VideoUpload(models.Model):
     file_name = models.CharField(max_length=255)
     total_chunks = models.IntegerField()
     chunks_uploaded = models.IntegerField(default=0)
+    chunk_size = models.PositiveIntegerField(default=0)  # bytes of every chunk but the last, see courses/uploads.py
+    file_size = models.BigIntegerField(null=True, blank=True)  # known once the last chunk arrived
+    received_chunks = models.BinaryField(default=bytes, editable=False)  # bit n set = chunk n+1 written
     file_path = models.CharField(max_length=255, blank=True)
+    STATUS_CHOICES = (
+        ('receiving', 'Receiving'),    # chunks are arriving
+        ('processing', 'Processing'),  # assembled, a media job is pushing it to storage
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='receiving')
     cloudinary_url = models.URLField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -150,6 +232,12 @@ class Video(models.Model):
     video_url = models.URLField(blank=True, null=True)  # URL to video hosted in claudinary
     thumbnail = models.URLField(blank=True, null=True)
     duration = models.PositiveIntegerField(default=0)  # Duration in seconds
+    STATUS_CHOICES = (
+        ('processing', 'Processing'),  # waiting for its media job, see courses/media.py
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready')
 
     def __str__(self):
         return f"Video for {self.section_item.title}"
@@ -207,7 +295,44 @@ class SupportingDocument(models.Model):
     def __str__(self):
         return self.title
 
-class Purchase(models.Model):
+class MediaJob(models.Model):
+    """A background upload of a local media file to the storage backend, see courses/media.py."""
+    KIND_CHOICES = (
+        ('video', 'Video'),
+        ('video_thumbnail', 'Video thumbnail'),
+        ('course_thumbnail', 'Course thumbnail'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('uploading', 'Uploading'),
+        ('retrying', 'Retrying'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # the job handle given to clients
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    owner = models.BigIntegerField(db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    source_path = models.CharField(max_length=500)
+    result_url = models.URLField(max_length=500, blank=True)
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, null=True, blank=True, related_name='media_jobs')
+    video_upload = models.ForeignKey(VideoUpload, on_delete=models.SET_NULL, null=True, blank=True, related_name='media_jobs')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='media_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+class Purchase(CounterFieldsMixin, models.Model):
+    COUNTER_FIELDS = ('completed_items',)
+
     PURCHASE_TYPE_CHOICES = (
         ('subscription', 'Subscription'),
         ('freemium', 'Freemium')
@@ -221,6 +346,7 @@ class Purchase(models.Model):
     chat_upto = models.PositiveIntegerField(validators=[MinValueValidator(1)], null=True, blank=True, default=None)  # in days
     safe_period = models.PositiveIntegerField(validators=[MinValueValidator(1)], null=True, blank=True, default=None)  # time period where a student's payment will be held by the admin
     completed = models.BooleanField(default=False)  # Mark if the course is completed
+    completed_items = models.PositiveIntegerField(default=0, editable=False)  # completed section items, see courses/utils.py
     stripe_payment_intent_id = models.CharField(max_length=100, null=True, blank=True)
     # stripe_checkout_session_id = models.CharField(max_length=100, null=True, blank=True)
     purchased_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)  # Track purchase date
@@ -234,9 +360,8 @@ class Purchase(models.Model):
     
     @property
     def is_completed(self):
-        total_section_items = SectionItem.objects.filter(section__course=self.course).count()
-        completed_items = self.section_items_completed.filter(completed=True).count()
-        return total_section_items == completed_items
+        # a course without items (or counters not reconciled yet) is never completed
+        return self.course.total_items > 0 and self.completed_items >= self.course.total_items
 
     @property
     def safe_period_expiry(self):
@@ -294,6 +419,9 @@ class Report(models.Model):
     class Meta:
         unique_together = ('course', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='report_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Report by {self.user} for {self.course.title}"
@@ -325,6 +453,9 @@ class VideoSession(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tutor', '-created_at', '-id'], name='session_tutor_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Session {self.room_id} - {self.tutor} with {self.student}"
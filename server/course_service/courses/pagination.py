@@ -0,0 +1,145 @@
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.db.models.query import ValuesIterable
+from rest_framework.exceptions import NotFound
+
+# Keyset (cursor) pagination. Instead of COUNT(*) + OFFSET, a page is the rows that come after the
+# last row of the previous one in the queryset's ordering, which always ends with the primary key
+# so the position is unique: WHERE (created_at, id) < (last created_at, last id) LIMIT size + 1.
+# The cursor is that position, base64 encoded so clients treat it as opaque. The total is optional,
+# a cached COUNT(*) per query that may be a few minutes old.
+
+class InvalidCursor(NotFound):
+    default_detail = 'Invalid cursor'
+
+def get_ordering(queryset):
+    """The ordering of queryset as a list like ['-created_at', '-pk'], always ending with the pk."""
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    if any(not isinstance(field, str) or '__' in field or field == '?' for field in ordering):
+        raise ValueError(f"Keyset pagination can't order by {ordering}")
+    names = [field.lstrip('-') for field in ordering]
+    if 'pk' not in names and 'id' not in names:
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        ordering.append('-pk' if descending else 'pk')
+    return ordering
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f"-{field}" for field in ordering]
+
+def _after(field, value):
+    """(rows strictly after value, rows equal to value) for one ordering column, Postgres null order."""
+    name = field.lstrip('-')
+    if field.startswith('-'):  # descending, nulls first
+        if value is None:
+            return Q(**{f"{name}__isnull": False}), Q(**{f"{name}__isnull": True})
+        return Q(**{f"{name}__lt": value}), Q(**{name: value})
+    if value is None:  # ascending, nulls last
+        return Q(pk__in=[]), Q(**{f"{name}__isnull": True})
+    return Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True}), Q(**{name: value})
+
+def keyset_filter(ordering, values):
+    """(c1 after v1) OR (c1 = v1 AND c2 after v2) OR ..."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for field, value in zip(ordering, values):
+        after, same = _after(field, value)
+        condition |= equal & after
+        equal &= same
+    return condition
+
+def _column(field, model):
+    name = field.lstrip('-')
+    return model._meta.pk.name if name == 'pk' else name
+
+def _value(row, field, model):
+    """The value of an ordering column in a model instance or a values() dict."""
+    if isinstance(row, dict):
+        return row[_column(field, model)]
+    return row.pk if field.lstrip('-') == 'pk' else getattr(row, field.lstrip('-'))
+
+def _json_value(value):
+    # full precision, DjangoJSONEncoder would cut datetimes to milliseconds and miss rows
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} can't be part of a cursor")
+
+def encode_cursor(ordering, values, backwards):
+    payload = {'o': ordering, 'v': values, 'b': backwards}
+    return base64.urlsafe_b64encode(json.dumps(payload, default=_json_value).encode()).decode()
+
+def decode_cursor(cursor, model):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = []
+        for field, value in zip(payload['o'], payload['v']):
+            name = field.lstrip('-')
+            try:
+                model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+                values.append(model_field.to_python(value))
+            except FieldDoesNotExist:
+                values.append(value)  # an annotation like the search rank, a plain JSON number
+        return payload['o'], values, bool(payload['b'])
+    except (ValueError, KeyError, TypeError, ValidationError):
+        raise InvalidCursor()
+
+def cached_count(queryset):
+    """COUNT(*) of queryset, cached per query for PAGINATION_COUNT_CACHE_TTL seconds."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'pagination_count:' + hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+    return count
+
+def keyset_page(queryset, page_size, cursor=None):
+    """
+    One page of queryset: (rows, next cursor, previous cursor), cursors are None at either end.
+    A previous cursor walks the reversed ordering and flips the rows back.
+    """
+    ordering = get_ordering(queryset)
+    # values() rows only carry the selected columns, the ones the cursor needs are added and dropped again
+    selected = queryset._fields
+    if selected is not None and not issubclass(queryset._iterable_class, ValuesIterable):
+        raise ValueError("Keyset pagination can't page values_list() rows")
+    extra = []
+    if selected:
+        extra = [name for name in dict.fromkeys(_column(field, queryset.model) for field in ordering) if name not in selected]
+        if extra:
+            queryset = queryset.values(*selected, *extra)
+    backwards = False
+    if cursor:
+        cursor_ordering, values, backwards = decode_cursor(cursor, queryset.model)
+        if cursor_ordering != ordering:
+            raise InvalidCursor('The cursor belongs to another ordering')
+        queryset = queryset.filter(keyset_filter(_reverse(ordering) if backwards else ordering, values))
+    rows = list(queryset.order_by(*(_reverse(ordering) if backwards else ordering))[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    first = [_value(rows[0], field, queryset.model) for field in ordering]
+    last = [_value(rows[-1], field, queryset.model) for field in ordering]
+    for row in rows:
+        for name in extra:
+            del row[name]
+    if backwards:
+        next_cursor = encode_cursor(ordering, last, False)
+        previous_cursor = encode_cursor(ordering, first, True) if has_more else None
+    else:
+        next_cursor = encode_cursor(ordering, last, False) if has_more else None
+        previous_cursor = encode_cursor(ordering, first, True) if cursor else None
+    return rows, next_cursor, previous_cursor
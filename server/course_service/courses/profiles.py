@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from .services import CallUserService
+
+logger = logging.getLogger(__name__)
+
+call_user_service = CallUserService()
+
+# Profile cards ({id, email, first_name, last_name, biography, image}) from the user service.
+# A lookup goes through a small in-process LRU, then Redis, and only the ids missing from both are
+# fetched with a single tutor-details call. Entries expire on their own TTL (short in process,
+# longer in Redis) and the Redis entry is dropped on every profile_updated chat event
+# (courses/rabbitmq_consumer.py). Within a request, ProfileLoader collects ids so every card the
+# request needs is fetched in one batch.
+
+class LocalProfileCache:
+    """Thread-safe LRU with a TTL per entry."""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for user_id in ids:
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                expires_at, profile = entry
+                if expires_at < now:
+                    del self._entries[user_id]
+                    continue
+                self._entries.move_to_end(user_id)
+                found[user_id] = profile
+        return found
+
+    def set_many(self, profiles):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for user_id, profile in profiles.items():
+                self._entries[user_id] = (expires_at, profile)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+local_profiles = LocalProfileCache(settings.PROFILE_LOCAL_MAX_ENTRIES, settings.PROFILE_LOCAL_TTL)
+
+def _key(user_id):
+    return f"profile:{user_id}"
+
+def fetch_profiles(ids):
+    """
+    {user_id: profile card} for the given ids, ids the user service doesn't know are left out.
+    Raises UserServiceException when the cards that aren't cached can't be fetched.
+    """
+    ids = list(dict.fromkeys(int(user_id) for user_id in ids))
+    profiles = local_profiles.get_many(ids)
+    missing = [user_id for user_id in ids if user_id not in profiles]
+    if missing:
+        cached = cache.get_many([_key(user_id) for user_id in missing])
+        from_redis = {user_id: cached[_key(user_id)] for user_id in missing if _key(user_id) in cached}
+        local_profiles.set_many(from_redis)
+        profiles.update(from_redis)
+        missing = [user_id for user_id in missing if user_id not in from_redis]
+    if missing:
+        response = call_user_service.get_users_details(missing)
+        fetched = {profile['id']: profile for profile in response.json()}
+        cache.set_many({_key(user_id): profile for user_id, profile in fetched.items()}, settings.PROFILE_CACHE_TTL)
+        local_profiles.set_many(fetched)
+        profiles.update(fetched)
+        logger.debug(f"Fetched {len(fetched)} of {len(missing)} profiles from the user service")
+    return profiles
+
+def invalidate_profile(user_id):
+    cache.delete(_key(user_id))
+    local_profiles.delete(int(user_id))
+
+class ProfileLoader:
+    """
+    Request-scoped dataloader. prime() registers ids the request will need, the first load() fetches
+    every pending id in one call. Results are kept for the rest of the request.
+    """
+    def __init__(self):
+        self._pending = set()
+        self._loaded = {}
+
+    def prime(self, ids):
+        self._pending.update(int(user_id) for user_id in ids if int(user_id) not in self._loaded)
+
+    def load_many(self, ids):
+        ids = [int(user_id) for user_id in ids]
+        self.prime(ids)
+        if self._pending:
+            batch = list(self._pending)
+            self._pending.clear()
+            profiles = fetch_profiles(batch)
+            self._loaded.update({user_id: profiles.get(user_id) for user_id in batch})
+        return {user_id: self._loaded[user_id] for user_id in ids if self._loaded.get(user_id) is not None}
+
+    def load(self, user_id):
+        """The card of user_id, or None if the user service doesn't know it."""
+        return self.load_many([user_id]).get(int(user_id))
+
+current_loader = ContextVar('profile_loader', default=None)  # set per request by ProfileLoaderMiddleware
+
+def get_profile_loader():
+    """The loader of the current request, outside a request (tasks, commands) a fresh one."""
+    return current_loader.get() or ProfileLoader()
@@ -0,0 +1,50 @@
+import pika
+import json
+import os
+import logging
+from .curriculum import bump_curriculum_version
+from .models import Course, TutorStats
+from .profiles import invalidate_profile
+from .snapshots import snapshot_changed
+
+logger = logging.getLogger(__name__)
+
+def profile_updated_callback(ch, method, properties, body):
+    try:
+        user_id = json.loads(body)['user_id']
+        invalidate_profile(user_id)
+        # cached trees and the landing page embed the instructor card
+        if Course.objects.filter(instructor=user_id).exists():
+            bump_curriculum_version(instructor=user_id)
+        if TutorStats.objects.filter(instructor=user_id).exists():
+            snapshot_changed('landing')
+        logger.info(f" [x] profile_updated event received for user {user_id}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    except Exception as e:
+        logger.exception(f" [x] Unexpected error while processing profile_updated event: {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+def start_consumer():
+    rabbitmq_host = os.getenv('RABBITMQ_HOST', 'localhost')
+    rabbitmq_user = os.getenv('RABBITMQ_USER', 'guest')
+    rabbitmq_pass = os.getenv('RABBITMQ_PASS', 'guest')
+
+    credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_pass)
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=rabbitmq_host, credentials=credentials)
+    )
+    channel = connection.channel()
+
+    exchange_name = 'chat_events'
+    channel.exchange_declare(exchange=exchange_name, exchange_type='topic', durable=True)
+
+    queue_name = 'course_service_profile_updated'
+    channel.queue_declare(queue=queue_name, durable=True)
+    channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key='chat.profile_updated')
+
+    channel.basic_qos(prefetch_count=10)
+    channel.basic_consume(queue=queue_name, on_message_callback=profile_updated_callback)
+
+    logger.info(' [*] Waiting for profile_updated events...')
+    channel.start_consuming()
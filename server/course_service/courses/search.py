@@ -0,0 +1,79 @@
+import re
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+from .models import Category, LearningObjective
+
+SEARCH_CONFIG = 'english'
+# Course fields that feed the search vector, a save touching none of them keeps the vector as is.
+INDEXED_FIELDS = {'title', 'description', 'category'}
+MAX_SEARCH_TERMS = 8
+
+def create_search_extensions(sender, using, **kwargs):
+    """pre_migrate receiver, the trigram index needs pg_trgm before the courses tables are created."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+def search_vector_expression():
+    """
+    Weighted document of a course: title (A), category title (B), learning objectives (C) and
+    description (D). Category and objectives come in as subqueries so the expression can be
+    used in a bulk UPDATE.
+    """
+    category_title = Category.objects.filter(pk=OuterRef('category_id')).values('title')[:1]
+    objectives = (
+        LearningObjective.objects.filter(course=OuterRef('pk'))
+        .order_by()
+        .values('course')
+        .annotate(text=StringAgg('objective', delimiter=' '))
+        .values('text')
+    )
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_title), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(objectives), weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+def update_search_vectors(queryset):
+    """Recompute the search vector of every course in queryset with a single UPDATE."""
+    return queryset.order_by().update(search_vector=search_vector_expression())
+
+def prefix_query(search_query):
+    """
+    tsquery matching every word of the search, the last one as a prefix so results show up while
+    the user is still typing. Words are reduced to \\w+ runs, nothing from the client reaches
+    the tsquery syntax.
+    """
+    terms = re.findall(r'\w+', search_query)[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    terms[-1] += ':*'
+    return SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+
+def search_courses(queryset, search_query):
+    """
+    Filter queryset to the courses matching search_query and annotate a `rank` to order them by.
+    A course matches on its search vector (stemmed full text, with prefix matching of the last
+    word) or on a title that is a close trigram match, which covers typos.
+    """
+    search_query = search_query.strip()
+    query = SearchQuery(search_query, search_type='websearch', config=SEARCH_CONFIG)
+    prefix = prefix_query(search_query)
+    if prefix is not None:
+        query = query | prefix
+
+    # real (float4) cast to double precision, so the Python float in a pagination cursor is the
+    # exact value and compares equal to the tied rows (courses/pagination.py)
+    return queryset.annotate(
+        rank=Cast(SearchRank(F('search_vector'), query) + TrigramWordSimilarity(search_query, 'title'), FloatField()),
+    ).filter(
+        Q(search_vector=query) | Q(title__trigram_word_similar=search_query)
+    )
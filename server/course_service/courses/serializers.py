@@ -1,21 +1,21 @@
-import os
 # from datetime import timedelta
 from rest_framework import serializers
 import cloudinary.uploader
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum
 import json
 from .models import (
     Category, Course, LearningObjective, CourseRequirement, Section, SectionItem, Review, Report,
     Video, Assessment, Question, Choice, SupportingDocument, Purchase, SectionItemCompletion, VideoSession,
     VideoUpload,
 )
-from .services import CallUserService, UserServiceException
+from .services import UserServiceException
+from .profiles import get_profile_loader
+from .db_service import course_analytics
 from banners.utils import get_ad_content
 
 from django.utils import timezone
 
-call_user_service = CallUserService()
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -212,35 +212,27 @@ class VideoSerializer(serializers.ModelSerializer):
         fields = ['id', 'video_url', 'thumbnail', 'duration', 'video_id', 'thumbnail_file']
 
     def create(self, validated_data):
+        # the files are pushed to storage by media jobs, the video is 'processing' until its job is done
+        from .media import create_media_job, save_job_source
         # video_file = validated_data.pop('video_file', None)
         video_id = validated_data.pop('video_id', None)
         thumbnail_file = validated_data.pop('thumbnail_file', None)
+        owner = validated_data['section_item'].section.course.instructor
 
+        video_uploaded = None
         if video_id:
-            video_uploaded = VideoUpload.objects.get(upload_id=video_id)
-            # Upload to Cloudinary
-            upload_result = cloudinary.uploader.upload(
-                video_uploaded.file_path,
-                resource_type="video",
-                folder="course/videos/",
-            )
-            validated_data['video_url'] = upload_result['secure_url']
-            # Clean up the temporary file after upload
-            os.remove(video_uploaded.file_path)
-            video_uploaded.delete() 
-        
+            video_uploaded = VideoUpload.objects.filter(upload_id=video_id).first()
+            if video_uploaded is None or not video_uploaded.file_path:
+                raise serializers.ValidationError({"video_id": "Upload not found or not complete yet"})
+            validated_data['status'] = 'processing'
+        video = super().create(validated_data)
+
+        if video_uploaded:
+            VideoUpload.objects.filter(pk=video_uploaded.pk).update(status='processing')
+            create_media_job('video', owner, video_uploaded.file_path, video=video, video_upload=video_uploaded)
         if thumbnail_file:
-            thumbnail_result = cloudinary.uploader.upload(
-                thumbnail_file,
-                resource_type="image",
-                folder="course/video_thumbnails/",
-                public_id=f"thumbnail_{validated_data.get('section_item').title.lower().replace(' ', '_')}",
-                overwrite=True
-            )
-            validated_data['thumbnail'] = thumbnail_result['secure_url']
-
-        validated_data['duration'] = int(upload_result.get('duration', 0))
-        return super().create(validated_data)
+            create_media_job('video_thumbnail', owner, save_job_source(thumbnail_file), video=video)
+        return video
         
 class SectionItemSerializer(serializers.ModelSerializer):
     # video = VideoSerializer(required=False)
@@ -318,7 +310,7 @@ class SectionItemSerializer(serializers.ModelSerializer):
 class VideoDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
-        fields = ['id', 'video_url', 'thumbnail', 'duration']
+        fields = ['id', 'video_url', 'thumbnail', 'duration', 'status']
 
 class AssessmentDetailSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
@@ -352,13 +344,27 @@ class CourseDetailSerializer(serializers.ModelSerializer):
                   "subscription", "subscription_amount", "is_available", "is_complete", "step", 
                   "video_session", "chat_upto", "safe_period", "created_at", "updated_at", "sections"]
         
+def format_duration(total_duration):
+    # Convert to hours, minutes, seconds format
+    hours = total_duration // 3600
+    minutes = (total_duration % 3600) // 60
+    seconds = total_duration % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+class CourseAnalyticsListSerializer(serializers.ListSerializer):
+    """Computes the analytics of every course of the list with one query (db_service.course_analytics)."""
+    def to_representation(self, data):
+        courses = list(data.all() if hasattr(data, 'all') else data)
+        self._context['course_analytics'] = course_analytics([course.id for course in courses])
+        return super().to_representation(courses)
+
 class CourseAnalyticsSerializer(serializers.ModelSerializer):
-    section_count = serializers.SerializerMethodField()
-    video_count = serializers.SerializerMethodField()
-    assessment_count = serializers.SerializerMethodField()
-    total_video_duration = serializers.SerializerMethodField()
-    document_count = serializers.SerializerMethodField()
-    total_admission = serializers.SerializerMethodField()
+    section_count = serializers.IntegerField(read_only=True)
+    video_count = serializers.IntegerField(read_only=True)
+    assessment_count = serializers.IntegerField(read_only=True)
+    total_video_duration = serializers.CharField(read_only=True)
+    document_count = serializers.IntegerField(read_only=True)
+    total_admission = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Course
@@ -372,40 +378,21 @@ class CourseAnalyticsSerializer(serializers.ModelSerializer):
             'document_count',
             'total_admission',
         ]
-
-    def get_section_count(self, obj):
-        return obj.sections.count()
-
-    def get_video_count(self, obj):
-        return SectionItem.objects.filter(
-            section__course=obj,
-            item_type='video'
-        ).count()
-
-    def get_assessment_count(self, obj):
-        return SectionItem.objects.filter(
-            section__course=obj,
-            item_type='assessment'
-        ).count()
-
-    def get_total_video_duration(self, obj):
-        total_duration = Video.objects.filter(
-            section_item__section__course=obj
-        ).aggregate(total_duration=Sum('duration'))['total_duration'] or 0
-        
-        # Convert to hours, minutes, seconds format
-        hours = total_duration // 3600
-        minutes = (total_duration % 3600) // 60
-        seconds = total_duration % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-    def get_document_count(self, obj):
-        return SupportingDocument.objects.filter(
-            section_item__section__course=obj
-        ).count()
-    
-    def get_total_admission(self, obj):
-        return Purchase.objects.filter(course=obj).count()
+        list_serializer_class = CourseAnalyticsListSerializer
+
+    def to_representation(self, obj):
+        # precomputed by the list serializer, a single course is one query of its own
+        row = self.context.get('course_analytics', {}).get(obj.id) or course_analytics([obj.id]).get(obj.id)
+        return {
+            'id': obj.id,
+            'title': obj.title,
+            'section_count': row['section_count'],
+            'video_count': row['video_count'],
+            'assessment_count': row['assessment_count'],
+            'total_video_duration': format_duration(row['total_video_duration']),
+            'document_count': row['document_count'],
+            'total_admission': row['enrollment_count'],
+        }
 
 class CourseUnAuthDetailSerializer(serializers.ModelSerializer):
     objectives = LearningObjectiveSerializer(many=True, read_only=True)
@@ -437,15 +424,18 @@ class CourseUnAuthDetailSerializer(serializers.ModelSerializer):
             'average_rating',
             'total_reviews'
         ]
+        list_serializer_class = CourseAnalyticsListSerializer  # analytics of the whole list in one query
 
     def get_analytics(self, obj):
-        analytics_serializer = CourseAnalyticsSerializer(obj)
+        analytics_serializer = CourseAnalyticsSerializer(obj, context=self.context)
         return analytics_serializer.data
     
     def get_instructor_details(self, obj):
             try:
-                response_user_service = call_user_service.get_user_details(obj.instructor)
-                return response_user_service.json()
+                instructor_details = get_profile_loader().load(obj.instructor)
+                if instructor_details is None:
+                    return {"error": "Instructor not found"}
+                return instructor_details
             except UserServiceException as e:
                 return {"error": str(e)}
             except Exception as e:
@@ -532,15 +522,10 @@ class StudentMyCourseSerializer(serializers.ModelSerializer):
         ]
 
     def get_completed_section_items(self, obj):
-        # Count how many section items are completed for this purchase
-        return SectionItemCompletion.objects.filter(
-            purchase=obj,
-            completed=True
-        ).count()
+        return obj.completed_items
     
     def get_course_total_section_items(self, obj):
-        # Count total section items for the course related to this purchase
-        return SectionItem.objects.filter(section__course=obj.course).count()
+        return obj.course.total_items
     
     def get_video_session_status(self, obj):
         # Count total section items for the course related to this purchase
@@ -615,32 +600,29 @@ class StudentMyCourseDetailSerializer(serializers.ModelSerializer):
             'video_session',
         ]
 
+    def to_representation(self, instance):
+        # The cached course tree and the purchase's progress are loaded once, the method fields
+        # below only read them (courses/curriculum.py).
+        from .curriculum import get_curriculum, load_progress
+        self._curriculum = get_curriculum(instance.course)
+        self._progress = load_progress(instance)
+        return super().to_representation(instance)
+
     def get_course_total_section_items(self, obj):
-        return SectionItem.objects.filter(section__course=obj.course).count()
+        return self._curriculum['total_items']
 
     def get_completed_section_items(self, obj):
-        return SectionItemCompletion.objects.filter(
-            purchase=obj,
-            completed=True
-        ).count()
+        return sum(1 for row in self._progress.values() if row['completed'])
 
     def get_sections(self, obj):
-        sections = Section.objects.filter(course=obj.course)
-        return SectionDetailWithItemsSerializer(
-            sections,
-            many=True,
-            context={'purchase': obj}
-        ).data
+        from .curriculum import overlay_progress
+        return overlay_progress(self._curriculum['sections'], self._progress)
    
     def get_course(self, obj):
-        course = obj.course
-        return CourseUnAuthDetailSerializer(course).data
+        return self._curriculum['course']
     
     def get_ad_viewed(self, obj):
-        return SectionItemCompletion.objects.filter(
-            purchase=obj,
-            ad_viewed=True
-        ).values_list('section_item__id', flat=True)
+        return [section_item_id for section_item_id, row in self._progress.items() if row['ad_viewed']]
     
     def get_ads(self, obj):  # <--- new method
         if obj.purchase_type == 'freemium':
@@ -802,11 +784,27 @@ class TutorVideoSessionSerializer(VideoSessionSerializer):
         return data
 
 class ChunkUploadSerializer(serializers.Serializer):
-    upload_id = serializers.CharField()
-    chunk_number = serializers.IntegerField()
-    total_chunks = serializers.IntegerField()
+    upload_id = serializers.RegexField(r'^[\w-]{1,100}$')
+    chunk_number = serializers.IntegerField(min_value=1)
+    total_chunks = serializers.IntegerField(min_value=1)
     chunk = serializers.FileField()
     file_name = serializers.CharField(max_length=255)
+    chunk_size = serializers.IntegerField(min_value=1, required=False)  # defaults to settings.UPLOAD_CHUNK_SIZE
+    file_size = serializers.IntegerField(min_value=1, required=False)
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)  # sha256 of the chunk
+
+    def validate(self, data):
+        if data['chunk_number'] > data['total_chunks']:
+            raise serializers.ValidationError("chunk_number can't be greater than total_chunks")
+        if data['total_chunks'] > settings.UPLOAD_MAX_CHUNKS:
+            raise serializers.ValidationError(f"An upload can have at most {settings.UPLOAD_MAX_CHUNKS} chunks")
+        # chunk_size and file_size decide the size of the preallocated file and every write offset
+        chunk_size = data.get('chunk_size') or settings.UPLOAD_CHUNK_SIZE
+        if chunk_size > settings.UPLOAD_CHUNK_SIZE:
+            raise serializers.ValidationError(f"chunk_size can't be greater than {settings.UPLOAD_CHUNK_SIZE} bytes")
+        if data.get('file_size') and data['file_size'] > data['total_chunks'] * chunk_size:
+            raise serializers.ValidationError("file_size can't be greater than total_chunks * chunk_size")
+        return data
 
 class VideoUploadSerializer(serializers.ModelSerializer):
     class Meta:
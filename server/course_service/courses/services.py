@@ -1,5 +1,6 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from rest_framework import status
 from rest_framework.exceptions import APIException
 
@@ -8,19 +9,31 @@ class UserServiceException(APIException):
     default_detail = 'User service operation failed'
     default_code = 'user_service_error'
 
+def _pooled_session():
+    # one keep-alive connection pool per process instead of a new connection for every call
+    pool_size = int(os.getenv('USER_SERVICE_POOL_SIZE', '10'))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 class CallUserService:
     USER_SERVICE_URL = os.getenv('USER_SERVICE_URL')
+    session = None  # shared by every instance, created by the first one
     
     def __init__(self):
         if not self.USER_SERVICE_URL:
             raise ValueError("USER_SERVICE_URL environment variable is not set")
+        if CallUserService.session is None:
+            CallUserService.session = _pooled_session()
 
     def _make_request(self, method, headers=None, path=None, data=None, url=None):
         if not url:
             url = self.USER_SERVICE_URL + path
 
         try:
-            return requests.request(
+            return self.session.request(
                 method,
                 url,
                 json=data,
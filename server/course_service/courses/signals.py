@@ -1,8 +1,21 @@
 from datetime import timedelta
 from django.utils import timezone
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Purchase, VideoSession
+from banners.models import HomeBanner
+from .models import (
+    Category, Course, LearningObjective, CourseRequirement, Section, SectionItem, Video, Assessment, Question,
+    Choice, SupportingDocument, Purchase, Review, SectionItemCompletion, VideoSession,
+)
+from .search import INDEXED_FIELDS, update_search_vectors
+from .counters import (
+    add_review, remove_review, add_enrollment, remove_enrollment, change_total_items, remove_completed_item,
+    reconcile_course_counters,
+)
+from .db_service import change_tutor_enrollments, refresh_tutor_stats
+from .snapshots import snapshot_changed, invalidate_home_user
+from .curriculum import bump_curriculum_version
 from . rabbitmq_publisher import publish_chat_event, publish_notification_event
 
 def chat_expiry_date(days):
@@ -96,4 +109,138 @@ def handle_video_session_update(sender, instance, **kwargs):
                 }
             )
 
+# Keep Course.search_vector in sync with the text it is built from.
+@receiver(post_save, sender=Course)
+def update_course_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    update_search_vectors(Course.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Category)
+def update_category_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(Course.objects.filter(category=instance))
+
+@receiver(post_save, sender=LearningObjective)
+@receiver(post_delete, sender=LearningObjective)
+def update_objective_search_vector(sender, instance, **kwargs):
+    update_search_vectors(Course.objects.filter(pk=instance.course_id))
+
+# Denormalized Course counters, see courses/counters.py
+@receiver(post_save, sender=Review)
+def count_review_saved(sender, instance, created, **kwargs):
+    if created:
+        add_review(instance.course_id, instance.rating)
+    else:
+        # the rating may have changed, edits are rare enough to just recount the course
+        reconcile_course_counters(Course.objects.filter(pk=instance.course_id))
+
+@receiver(post_delete, sender=Review)
+def count_review_deleted(sender, instance, **kwargs):
+    remove_review(instance.course_id, instance.rating)
+
+@receiver(post_save, sender=Purchase)
+def count_purchase_saved(sender, instance, created, **kwargs):
+    if created:
+        add_enrollment(instance.course_id)
+        if instance.course.is_available:
+            change_tutor_enrollments(instance.course.instructor, 1)
+
+@receiver(post_delete, sender=Purchase)
+def count_purchase_deleted(sender, instance, **kwargs):
+    remove_enrollment(instance.course_id)
+    course = Course.objects.filter(pk=instance.course_id).only('instructor', 'is_available').first()
+    if course is not None and course.is_available:
+        change_tutor_enrollments(course.instructor, -1)
+
+@receiver(post_save, sender=SectionItem)
+def count_section_item_saved(sender, instance, created, **kwargs):
+    if created:
+        change_total_items(instance.section_id, 1)
+
+@receiver(post_delete, sender=SectionItem)
+def count_section_item_deleted(sender, instance, **kwargs):
+    change_total_items(instance.section_id, -1)
+
+@receiver(post_delete, sender=SectionItemCompletion)
+def count_completion_deleted(sender, instance, **kwargs):
+    if instance.completed:
+        remove_completed_item(instance.purchase_id)
+
+# Top-tutors leaderboard (TutorStats), see courses/db_service.py
+LEADERBOARD_FIELDS = {'is_available', 'instructor'}
+
+@receiver(post_save, sender=Course)
+def update_tutor_stats(sender, instance, created, update_fields=None, **kwargs):
+    if created and not instance.is_available:
+        return
+    if update_fields is not None and not LEADERBOARD_FIELDS.intersection(update_fields):
+        return
+    refresh_tutor_stats(instance.instructor)
+
+@receiver(post_delete, sender=Course)
+def remove_course_from_tutor_stats(sender, instance, **kwargs):
+    refresh_tutor_stats(instance.instructor)
+
+# Page snapshots (courses/snapshots.py), refreshed once the change is committed
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def purchase_changed_snapshots(sender, instance, **kwargs):
+    transaction.on_commit(lambda: snapshot_changed('landing'))
+    transaction.on_commit(lambda: invalidate_home_user(instance.user))
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed_snapshots(sender, instance, **kwargs):
+    transaction.on_commit(lambda: snapshot_changed('landing'))
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed_snapshots(sender, instance, **kwargs):
+    transaction.on_commit(lambda: snapshot_changed('landing'))
+    transaction.on_commit(lambda: snapshot_changed('home'))
+
+@receiver(post_save, sender=HomeBanner)
+@receiver(post_delete, sender=HomeBanner)
+def home_banner_changed_snapshots(sender, instance, **kwargs):
+    transaction.on_commit(lambda: snapshot_changed('home'))
+
+# Cached curriculum trees (courses/curriculum.py), any edit moves the course to a new version
+@receiver(post_save, sender=Course)
+def course_curriculum_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) - {'updated_at'}:
+        return  # nothing but the timestamp changed
+    bump_curriculum_version(pk=instance.pk)
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=LearningObjective)
+@receiver(post_delete, sender=LearningObjective)
+@receiver(post_save, sender=CourseRequirement)
+@receiver(post_delete, sender=CourseRequirement)
+def course_part_changed(sender, instance, **kwargs):
+    bump_curriculum_version(pk=instance.course_id)
+
+@receiver(post_save, sender=SectionItem)
+@receiver(post_delete, sender=SectionItem)
+def section_item_changed(sender, instance, **kwargs):
+    bump_curriculum_version(sections=instance.section_id)
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=Assessment)
+@receiver(post_delete, sender=Assessment)
+@receiver(post_save, sender=SupportingDocument)
+@receiver(post_delete, sender=SupportingDocument)
+def item_content_changed(sender, instance, **kwargs):
+    bump_curriculum_version(sections__items=instance.section_item_id)
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_curriculum_version(sections__items__assessment=instance.assessment_id)
 
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    bump_curriculum_version(sections__items__assessment__questions=instance.question_id)
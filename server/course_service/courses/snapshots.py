@@ -0,0 +1,170 @@
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from banners.utils import get_home_banner
+from .models import Course, Purchase, TutorStats
+from .serializers import CourseSerializer, StudentMyCourseSerializer
+from .utils import get_tutor_details
+
+logger = logging.getLogger(__name__)
+
+class SnapshotUnavailable(Exception):
+    """A snapshot could not be built and there is no previous one to serve."""
+    def __init__(self, response):
+        super().__init__("Snapshot unavailable")
+        self.response = response
+
+# Builders return the payload of a snapshot, or raise SnapshotUnavailable with the error response.
+
+def build_landing():
+    tutors = list(TutorStats.objects.values('instructor', 'total_courses', 'total_enrollments')[:4])
+    tutors_result, tutors_error = get_tutor_details(tutors)
+    if tutors_error:
+        raise SnapshotUnavailable(tutors_error)
+    courses_query = Course.objects.filter(is_available=True, is_blocked=False)
+    total_courses = courses_query.count()
+    total_instructors = courses_query.values('instructor').distinct().count()
+    purchases = Purchase.objects.all()
+    total_purchases = purchases.count()
+    completed_courses = purchases.filter(completed=True).count()
+    total_students = purchases.values('user').distinct().count()
+    courses_result = {
+        "total_courses": total_courses,
+        "total_instructors": total_instructors,
+        "total_purchases": total_purchases,
+        "total_students": total_students,
+        "completed_courses": completed_courses,
+    }
+    most_purchased_courses = Course.objects.order_by('-enrollment_count')[:3]
+    serializer = CourseSerializer(most_purchased_courses, many=True)
+    return {"tutors": tutors_result, 'course_details': courses_result, 'courses': serializer.data}
+
+def build_home():
+    """The part of the home page that is the same for every user."""
+    courses = Course.objects.filter(is_complete=True, is_available=True)[:3]
+    course_serializer = CourseSerializer(courses, many=True)
+    ad_details = get_home_banner()
+    return {'courses': course_serializer.data, 'banner_details': ad_details.get('home_banner')}
+
+BUILDERS = {
+    'landing': build_landing,
+    'home': build_home,
+}
+
+def _key(name):
+    return f"snapshot:{name}"
+
+def _stale_key(name):
+    return f"snapshot:{name}:stale"
+
+def _lock_key(name):
+    return f"snapshot:{name}:lock"
+
+def _queued_key(name):
+    return f"snapshot:{name}:queued"
+
+def _build(name):
+    """Recompute and store a snapshot, the caller holds its lock. Returns the payload."""
+    # cleared before building, so an event that lands meanwhile marks the new snapshot stale
+    cache.delete(_stale_key(name))
+    started = time.monotonic()
+    payload = BUILDERS[name]()
+    cache.set(_key(name), {'payload': payload, 'built_at': time.time()}, settings.SNAPSHOT_MAX_AGE)
+    logger.info(f"Snapshot {name} refreshed in {time.monotonic() - started:.2f}s")
+    return payload
+
+def refresh(name):
+    """Recompute and store a snapshot, unless another worker is already doing it."""
+    if not cache.add(_lock_key(name), 1, settings.SNAPSHOT_LOCK_TIMEOUT):
+        logger.debug(f"Snapshot {name} is already being refreshed")
+        return False
+    try:
+        _build(name)
+        return True
+    except SnapshotUnavailable:
+        logger.warning(f"Snapshot {name} could not be refreshed, keeping the previous one")
+        return False
+    finally:
+        cache.delete_many([_lock_key(name), _queued_key(name)])
+
+def _build_missing(name):
+    """
+    A missing snapshot (first request, Redis flushed) is built by the one request that gets the
+    lock; the others wait up to SNAPSHOT_WAIT_SECONDS for it, then get a 503.
+    """
+    if cache.add(_lock_key(name), 1, settings.SNAPSHOT_LOCK_TIMEOUT):
+        try:
+            return _build(name)  # a SnapshotUnavailable goes to the caller with its error response
+        finally:
+            cache.delete_many([_lock_key(name), _queued_key(name)])
+
+    deadline = time.monotonic() + settings.SNAPSHOT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(settings.SNAPSHOT_POLL_INTERVAL)
+        entry = cache.get(_key(name))
+        if entry is not None:
+            return entry['payload']
+    logger.warning(f"Gave up waiting for snapshot {name} to be built")
+    raise SnapshotUnavailable(Response({"error": "This page is being prepared, try again shortly"}, status=503))
+
+def schedule_refresh(name):
+    from .tasks import refresh_snapshot
+    try:
+        refresh_snapshot.delay(name)
+    except Exception as e:
+        cache.delete(_queued_key(name))
+        logger.warning(f"Could not queue a refresh of snapshot {name}: {str(e)}")
+
+def queue_refresh(name):
+    # add() only succeeds once until the refresh ran, concurrent callers don't queue duplicates
+    if cache.add(_queued_key(name), 1, settings.SNAPSHOT_LOCK_TIMEOUT):
+        schedule_refresh(name)
+
+def snapshot_changed(name):
+    """Called after events that change a snapshot: mark it stale and queue a refresh."""
+    cache.set(_stale_key(name), 1, settings.SNAPSHOT_MAX_AGE)
+    queue_refresh(name)
+
+def get_snapshot(name):
+    """
+    The last snapshot of `name`, returned right away. A stale one (older than its refresh interval
+    or marked by an event) is refreshed in the background. Only a missing snapshot is built inline,
+    by a single request. Raises SnapshotUnavailable when it can't be built or waited for.
+    """
+    entries = cache.get_many([_key(name), _stale_key(name)])
+    entry = entries.get(_key(name))
+    if entry is None:
+        return _build_missing(name)
+
+    age = time.time() - entry['built_at']
+    if age > settings.SNAPSHOT_REFRESH_SECONDS[name] or _stale_key(name) in entries:
+        queue_refresh(name)
+    return entry['payload']
+
+def refresh_stale_snapshots():
+    """Periodic refresher, recomputes every snapshot that is stale or missing."""
+    for name in BUILDERS:
+        entries = cache.get_many([_key(name), _stale_key(name)])
+        entry = entries.get(_key(name))
+        if (entry is None or _stale_key(name) in entries
+                or time.time() - entry['built_at'] > settings.SNAPSHOT_REFRESH_SECONDS[name]):
+            refresh(name)
+
+# Per-user part of HomeView, a plain cache entry with a short TTL
+
+def _home_user_key(user_id):
+    return f"home:user:{user_id}"
+
+def get_home_user_courses(user_id):
+    key = _home_user_key(user_id)
+    my_courses = cache.get(key)
+    if my_courses is None:
+        purchases = Purchase.objects.filter(user=user_id).select_related('course')[:4]
+        my_courses = StudentMyCourseSerializer(purchases, many=True).data
+        cache.set(key, my_courses, settings.HOME_USER_CACHE_TTL)
+    return my_courses
+
+def invalidate_home_user(user_id):
+    cache.delete(_home_user_key(user_id))
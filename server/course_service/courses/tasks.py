@@ -0,0 +1,36 @@
+from celery import shared_task
+from django.core.management import call_command
+from django.conf import settings
+
+@shared_task
+def run_tutor_leaderboard_rebuild():
+    call_command('rebuild_tutor_leaderboard')
+
+@shared_task(ignore_result=True)
+def refresh_snapshot(name):
+    from .snapshots import refresh
+    refresh(name)
+
+@shared_task(ignore_result=True)
+def refresh_page_snapshots():
+    from .snapshots import refresh_stale_snapshots
+    refresh_stale_snapshots()
+
+@shared_task(bind=True, ignore_result=True, max_retries=settings.MEDIA_JOB_MAX_RETRIES)
+def process_media_job(self, job_id):
+    from .media import job_attempts, job_failed, job_retrying, retry_delay, run_job
+    try:
+        run_job(job_id)
+    except Exception as e:
+        # counted on the job, a message queued again by the sweep starts over at request.retries 0
+        retries = job_attempts(job_id) - 1
+        if retries >= self.max_retries:
+            job_failed(job_id, e)
+            return
+        job_retrying(job_id, e)
+        raise self.retry(exc=e, countdown=retry_delay(retries), max_retries=retries + 1)
+
+@shared_task(ignore_result=True)
+def requeue_stale_media_jobs():
+    from .media import requeue_stale_jobs
+    requeue_stale_jobs()
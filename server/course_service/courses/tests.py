@@ -1,3 +1,180 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .models import Course, Purchase, Review, Section, SectionItem, TutorStats
+from .pagination import keyset_page
+from .search import search_courses
+from .serializers import ChunkUploadSerializer
+from .utils import complete_section_item
+from . import snapshots
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+def page_through(queryset, page_size):
+    """Every row of queryset, walking the next cursors from the first page."""
+    rows, cursor = [], None
+    while True:
+        page, cursor, _ = keyset_page(queryset, page_size, cursor)
+        rows += page
+        if cursor is None:
+            return rows
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for number in range(7):
+            Course.objects.create(title=f"Course {number}", description='Course', instructor=1)
+        Course.objects.update(created_at=Course.objects.first().created_at)  # every row ties on created_at
+
+    def test_ties_are_broken_by_the_primary_key(self):
+        courses = Course.objects.order_by('-created_at')
+        paged = page_through(courses, 3)
+        self.assertEqual([course.pk for course in paged], sorted(Course.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_previous_cursor_returns_the_page_before(self):
+        courses = Course.objects.order_by('-created_at')
+        first, cursor, previous = keyset_page(courses, 3)
+        self.assertIsNone(previous)
+        second, cursor, previous = keyset_page(courses, 3, cursor)
+        third, _, previous = keyset_page(courses, 3, cursor)
+        self.assertEqual(len(third), 1)
+
+        back, _, previous = keyset_page(courses, 3, previous)
+        self.assertEqual(back, second)
+        back, _, previous = keyset_page(courses, 3, previous)
+        self.assertEqual(back, first)
+        self.assertIsNone(previous)
+
+    def test_values_rows_keep_only_the_selected_columns(self):
+        for instructor in range(5):
+            TutorStats.objects.create(instructor=instructor, total_courses=1, total_enrollments=instructor % 2)
+        rows = page_through(TutorStats.objects.values('instructor'), 2)
+        self.assertEqual(rows, [{'instructor': instructor} for instructor in (1, 3, 0, 2, 4)])
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KeysetSearchTests(TestCase):
+    def test_tied_search_ranks_are_paged_without_losing_rows(self):
+        for number in range(7):
+            Course.objects.create(title=f"Django course {number}", description='Django', instructor=1)
+        courses = search_courses(Course.objects.all(), 'django').order_by('-rank', '-created_at')
+        self.assertEqual(len({course.rank for course in courses}), 1)  # every match ties
+
+        paged = page_through(courses, 3)
+        self.assertEqual([course.pk for course in paged], [course.pk for course in courses])
+
+@override_settings(CACHES=LOCAL_CACHE)
+class CounterFieldsSaveTests(TestCase):
+    def setUp(self):
+        Course.objects.create(title='Django', description='Django', instructor=1, is_available=True)
+        self.course = Course.objects.get(title='Django')
+
+    def saved_fields(self, instance):
+        received = []
+        receiver = lambda sender, update_fields=None, **kwargs: received.append(update_fields)
+        post_save.connect(receiver, sender=type(instance))
+        try:
+            instance.save()
+        finally:
+            post_save.disconnect(receiver, sender=type(instance))
+        return received[0]
+
+    def test_plain_save_reports_only_the_changed_fields(self):
+        self.course.step = 2
+        self.assertEqual(self.saved_fields(self.course), {'step', 'updated_at'})
+        self.course.title = 'Django for beginners'
+        self.assertEqual(self.saved_fields(self.course), {'title', 'updated_at'})
+
+    def test_save_of_unindexed_field_skips_search_and_leaderboard_work(self):
+        self.course.step = 2
+        with self.assertNumQueries(2):  # the UPDATE and the curriculum version bump
+            self.course.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.step, 2)
+
+@override_settings(CACHES=LOCAL_CACHE)
+class CourseCounterTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Django', description='Django', instructor=1, is_available=True)
+        section = Section.objects.create(course=self.course, title='Basics')
+        self.items = [SectionItem.objects.create(section=section, title=f"Item {number}", item_type='video') for number in range(2)]
+
+    def test_stale_save_keeps_the_counters(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        Review.objects.create(course=self.course, user=2, rating=4)
+        Purchase.objects.create(user=2, course=self.course, purchase_type='freemium')
+        stale.title = 'Django for beginners'
+        stale.save()
+
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual((course.review_count, course.rating_sum, course.enrollment_count, course.total_items), (1, 4, 1, 2))
+        self.assertEqual(course.title, 'Django for beginners')
+
+    def test_deleting_an_item_counts_it_out(self):
+        self.items[0].delete()
+        self.assertEqual(Course.objects.get(pk=self.course.pk).total_items, 1)
+
+    def test_double_submit_counts_the_item_once(self):
+        purchase = Purchase.objects.create(user=2, course=Course.objects.get(pk=self.course.pk), purchase_type='freemium')
+        self.assertTrue(complete_section_item(purchase, self.items[0]))
+        self.assertFalse(complete_section_item(purchase, self.items[0]))
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.completed_items, 1)
+        self.assertFalse(purchase.completed)
+
+        self.assertTrue(complete_section_item(purchase, self.items[1]))
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.completed_items, 2)
+        self.assertTrue(purchase.completed)
+
+@override_settings(CACHES=LOCAL_CACHE, SNAPSHOT_WAIT_SECONDS=1)
+class MissingSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_missing_snapshot_is_built_once(self):
+        builder = mock.Mock(return_value={'courses': []})
+        with mock.patch.dict(snapshots.BUILDERS, home=builder):
+            self.assertEqual(snapshots.get_snapshot('home'), {'courses': []})
+            self.assertEqual(snapshots.get_snapshot('home'), {'courses': []})
+        builder.assert_called_once()
+
+    def test_requests_wait_for_the_build_another_one_runs(self):
+        cache.add(snapshots._lock_key('home'), 1)  # another request is building it
+        store = lambda: cache.set(snapshots._key('home'), {'payload': {'courses': [1]}, 'built_at': time.time()})
+        timer = threading.Timer(0.2, store)
+        builder = mock.Mock()
+        with mock.patch.dict(snapshots.BUILDERS, home=builder):
+            timer.start()
+            self.assertEqual(snapshots.get_snapshot('home'), {'courses': [1]})
+        builder.assert_not_called()
+
+    def test_waiting_too_long_is_a_503(self):
+        cache.add(snapshots._lock_key('home'), 1)
+        builder = mock.Mock()
+        with mock.patch.dict(snapshots.BUILDERS, home=builder), \
+                self.assertRaises(snapshots.SnapshotUnavailable) as raised:
+            snapshots.get_snapshot('home')
+        self.assertEqual(raised.exception.response.status_code, 503)
+        builder.assert_not_called()
+
+@override_settings(UPLOAD_CHUNK_SIZE=1024)
+class ChunkUploadSerializerTests(TestCase):
+    def serializer(self, **data):
+        data = {'upload_id': 'abc', 'chunk_number': 1, 'total_chunks': 2, 'file_name': 'video.mp4', **data}
+        return ChunkUploadSerializer(data={**data, 'chunk': SimpleUploadedFile('chunk', b'x' * 10)})
+
+    def test_sizes_within_bounds_are_accepted(self):
+        self.assertTrue(self.serializer(chunk_size=1024, file_size=2048).is_valid())
+        self.assertTrue(self.serializer(file_size=1500).is_valid())
+
+    def test_chunk_size_is_capped(self):
+        self.assertFalse(self.serializer(chunk_size=1025).is_valid())
+
+    def test_file_size_must_fit_in_the_chunks(self):
+        self.assertFalse(self.serializer(chunk_size=512, file_size=1025).is_valid())
+        self.assertFalse(self.serializer(file_size=2049).is_valid())
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+from django.conf import settings
+from django.db.models import BinaryField, F, Func, IntegerField, Value
+from django.utils.text import get_valid_filename
+from .models import VideoUpload
+
+logger = logging.getLogger(__name__)
+
+# Chunked video uploads. Every chunk is written straight into one preallocated file at its byte
+# offset, (chunk_number - 1) * chunk_size, so chunks may arrive in any order and in parallel.
+# Arrival is a bitmap on VideoUpload flipped by a single conditional UPDATE, which also counts
+# the chunk, so a chunk sent twice is only counted once. Once every bit is set the file is cut to
+# its real size and renamed, nothing is copied.
+
+class ChunkUploadError(Exception):
+    """The chunk doesn't fit the upload, answered with a 400."""
+
+def _upload_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'course_videos')
+
+def _part_path(upload):
+    return os.path.join(_upload_dir(), f"{upload.upload_id}_{get_valid_filename(os.path.basename(upload.file_name))}.part")
+
+def _has_bit(bitmap, index):
+    return bool(bitmap[index // 8] & (1 << (index % 8)))
+
+def missing_chunks(upload):
+    """1-based numbers of the chunks not received yet."""
+    bitmap = bytes(upload.received_chunks)
+    return [index + 1 for index in range(upload.total_chunks) if not _has_bit(bitmap, index)]
+
+def _get_or_create_upload(upload_id, total_chunks, file_name, chunk_size):
+    upload, created = VideoUpload.objects.get_or_create(
+        upload_id=upload_id,
+        defaults={
+            'file_name': file_name,
+            'total_chunks': total_chunks,
+            'chunk_size': chunk_size,
+            'received_chunks': bytes((total_chunks + 7) // 8),
+        }
+    )
+    if not created and (upload.total_chunks != total_chunks or upload.chunk_size != chunk_size):
+        raise ChunkUploadError("total_chunks and chunk_size must stay the same for every chunk of an upload")
+    return upload
+
+def _open_target(path, size):
+    """Open the target file, creating it and growing it (sparse) to size if needed. Safe to race."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+    return fd
+
+def _write_chunk(path, preallocate, offset, chunk, max_length):
+    """Write the uploaded chunk at offset, return (bytes written, sha256 hex digest)."""
+    digest = hashlib.sha256()
+    written = 0
+    fd = _open_target(path, preallocate)
+    try:
+        for data in chunk.chunks():
+            written += len(data)
+            if written > max_length:
+                raise ChunkUploadError(f"Chunk is larger than the chunk size of {max_length} bytes")
+            digest.update(data)
+            view = memoryview(data)
+            while view:
+                count = os.pwrite(fd, view, offset)
+                offset += count
+                view = view[count:]
+    finally:
+        os.close(fd)
+    return written, digest.hexdigest()
+
+def _mark_received(upload, index):
+    """Set bit `index` and count the chunk, unless it was already set. Returns True if this call set it."""
+    return bool(
+        VideoUpload.objects.filter(pk=upload.pk)
+        .alias(received=Func(F('received_chunks'), Value(index), function='get_bit', output_field=IntegerField()))
+        .filter(received=0)
+        .update(
+            received_chunks=Func(F('received_chunks'), Value(index), Value(1), function='set_bit', output_field=BinaryField()),
+            chunks_uploaded=F('chunks_uploaded') + 1,
+        )
+    )
+
+def finalize_upload(upload):
+    """
+    Cut the preallocated file to its real size and give it its final name, O(1). The conditional
+    UPDATE lets exactly one of the requests that saw the upload complete do it.
+    """
+    part_path = _part_path(upload)
+    final_path = part_path[:-len('.part')]
+    claimed = VideoUpload.objects.filter(
+        pk=upload.pk, file_path='', chunks_uploaded=F('total_chunks')
+    ).update(file_path=final_path)
+    if not claimed:
+        return
+    with open(part_path, 'r+b') as target:
+        target.truncate(upload.file_size)
+    os.replace(part_path, final_path)
+    upload.file_path = final_path
+    logger.info(f"Upload {upload.upload_id} finalized, {upload.file_size} bytes")
+
+def handle_chunk_upload(upload_id, chunk_number, total_chunks, chunk, file_name, chunk_size=None, file_size=None, checksum=None):
+    """
+    Store one chunk of an upload. Returns a dictionary with message, upload_id, chunks_uploaded,
+    the sha256 of the chunk and whether the upload is complete.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    upload = _get_or_create_upload(upload_id, total_chunks, file_name, chunk_size)
+    if upload.file_path:
+        raise ChunkUploadError(f"Upload {upload_id} is already complete")
+    index = chunk_number - 1
+    offset = index * chunk_size
+    preallocate = file_size or total_chunks * chunk_size
+
+    written, digest = _write_chunk(_part_path(upload), preallocate, offset, chunk, chunk_size)
+    if checksum and checksum.lower() != digest:
+        raise ChunkUploadError(f"Checksum mismatch for chunk {chunk_number}, send it again")
+    if chunk_number < total_chunks and written != chunk_size:
+        raise ChunkUploadError(f"Chunk {chunk_number} must be exactly {chunk_size} bytes")
+    if chunk_number == total_chunks:
+        # the last chunk fixes the real size of the file
+        VideoUpload.objects.filter(pk=upload.pk).update(file_size=offset + written)
+
+    newly_received = _mark_received(upload, index)
+    upload.refresh_from_db(fields=['chunks_uploaded', 'file_size'])
+    complete = upload.chunks_uploaded == upload.total_chunks
+    if newly_received and complete:
+        finalize_upload(upload)
+
+    return {
+        'message': 'Chunk uploaded successfully',
+        'upload_id': upload_id,
+        'chunks_uploaded': upload.chunks_uploaded,
+        'checksum': digest,
+        'complete': complete,
+    }
+
+def upload_status(upload_id):
+    upload = VideoUpload.objects.get(upload_id=upload_id)
+    return {
+        'upload_id': upload.upload_id,
+        'file_name': upload.file_name,
+        'total_chunks': upload.total_chunks,
+        'chunk_size': upload.chunk_size,
+        'chunks_uploaded': upload.chunks_uploaded,
+        'missing_chunks': missing_chunks(upload),
+        'complete': bool(upload.file_path),
+    }
@@ -7,7 +7,8 @@ from .views import (
     CourseUnAuthDetailView, CoursePurchaseView, StudentMyCoursesListView, StudentMyCourseDetailView, StudentAssessmentSubmitView, StudentLectureSubmitView,
     TutorToggleActivationCourseView, StudentFetchTopTutorsView, StudentTutorAnalysisView, TutorCoursePreviewView, ReviewListCreateAPIView, StudentCourseFeedbackView,
     ReportListCreateAPIView, AdminUserCoursesDetailsView, StripeWebhookView, CreatePaymentIntentView, AdViewedSubmitView, HomeView, AdminListReportsAPIView,
-    AdminReportActionPIView, ScheduleSessionView, TutorVideoSessionsView, GetSessionTokenView, VideoSessionUpdateView, ChunkUploadView
+    AdminReportActionPIView, ScheduleSessionView, TutorVideoSessionsView, GetSessionTokenView, VideoSessionUpdateView, ChunkUploadView,
+    AssessmentBatchGradeView, ChunkUploadStatusView, MediaJobStatusView,
 )
 
 router = DefaultRouter()
@@ -48,6 +49,8 @@ urlpatterns = [
 
     # Section items related
     path('upload-chunk/', ChunkUploadView.as_view(), name='chunk-upload'),
+    path('upload-chunk/<str:upload_id>/status/', ChunkUploadStatusView.as_view(), name='chunk-upload-status'),
+    path('media-jobs/<uuid:job_id>/', MediaJobStatusView.as_view(), name='media-job-status'),
     # path('upload-to-cloudinary/', CloudinaryUploadView.as_view(), name='cloudinary-upload'),
     path('section-items/', SectionItemCreateView.as_view(), name='section-item-create'),
     path('section-items/<int:id>/delete', SectionItemDeleteView.as_view(), name='section-item-delete'),
@@ -66,6 +69,7 @@ urlpatterns = [
 
     # purchased course's section items completion
     path('assessments/<int:assessment_id>/submit/', StudentAssessmentSubmitView.as_view(), name='assessment-submit-course-student'),
+    path('assessments/<int:assessment_id>/grade-batch/', AssessmentBatchGradeView.as_view(), name='assessment-grade-batch'),
     path('lecture/<int:lecture_id>/submit/', StudentLectureSubmitView.as_view(), name='assessment-submit-course-student'),
 
     # freemium course, mark as ad viewed
@@ -7,16 +7,17 @@ import logging
 import stripe
 from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
+from django.db.models import Q
 from django.db import DatabaseError
 from django.conf import settings
-from django.db import connection, IntegrityError
+from django.db import connection, IntegrityError, transaction
 from django.utils import timezone
 
 from rest_framework import viewsets, generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import AllowAny
@@ -24,7 +25,7 @@ from rest_framework.exceptions import PermissionDenied
 
 from .models import (
     Category, Course, LearningObjective, CourseRequirement, Section, SectionItem, Purchase, 
-    SectionItemCompletion, Assessment, Review, Report, VideoUpload, VideoSession
+    SectionItemCompletion, Assessment, Review, Report, VideoUpload, VideoSession, TutorStats, MediaJob
 )
 from .serializers import (
     CategorySerializer, CategorySerializerUser, CourseSerializer, LearningObjectiveSerializer, 
@@ -37,11 +38,17 @@ from .serializers import (
 from .permissions import IsAdminUserCustom, IsProfileCompleted, IsUser
 from .services import CallUserService, UserServiceException
 from .rabbitmq_publisher import publish_notification_event
-from banners.utils import get_home_banner
 from transactions.utils import record_course_purchase, record_course_refund, record_transaction_reported, change_transaction_status_back_to_pending
 from course_service.zego_cloud.token04 import generate_token04
-from .utils import mark_purchase_completed, handle_thumbnail_upload, handle_chunk_upload, get_tutor_details
-from .db_service import top_tutors, tutor_course_stats
+from .utils import complete_section_item, get_tutor_details
+from .uploads import handle_chunk_upload, upload_status, ChunkUploadError
+from .media import create_media_job, save_job_source
+from .db_service import tutor_course_stats
+from .search import search_courses
+from .grading import get_answer_key, grade, MAX_BATCH_SUBMISSIONS
+from .snapshots import get_snapshot, get_home_user_courses, SnapshotUnavailable
+from .profiles import get_profile_loader
+from .pagination import keyset_page, cached_count
 
 logger = logging.getLogger(__name__)
 call_user_service = CallUserService()
@@ -50,21 +57,56 @@ class HomeView(APIView):
     permission_classes = [IsUser]
     def get(self, request):
         user_id = request.user_payload['user_id']
-        purchases = Purchase.objects.filter(user=user_id).select_related('course')[:4]
-        my_course_serializer = StudentMyCourseSerializer(purchases, many=True)
-        courses = Course.objects.filter(is_complete=True, is_available=True)[:3]
-        course_serializer = CourseSerializer(courses, many=True)
-        ad_details = get_home_banner()
-        banner_details = ad_details.get('home_banner')
-        return Response({'my_courses': my_course_serializer.data, 'courses': course_serializer.data, 'banner_details': banner_details}, status=status.HTTP_200_OK)
+        # shared part from the home snapshot, the user's courses from a short lived per-user entry
+        try:
+            home = get_snapshot('home')
+        except SnapshotUnavailable as e:
+            return e.response
+        my_courses = get_home_user_courses(user_id)
+        return Response({'my_courses': my_courses, 'courses': home['courses'], 'banner_details': home['banner_details']}, status=status.HTTP_200_OK)
 
 # Custom pagination class to handle pagination in API responses
 class CustomPagination(PageNumberPagination):
+    """
+    Page numbers by default. A request with ?pagination=cursor (or a ?cursor= taken from a
+    previous response) is paginated by keyset instead (courses/pagination.py): no COUNT(*) and no
+    OFFSET scan, next/previous carry an opaque cursor and count is null unless ?include_count=true
+    asks for the cached total. The response keeps the same keys either way.
+    """
     page_size = 9  # The default page size
     page_size_query_param = 'page_size'  # Allow users to override page size(default is 9)
     max_page_size = 100  # Maximum page size allowed
+    cursor_query_param = 'cursor'
+
+    def is_keyset(self, request):
+        return request.query_params.get('pagination') == 'cursor' or self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.is_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page, self.next_cursor, self.previous_cursor = keyset_page(
+            queryset, self.get_page_size(request), request.query_params.get(self.cursor_query_param)
+        )
+        self.count = cached_count(queryset) if request.query_params.get('include_count') == 'true' else None
+        return page
+
+    def get_cursor_params(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor).split('?', 1)[1]
 
     def get_paginated_response(self, data):
+        if self.keyset:
+            return Response({
+                'count': self.count,
+                'next': self.get_cursor_params(self.next_cursor),
+                'previous': self.get_cursor_params(self.previous_cursor),
+                'results': data
+            })
+
         # Get the next and previous page numbers
         next_page = self.get_next_link()
         previous_page = self.get_previous_link()
@@ -125,13 +167,10 @@ class CourseCreateAPIView(APIView):
     def get(self, request, *args, **kwargs):
         courses = Course.objects.filter(is_complete=True, is_available=True)
 
-        # Search functionality
-        search_query = request.query_params.get('search', None)
+        # Search functionality, ranked full-text + trigram match (courses/search.py)
+        search_query = request.query_params.get('search', '').strip()
         if search_query:
-            courses = courses.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+            courses = search_courses(courses, search_query)
 
         # Filter by category
         category = request.query_params.get('category', None)
@@ -150,15 +189,15 @@ class CourseCreateAPIView(APIView):
                 '-amount': '-subscription_amount',
                 'recent': 'created_at',
                 '-recent': '-created_at',
-                # 'popular': '-popularity',  # popularity is based on enrollments
+                'popular': '-enrollment_count',  # popularity is based on enrollments
             }
             if sort_by in valid_sorts:
-                if 'popular' in sort_by:
-                    courses = courses.annotate(popularity=Count('enrollments'))
                 courses = courses.order_by(valid_sorts[sort_by])
             else:
                 return Response({'detail': f'Invalid sort_by value. Use: {list(valid_sorts.keys())}'}, 
                               status=status.HTTP_400_BAD_REQUEST)
+        elif search_query:
+            courses = courses.order_by('-rank', '-created_at')
 
         paginator = self.pagination_class()
         try:
@@ -173,23 +212,20 @@ class CourseCreateAPIView(APIView):
         serializer = CourseSerializer(data=request.data)
         if serializer.is_valid():
             thumbnail_file = serializer.validated_data.pop('thumbnail_file', None)
-            if thumbnail_file:
-                try:
-                    thumbnail_url = handle_thumbnail_upload(thumbnail_file)
-                except Exception as e:
-                    return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            else:
+            if not thumbnail_file:
                 return Response({'detail': 'Thumbnail is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-            course = Course.objects.create(
-                **serializer.validated_data,
-                instructor=user_id,
-                thumbnail=thumbnail_url,
-                step=2,
-            )
+            # the thumbnail is uploaded by a media job, its id lets the client follow it
+            with transaction.atomic():
+                course = Course.objects.create(
+                    **serializer.validated_data,
+                    instructor=user_id,
+                    step=2,
+                )
+                job = create_media_job('course_thumbnail', user_id, save_job_source(thumbnail_file), course=course)
             serializer = CourseSerializer(course)
             serializer_data = serializer.data
-            serializer_data['thumbnail'] = thumbnail_url
+            serializer_data['thumbnail_job'] = str(job.id)
             return Response(serializer_data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -203,22 +239,13 @@ class CourseCreateAPIView(APIView):
             serializer = CourseSerializer(course, data=request.data, partial=True)
             if serializer.is_valid():
                 thumbnail_file = serializer.validated_data.pop('thumbnail_file', None)
-                thumbnail_url = None
-                if thumbnail_file:
-                    try:
-                        # Delete old thumbnail if it exists and Upload new thumbnail
-                        thumbnail_url = handle_thumbnail_upload(thumbnail_file, course.thumbnail)
-                        serializer.validated_data['thumbnail'] = thumbnail_url
-                    except Exception as e:
-                        return Response(
-                            {'detail': f'Error handling thumbnail: {str(e)}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                
-                serializer.save()
-                serializer_data = serializer.data
-                if thumbnail_url is not None:
-                    serializer_data['thumbnail'] = thumbnail_url                    
+                with transaction.atomic():
+                    serializer.save()
+                    serializer_data = serializer.data
+                    if thumbnail_file:
+                        # the old thumbnail is deleted by the job once the new one is stored
+                        job = create_media_job('course_thumbnail', user_id, save_job_source(thumbnail_file), course=course)
+                        serializer_data['thumbnail_job'] = str(job.id)
                 return Response(serializer_data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -426,12 +453,45 @@ class ChunkUploadView(APIView):
             file_name = serializer.validated_data['file_name']
             logger.debug(f" Chunk upload request received: upload_id={upload_id}, chunk_number={chunk_number}, total_chunks={total_chunks}, file_name={file_name}")
             try:
-                response_data = handle_chunk_upload(upload_id, chunk_number, total_chunks, chunk, file_name)
+                response_data = handle_chunk_upload(
+                    upload_id, chunk_number, total_chunks, chunk, file_name,
+                    chunk_size=serializer.validated_data.get('chunk_size'),
+                    file_size=serializer.validated_data.get('file_size'),
+                    checksum=serializer.validated_data.get('checksum'),
+                )
                 return Response(response_data, status=status.HTTP_200_OK)
+            except ChunkUploadError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 return Response({'detail': f'Error processing chunk: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Progress of a chunked upload, the client re-sends the missing chunks to resume it
+class ChunkUploadStatusView(APIView):
+    permission_classes = [AllowAny] # same as ChunkUploadView
+    def get(self, request, upload_id):
+        try:
+            return Response(upload_status(upload_id), status=status.HTTP_200_OK)
+        except VideoUpload.DoesNotExist:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+class MediaJobStatusView(APIView):
+    permission_classes = [IsProfileCompleted]
+    def get(self, request, job_id):
+        user_id = request.user_payload['user_id']
+        job = MediaJob.objects.filter(id=job_id, owner=user_id).first()
+        if job is None:
+            return Response({'detail': 'Media job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'id': str(job.id),
+            'kind': job.kind,
+            'status': job.status,
+            'progress': job.progress,
+            'attempts': job.attempts,
+            'error': job.error,
+            'result_url': job.result_url or None,
+        }, status=status.HTTP_200_OK)
+
 # Create New Section Item
 class SectionItemCreateView(generics.CreateAPIView):
     queryset = SectionItem.objects.all()
@@ -457,7 +517,12 @@ class SectionItemCreateView(generics.CreateAPIView):
         created_instance = serializer.instance  # The saved SectionItem object
         headers = self.get_success_headers(serializer.data)
         detail_serializer = SectionItemDetailSerializer(created_instance, context=self.get_serializer_context())
-        return Response(detail_serializer.data, status=status.HTTP_201_CREATED, headers=headers)    
+        data = detail_serializer.data
+        # video and thumbnail are uploaded in the background, these jobs can be polled for progress
+        data['media_jobs'] = [
+            str(job_id) for job_id in MediaJob.objects.filter(video__section_item=created_instance).values_list('id', flat=True)
+        ]
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)    
 
 # Delete Section Item
 class SectionItemDeleteView(generics.DestroyAPIView):
@@ -718,27 +783,15 @@ class StudentAssessmentSubmitView(APIView):
         try:
             user_id = request.user_payload['user_id']            
             user_answers = request.data.get('answers')
-            assement = Assessment.objects.get(id=assessment_id)
+            if not isinstance(user_answers, dict):
+                return Response({"error": "answers must be an object of question id to choice id"}, status=status.HTTP_400_BAD_REQUEST)
+            assement = Assessment.objects.select_related('section_item__section__course').get(id=assessment_id)
+            course = assement.section_item.section.course
             # Check if the user has already purchased the course
-            purchase = Purchase.objects.get(course=assement.section_item.section.course, user=user_id)
-            questions = assement.questions.all()
-            passing_score = assement.passing_score
-            correct_answers = 0
-            for question in questions:
-                user_answer_id = user_answers.get(str(question.id))
-                if user_answer_id:
-                    correct_answer = question.choices.filter(is_correct=True).first()
-                    if int(user_answer_id) == correct_answer.id:
-                        correct_answers += 1
-            if correct_answers:
-                mark_purchase_completed(purchase)
-            if correct_answers >= (questions.count() * passing_score / 100):
-                section_item_completion, created = SectionItemCompletion.objects.get_or_create(
-                    purchase=purchase, section_item=assement.section_item
-                )
-                if created or not section_item_completion.completed:
-                    section_item_completion.completed = True
-                    section_item_completion.save()
+            purchase = Purchase.objects.get(course=course, user=user_id)
+            correct_answers, passed = grade(get_answer_key(assement, course), user_answers)
+            if passed:
+                if complete_section_item(purchase, assement.section_item):
                     serializer = StudentMyCourseDetailSerializer(purchase)
                     return Response({'purchase': serializer.data, 'score': correct_answers}, status=status.HTTP_200_OK)
             return Response({'score':correct_answers}, status=status.HTTP_200_OK)
@@ -747,6 +800,34 @@ class StudentAssessmentSubmitView(APIView):
         except Purchase.DoesNotExist:
             return Response({'detail': 'You are not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
 
+# Grade many submissions of an assessment at once, without recording anything - for the course tutor
+class AssessmentBatchGradeView(APIView):
+    permission_classes = [IsProfileCompleted]
+    def post(self, request, assessment_id):
+        user_id = request.user_payload['user_id']
+        submissions = request.data.get('submissions')
+        if not isinstance(submissions, list) or not submissions:
+            return Response({"error": "submissions must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(submissions) > MAX_BATCH_SUBMISSIONS:
+            return Response({"error": f"At most {MAX_BATCH_SUBMISSIONS} submissions per request"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            assessment = Assessment.objects.select_related('section_item__section__course').get(id=assessment_id)
+        except Assessment.DoesNotExist:
+            return Response({"error": "Assessment not found"}, status=404)
+        course = assessment.section_item.section.course
+        if course.instructor != user_id:
+            return Response({"error": "You are not the tutor of this course"}, status=status.HTTP_403_FORBIDDEN)
+
+        answer_key = get_answer_key(assessment, course)
+        results = []
+        for index, submission in enumerate(submissions):
+            answers = submission.get('answers') if isinstance(submission, dict) else None
+            if not isinstance(answers, dict):
+                return Response({"error": f"Submission {index} has no answers object"}, status=status.HTTP_400_BAD_REQUEST)
+            score, passed = grade(answer_key, answers)
+            results.append({'id': submission.get('id', index), 'score': score, 'passed': passed})
+        return Response({'total_questions': len(answer_key['answers']), 'results': results}, status=status.HTTP_200_OK)
+
 # Mark checked - Submit Lecture Completion of an enrolled course
 class StudentLectureSubmitView(APIView):
     # permission_classes = [IsAuthenticated]
@@ -756,13 +837,7 @@ class StudentLectureSubmitView(APIView):
             section_item = SectionItem.objects.get(id=lecture_id)
             # Check if the user has already purchased the course
             purchase = Purchase.objects.get(course=section_item.section.course, user=user_id)
-            section_item_completion, created = SectionItemCompletion.objects.get_or_create(
-                purchase=purchase, section_item=section_item
-            )
-            mark_purchase_completed(purchase)
-            if created or not section_item_completion.completed:
-                section_item_completion.completed = True
-                section_item_completion.save()
+            if complete_section_item(purchase, section_item):
                 serializer = StudentMyCourseDetailSerializer(purchase)
                 return Response({'purchase': serializer.data}, status=status.HTTP_200_OK)
             return Response({'details':"section item is already completed"}, status=status.HTTP_400_BAD_REQUEST)
@@ -818,14 +893,12 @@ class StudentFetchTopTutorsView(APIView):
             #     # Fetch all rows and convert to list of dicts
             #     columns = ['instructor', 'total_courses', 'total_enrollments']
             #     rows = cursor.fetchall()
-            rows=top_tutors()
-            columns = ['instructor', 'total_courses', 'total_enrollments']
-            tutors = [dict(zip(columns, row)) for row in rows]
-
-            if not tutors:
-                return Response({"message": "No tutors found."}, status=404)
+            # Read from the materialized leaderboard, paginated in the database
+            tutors = TutorStats.objects.values('instructor', 'total_courses', 'total_enrollments')
             paginator = self.pagination_class()
             paginated_tutors = paginator.paginate_queryset(tutors, request)
+            if not paginated_tutors:
+                return Response({"message": "No tutors found."}, status=404)
             logger.debug(f'paginted tutors: {paginated_tutors}') 
             result, error = get_tutor_details(paginated_tutors)
             if error:
@@ -907,20 +980,20 @@ class TutorCoursePreviewView(APIView):
             course = Course.objects.get(id=course_id, instructor=user_id)
             if not course.is_complete:
                 return Response({"error": "Course is not completed"}, status=status.HTTP_400_BAD_REQUEST)
+            student_ids = list(Purchase.objects.filter(course=course).values_list('user', flat=True))
+            # the instructor card of the serializer and the students come in one user service call
+            profile_loader = get_profile_loader()
+            profile_loader.prime(student_ids)
             serializer = CourseUnAuthDetailSerializer(course)
             data = {
                 'course': serializer.data,
             }
-            students = Purchase.objects.filter(course=course).values('user')
-            student_ids = [student['user'] for student in students]
             # Fetch student details from user service using the IDs
-            students_data = []
             try:
-                if student_ids:
-                    response_user_service = call_user_service.get_users_details(student_ids)
-                    students_data = response_user_service.json()
+                students = profile_loader.load_many(student_ids)
             except UserServiceException as e:
                 return Response({"error": str(e)}, status=503)
+            students_data = [students[student_id] for student_id in student_ids if student_id in students]
             data['students'] = students_data
             return Response(data, status=status.HTTP_200_OK)
 
@@ -942,9 +1015,7 @@ class ReviewListCreateAPIView(APIView):
             if Review.objects.filter(user=user_id, course=course).exists():
                 return Response({"error": "You have already reviewed this course"}, status=status.HTTP_400_BAD_REQUEST)
             purchase = Purchase.objects.get(user=user_id, course=course)
-            sections = SectionItem.objects.filter(section__course=course).count()
-            completed_sections = SectionItemCompletion.objects.filter(purchase=purchase, completed=True).count()
-            if sections != completed_sections:
+            if not purchase.is_completed:
                 return Response({"error": "You have to complete the course to post a review"}, status=status.HTTP_400_BAD_REQUEST)
             serializer = ReviewCreateSerializer( data=request.data, context={'request': request} )
             if serializer.is_valid():
@@ -1085,20 +1156,20 @@ class StudentCourseFeedbackView(APIView):
             result = []
             if len(user_ids):
                 try:
-                    response_user_service = call_user_service.get_users_details(user_ids)
+                    users = get_profile_loader().load_many(user_ids)
                 except UserServiceException as e:
                     return Response({"error": str(e)}, status=503)
                 except Exception as e:
                     return Response({"error": f"Unexpected error: {str(e)}"}, status=500)
 
-                users_data = response_user_service.json()
-                if len(users_data) != len(serializer_data):
+                if len(users) != len(set(user_ids)):
                     return Response(
                         {"error": "Mismatch between number of tutors and tutor details returned."},
                         status=500
                     )
 
-                for review, user in zip(serializer_data, users_data):
+                for review in serializer_data:
+                    user = users[review['user']]
                     review['full_name'] = user['first_name'] + ' ' + user['last_name']
                     review['user_image'] = user['image']
                     result.append(review)
@@ -1185,9 +1256,7 @@ class TutorVideoSessionsView(APIView):
             user_ids = {session.student for session in page}
             users_dict={}
             if user_ids:
-                response_user_service = call_user_service.get_users_details(list(user_ids))
-                users_data = response_user_service.json()
-                users_dict = {user['id']: user for user in users_data}
+                users_dict = get_profile_loader().load_many(user_ids)
             serializer = TutorVideoSessionSerializer(page, many=True, context={"users_dict": users_dict})
             return paginator.get_paginated_response(serializer.data)
         except UserServiceException as e:
@@ -1259,28 +1328,8 @@ class GetSessionTokenView(APIView):
 class LandingPageView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        rows=top_tutors()
-        columns = ['instructor', 'total_courses', 'total_enrollments']
-        tutors = [dict(zip(columns, row)) for row in rows[:4]]
-        tutors_result, tutors_error = get_tutor_details(tutors)
-        if tutors_error:
-            return tutors_error
-        courses_query = Course.objects.filter(is_available=True, is_blocked=False)
-        total_courses = courses_query.count()
-        total_instructors = courses_query.values('instructor').distinct().count()
-        purchases = Purchase.objects.all()
-        total_purchases = purchases.count() 
-        completed_courses = purchases.filter(completed=True).count()
-        total_students = purchases.values('user').distinct().count()
-        courses_result = {
-            "total_courses": total_courses,
-            "total_instructors": total_instructors,
-            "total_purchases": total_purchases,
-            "total_students": total_students,
-            "completed_courses": completed_courses,
-        }
-        most_purchased_courses = Course.objects.annotate(
-            total_purchases=Count('purchases')
-        ).order_by('-total_purchases')[:3]
-        serializer = CourseSerializer(most_purchased_courses, many=True)
-        return Response({"tutors": tutors_result, 'course_details': courses_result, 'courses': serializer.data}, status=status.HTTP_200_OK)
+        # served from the landing snapshot, see courses/snapshots.py
+        try:
+            return Response(get_snapshot('landing'), status=status.HTTP_200_OK)
+        except SnapshotUnavailable as e:
+            return e.response
@@ -36,6 +36,10 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='transaction_created_keyset_idx'),  # cursor pages
+            models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"{self.transaction_type} - ${self.amount} - {self.status}"
@@ -75,8 +75,20 @@ class TransactionViewSet(APIView):
                 Q(purchase_course__title__icontains=search)
             )
         
+        data = {'balance': Decimal(wallet_data['balance']), 'pendingBalance': pending_total or 0}
+        # the whole history unless the client opts in to cursor pages, see CustomPagination
+        paginator = CustomPagination()
+        if paginator.is_keyset(request):
+            try:
+                page = paginator.paginate_queryset(queryset, request)
+            except Exception as e:
+                return Response({'detail': f'Error: {str(e)}'}, status=400)
+            page_data = paginator.get_paginated_response(self.serializer_class(page, many=True).data).data
+            data.update(transactions=page_data['results'], count=page_data['count'], next=page_data['next'], previous=page_data['previous'])
+            return Response(data)
         serializer = self.serializer_class(queryset, many=True)
-        return Response({'balance': Decimal(wallet_data['balance']), 'pendingBalance': pending_total or 0, 'transactions':serializer.data})
+        data['transactions'] = serializer.data
+        return Response(data)
 
 class AdminTransactionsViewSet(APIView):
     serializer_class = TransactionSerializer